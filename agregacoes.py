@@ -0,0 +1,459 @@
+"""
+Agregações mescláveis da página do ENEM (métricas, contagens, histogramas, rankings e
+sketches de quantis).
+
+Os sketches de quantis (SketchNotas) não são gravados por célula de filtro na ingestão:
+as combinações de filtros da barra lateral são numerosas demais para materializar. Eles
+são montados por partição de UF, na mesma varredura que calcula as demais métricas
+(agregar_parcial), quando uma seleção é agregada pela primeira vez. O ParcialFiltro de cada
+UF fica no cache em memória (dados_enem._parcial_particao, limitado) e é reaproveitado pelas
+sessões do processo; o resumo de uma seleção mescla os parciais das UFs. Reruns com a mesma
+seleção não remontam nenhum sketch; uma seleção nova (ou após um reinício) custa uma
+varredura das UFs ainda não agregadas para ela.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from tabela_enem import TabelaEnem
+
+# ========================
+# Colunas utilizadas nas agregações
+# ========================
+
+# Notas das 5 áreas avaliadas (mesma ordem das métricas do dashboard)
+COLUNAS_NOTAS = [
+    "nota_ciencias_natureza",
+    "nota_ciencias_humanas",
+    "nota_linguagens_codigos",
+    "nota_matematica",
+    "nota_redacao"
+]
+
+# Colunas categóricas cujas contagens alimentam as pizzas e as barras
+COLUNAS_CONTAGEM = [
+    "sexo_labels",
+    "cor_raca_labels",
+    "estado_civil_labels",
+    "tipo_escola_em_labels",
+    "faixa_etaria_labels",
+    "escolaridade_pai_labels",
+    "escolaridade_mae_labels",
+    "renda_familiar_labels"
+]
+
+# Colunas categóricas que recebem ranking pela média da somatória
+COLUNAS_RANKING = ["uf_prova", "municipio_prova"]
+
+# Todas as colunas de rótulos (carregadas como "category" / dicionário Arrow)
+COLUNAS_CATEGORICAS = COLUNAS_CONTAGEM + COLUNAS_RANKING
+
+NBINS_HISTOGRAMA = 30
+
+# Colunas categóricas que recebem faixas de percentis por grupo
+COLUNAS_FAIXAS = ["uf_prova"]
+
+# Sketch de quantis: as notas do ENEM ficam em [0, 1000], então um histograma de
+# resolução fixa é mesclável por soma e tem erro máximo de RESOLUCAO_SKETCH / 2 pontos
+NOTA_MAXIMA = 1000.0
+RESOLUCAO_SKETCH = 1.0
+NBINS_SKETCH = int(NOTA_MAXIMA / RESOLUCAO_SKETCH) + 1
+
+PERCENTIS = [0.1, 0.5, 0.9]
+
+
+@dataclass(frozen=True)
+class SketchNotas:
+    """
+    Sketch mesclável de quantis para notas em [0, NOTA_MAXIMA].
+    Dois sketches se combinam somando as contagens; o quantil retornado fica a no
+    máximo 'erro_maximo' pontos do quantil exato (definição nearest-rank).
+    """
+    contagens: np.ndarray
+
+    erro_maximo = RESOLUCAO_SKETCH / 2
+
+    @classmethod
+    def de_valores(cls, valores: np.ndarray) -> "SketchNotas":
+        valores = valores[~np.isnan(valores)]
+        return cls(np.bincount(_discretizar(valores), minlength=NBINS_SKETCH))
+
+    @property
+    def total(self) -> int:
+        return int(self.contagens.sum())
+
+    def mesclar(self, outro: "SketchNotas") -> "SketchNotas":
+        return SketchNotas(self.contagens + outro.contagens)
+
+    def quantis(self, qs: List[float]) -> np.ndarray:
+        return quantis_contagens(self.contagens, qs)
+
+
+def _discretizar(valores: np.ndarray) -> np.ndarray:
+    """Índice do bin do sketch para cada nota."""
+    return np.clip(np.rint(valores / RESOLUCAO_SKETCH), 0, NBINS_SKETCH - 1).astype(np.intp)
+
+
+def quantis_contagens(contagens: np.ndarray, qs: List[float], resolucao: float = RESOLUCAO_SKETCH) -> np.ndarray:
+    """Quantis (nearest-rank) a partir das contagens de um ou vários sketches (último eixo)."""
+    acumulado = np.cumsum(contagens, axis=-1)
+    total = acumulado[..., -1:]
+    alvos = np.maximum(np.ceil(np.asarray(qs) * total), 1)
+    indices = np.stack(
+        [(acumulado < alvos[..., [i]]).sum(axis=-1) for i in range(len(qs))],
+        axis=-1
+    )
+    quantis = np.minimum(indices, contagens.shape[-1] - 1) * resolucao
+    return np.where(total > 0, quantis, np.nan)
+
+
+@dataclass(frozen=True)
+class ResumoFiltro:
+    """
+    Resultado compacto da agregação de uma seleção de filtros.
+    Todos os gráficos e métricas da página do ENEM são desenhados a partir dele.
+    """
+    total: int
+    medias: Dict[str, float]
+    maximas: Dict[str, float]
+    contagens: Dict[str, pd.Series]
+    histogramas: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    rankings: Dict[str, pd.Series]
+    sketches: Dict[str, SketchNotas]
+    faixas: Dict[str, Dict[str, pd.DataFrame]]
+
+    def percentis(self, coluna: str) -> Dict[float, float]:
+        """P10, mediana e P90 de uma nota, a partir do sketch."""
+        return dict(zip(PERCENTIS, self.sketches[coluna].quantis(PERCENTIS).tolist()))
+
+
+def _serie_contagens(contagem: np.ndarray, categorias: pd.Index) -> pd.Series:
+    """Contagens por categoria, ordenadas como o value_counts()."""
+    # Contagens ponderadas (estimativas por amostra) são arredondadas para pessoas inteiras
+    serie = pd.Series(np.rint(contagem).astype(np.int64), index=categorias)
+    serie = serie[serie > 0]
+    return serie.sort_values(ascending=False, kind="stable")
+
+
+def _bincount_2d(codigos: np.ndarray, bins: np.ndarray, n_categorias: int, pesos: np.ndarray | None = None) -> np.ndarray:
+    """Contagens (categoria x bin do sketch) via um único bincount."""
+    chaves = codigos.astype(np.intp) * NBINS_SKETCH + bins
+    return np.bincount(chaves, weights=pesos, minlength=n_categorias * NBINS_SKETCH).reshape(n_categorias, NBINS_SKETCH)
+
+
+def calcular_somatoria(notas: np.ndarray) -> np.ndarray:
+    """Média das 5 notas por linha, ignorando NaN (equivalente ao mean(axis=1))."""
+    validos = ~np.isnan(notas)
+    somas = np.where(validos, notas, 0.0).sum(axis=1)
+    quantidades = validos.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return somas / quantidades
+
+
+@dataclass(frozen=True)
+class ParcialFiltro:
+    """
+    Estado mesclável da agregação de um pedaço do dataset (uma partição ou fatia).
+    Pedaços agregados separadamente se combinam com 'mesclar' e viram um ResumoFiltro
+    com 'finalizar'. Os pedaços precisam compartilhar os dicionários das colunas de rótulos.
+    """
+    total: int | float  # linhas (ou soma dos pesos, numa agregação ponderada)
+    somas: np.ndarray
+    quantidades: np.ndarray
+    maximas: np.ndarray
+    minimas: np.ndarray
+    sketches: np.ndarray
+    contagens: Dict[str, np.ndarray]
+    somas_grupo: Dict[str, np.ndarray]
+    quantidades_grupo: Dict[str, np.ndarray]
+    faixas: Dict[str, Dict[int, np.ndarray]]
+    categorias: Dict[str, pd.Index]
+
+    def mesclar(self, outro: "ParcialFiltro") -> "ParcialFiltro":
+        faixas = {}
+        for coluna, grupos in self.faixas.items():
+            faixas[coluna] = dict(grupos)
+            for codigo, contagens in outro.faixas[coluna].items():
+                faixas[coluna][codigo] = faixas[coluna][codigo] + contagens if codigo in faixas[coluna] else contagens
+        return ParcialFiltro(
+            total=self.total + outro.total,
+            somas=self.somas + outro.somas,
+            quantidades=self.quantidades + outro.quantidades,
+            maximas=np.maximum(self.maximas, outro.maximas),
+            minimas=np.minimum(self.minimas, outro.minimas),
+            sketches=self.sketches + outro.sketches,
+            contagens={c: v + outro.contagens[c] for c, v in self.contagens.items()},
+            somas_grupo={c: v + outro.somas_grupo[c] for c, v in self.somas_grupo.items()},
+            quantidades_grupo={c: v + outro.quantidades_grupo[c] for c, v in self.quantidades_grupo.items()},
+            faixas=faixas,
+            categorias=self.categorias
+        )
+
+    def finalizar(self) -> ResumoFiltro:
+        nomes = COLUNAS_NOTAS + ["nota_somatoria"]
+        com_dados = self.quantidades > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias = self.somas / self.quantidades
+        maximas = np.where(com_dados, self.maximas, np.nan)
+
+        # Histogramas de 30 bins reconstruídos a partir dos sketches (mescláveis)
+        centros_sketch = np.arange(NBINS_SKETCH) * RESOLUCAO_SKETCH
+        histogramas = {}
+        for i, nome in enumerate(nomes):
+            if com_dados[i]:
+                # O intervalo vai do primeiro ao último bin ocupado do sketch: com a mínima e a
+                # máxima exatas (ex.: 300,3 e 899,6), os bins das pontas (300 e 900) ficariam fora
+                # dele e o np.histogram os descartaria sem aviso
+                ocupados = np.flatnonzero(self.sketches[i])
+                histogramas[nome] = np.histogram(
+                    centros_sketch,
+                    bins=NBINS_HISTOGRAMA,
+                    range=(centros_sketch[ocupados[0]], centros_sketch[ocupados[-1]]),
+                    weights=self.sketches[i]
+                )
+
+        contagens = {
+            coluna: _serie_contagens(contagem, self.categorias[coluna])
+            for coluna, contagem in self.contagens.items()
+        }
+
+        rankings = {}
+        for coluna, somas in self.somas_grupo.items():
+            quantidades = self.quantidades_grupo[coluna]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                serie = pd.Series(somas / quantidades, index=self.categorias[coluna])
+            rankings[coluna] = serie[quantidades > 0]
+
+        faixas = {}
+        for coluna, grupos in self.faixas.items():
+            codigos = sorted(grupos)
+            indice = self.categorias[coluna][codigos]
+            contagens_grupos = np.stack([grupos[c] for c in codigos]) if codigos else np.zeros((0, len(nomes), NBINS_SKETCH))
+            faixas[coluna] = {}
+            for i, nome in enumerate(nomes):
+                contagens_nota = contagens_grupos[:, i, :]
+                presentes = contagens_nota.sum(axis=1) > 0
+                quantis = quantis_contagens(contagens_nota[presentes], PERCENTIS).reshape(-1, len(PERCENTIS))
+                faixas[coluna][nome] = pd.DataFrame(quantis, index=indice[presentes], columns=["p10", "p50", "p90"])
+
+        return ResumoFiltro(
+            total=int(round(self.total)),
+            medias=dict(zip(nomes, medias.tolist())),
+            maximas=dict(zip(nomes, maximas.tolist())),
+            contagens=contagens,
+            histogramas=histogramas,
+            rankings=rankings,
+            sketches={nome: SketchNotas(self.sketches[i]) for i, nome in enumerate(nomes)},
+            faixas=faixas
+        )
+
+
+@dataclass(frozen=True)
+class _Linhas:
+    """Colunas de uma varredura já extraídas: notas (+ somatória), bins do sketch e códigos dos rótulos."""
+    notas: np.ndarray
+    validos: np.ndarray
+    bins: np.ndarray
+    codigos: Dict[str, np.ndarray]
+    categorias: Dict[str, pd.Index]
+
+    def subconjunto(self, selecionadas: np.ndarray) -> "_Linhas":
+        return _Linhas(
+            notas=self.notas[selecionadas],
+            validos=self.validos[selecionadas],
+            bins=self.bins[selecionadas],
+            codigos={coluna: codigos[selecionadas] for coluna, codigos in self.codigos.items()},
+            categorias=self.categorias
+        )
+
+
+def _extrair_linhas(dados: TabelaEnem, mask: np.ndarray) -> _Linhas:
+    """Lê as colunas da tabela sem cópia; apenas as linhas selecionadas são copiadas."""
+    # Matriz (linhas x 5 notas) + coluna da média da somatória
+    notas = np.column_stack([dados.valores(coluna)[mask] for coluna in COLUNAS_NOTAS]).astype("float64", copy=False)
+    notas = np.column_stack([notas, calcular_somatoria(notas)])
+    validos = ~np.isnan(notas)
+    return _Linhas(
+        notas=notas,
+        validos=validos,
+        bins=_discretizar(np.where(validos, notas, 0.0)),
+        codigos={coluna: dados.codigos(coluna)[mask] for coluna in COLUNAS_CATEGORICAS},
+        categorias={coluna: dados.categorias(coluna) for coluna in COLUNAS_CATEGORICAS}
+    )
+
+
+def _agregar_linhas(linhas: _Linhas, pesos: np.ndarray | None = None) -> ParcialFiltro:
+    """Estado mesclável de todas as métricas sobre as linhas extraídas (pesos: um por linha)."""
+    notas, validos, bins = linhas.notas, linhas.validos, linhas.bins
+    codigos, categorias = linhas.codigos, linhas.categorias
+    somatoria = notas[:, -1]
+    n_notas = notas.shape[1]
+
+    def pesos_de(selecionados: np.ndarray) -> np.ndarray | None:
+        return pesos[selecionados] if pesos is not None else None
+
+    sketches = np.stack([
+        np.bincount(bins[validos[:, i], i], weights=pesos_de(validos[:, i]), minlength=NBINS_SKETCH)
+        for i in range(n_notas)
+    ])
+
+    contagens = {}
+    for coluna in COLUNAS_CONTAGEM:
+        presentes = codigos[coluna][codigos[coluna] >= 0]
+        contagens[coluna] = np.bincount(presentes, weights=pesos_de(codigos[coluna] >= 0), minlength=len(categorias[coluna]))
+
+    somas_grupo, quantidades_grupo = {}, {}
+    for coluna in COLUNAS_RANKING:
+        selecionados = (codigos[coluna] >= 0) & ~np.isnan(somatoria)
+        pesos_grupo = pesos_de(selecionados)
+        valores_grupo = somatoria[selecionados] if pesos_grupo is None else somatoria[selecionados] * pesos_grupo
+        somas_grupo[coluna] = np.bincount(codigos[coluna][selecionados], weights=valores_grupo, minlength=len(categorias[coluna]))
+        quantidades_grupo[coluna] = np.bincount(codigos[coluna][selecionados], weights=pesos_grupo, minlength=len(categorias[coluna]))
+
+    faixas = {}
+    for coluna in COLUNAS_FAIXAS:
+        contagens_grupos = np.stack([
+            _bincount_2d(codigos[coluna][validos[:, i] & (codigos[coluna] >= 0)],
+                         bins[validos[:, i] & (codigos[coluna] >= 0), i],
+                         len(categorias[coluna]),
+                         pesos_de(validos[:, i] & (codigos[coluna] >= 0)))
+            for i in range(n_notas)
+        ], axis=1)
+        presentes = np.flatnonzero(contagens_grupos.sum(axis=(1, 2)))
+        faixas[coluna] = {int(c): contagens_grupos[c] for c in presentes}
+
+    ponderacao = pesos[:, None] if pesos is not None else 1
+    return ParcialFiltro(
+        total=len(notas) if pesos is None else float(pesos.sum()),
+        somas=(np.where(validos, notas, 0.0) * ponderacao).sum(axis=0),
+        quantidades=(validos * ponderacao).sum(axis=0),
+        maximas=np.where(validos, notas, -np.inf).max(axis=0, initial=-np.inf),
+        minimas=np.where(validos, notas, np.inf).min(axis=0, initial=np.inf),
+        sketches=sketches,
+        contagens=contagens,
+        somas_grupo=somas_grupo,
+        quantidades_grupo=quantidades_grupo,
+        faixas=faixas,
+        categorias=categorias
+    )
+
+
+def agregar_parcial(dados: TabelaEnem, mask: np.ndarray | None = None, pesos: np.ndarray | None = None) -> ParcialFiltro:
+    """
+    Calcula, em uma única varredura vetorizada sobre as linhas selecionadas por 'mask',
+    o estado mesclável de todas as métricas, contagens, histogramas e rankings.
+    Lê as colunas da tabela sem cópia; apenas as linhas selecionadas são copiadas.
+    Com 'pesos' (um por linha da tabela), cada linha conta como 'peso' pessoas: é a
+    estimativa de uma amostra com pesos amostrais (ver amostragem.py).
+    """
+    if mask is None:
+        mask = np.ones(len(dados), dtype=bool)
+    mask = np.asarray(mask, dtype=bool)
+    if pesos is not None:
+        pesos = np.asarray(pesos, dtype="float64")[mask]
+    return _agregar_linhas(_extrair_linhas(dados, mask), pesos)
+
+
+def agregar_parciais(dados: TabelaEnem, masks: List[np.ndarray]) -> List[ParcialFiltro]:
+    """
+    Um ParcialFiltro por máscara (grupos de uma comparação, que podem se sobrepor) numa
+    única varredura: as colunas são lidas, a somatória calculada e as notas discretizadas
+    uma só vez, para a união das máscaras; cada grupo agrega só as suas linhas.
+    """
+    masks = [np.asarray(mask, dtype=bool) for mask in masks]
+    uniao = np.logical_or.reduce(masks) if masks else np.zeros(len(dados), dtype=bool)
+    linhas = _extrair_linhas(dados, uniao)
+    return [_agregar_linhas(linhas.subconjunto(mask[uniao])) for mask in masks]
+
+
+def agregar(dados: TabelaEnem, mask: np.ndarray | None = None) -> ResumoFiltro:
+    """Agregação completa de uma tabela (ou das linhas de 'mask') em um ResumoFiltro."""
+    return agregar_parcial(dados, mask).finalizar()
+
+
+# ========================
+# Cruzamentos de duas colunas de rótulos (mapas de calor das médias)
+# ========================
+
+@dataclass(frozen=True)
+class CruzamentoNotas:
+    """Alunos e nota média de cada célula (linha x coluna) do cruzamento de duas colunas de rótulos."""
+    alunos: pd.DataFrame
+    medias: Dict[str, pd.DataFrame]
+
+
+@dataclass(frozen=True)
+class ParcialCruzamento:
+    """Estado mesclável de um cruzamento: somas e quantidades de notas por célula (linhas x colunas x notas)."""
+    alunos: np.ndarray
+    somas: np.ndarray
+    quantidades: np.ndarray
+    categorias_linhas: pd.Index
+    categorias_colunas: pd.Index
+
+    def mesclar(self, outro: "ParcialCruzamento") -> "ParcialCruzamento":
+        return ParcialCruzamento(
+            alunos=self.alunos + outro.alunos,
+            somas=self.somas + outro.somas,
+            quantidades=self.quantidades + outro.quantidades,
+            categorias_linhas=self.categorias_linhas,
+            categorias_colunas=self.categorias_colunas
+        )
+
+    def finalizar(self) -> CruzamentoNotas:
+        def tabela(valores: np.ndarray) -> pd.DataFrame:
+            return pd.DataFrame(valores, index=self.categorias_linhas, columns=self.categorias_colunas)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias = self.somas / self.quantidades
+        nomes = COLUNAS_NOTAS + ["nota_somatoria"]
+        return CruzamentoNotas(
+            alunos=tabela(self.alunos.astype(np.int64)),
+            medias={nome: tabela(medias[:, :, i]) for i, nome in enumerate(nomes)}
+        )
+
+
+def agregar_cruzamento(dados: TabelaEnem, mask: np.ndarray, coluna_linhas: str, coluna_colunas: str) -> ParcialCruzamento:
+    """
+    Cruzamento de duas colunas de rótulos nas linhas de 'mask': cada par de códigos vira
+    uma chave única e cada nota é somada por célula num bincount. As notas são lidas uma
+    coluna por vez (sem montar a matriz de notas), acumulando a somatória de cada linha.
+    """
+    categorias_linhas, categorias_colunas = dados.categorias(coluna_linhas), dados.categorias(coluna_colunas)
+    formato = (len(categorias_linhas), len(categorias_colunas))
+    n_celulas = formato[0] * formato[1]
+
+    codigos_linhas, codigos_colunas = dados.codigos(coluna_linhas), dados.codigos(coluna_colunas)
+    selecionadas = np.asarray(mask, dtype=bool) & (codigos_linhas >= 0) & (codigos_colunas >= 0)
+    chaves = codigos_linhas[selecionadas].astype(np.intp) * formato[1] + codigos_colunas[selecionadas]
+
+    somas, quantidades = [], []
+    soma_linhas = np.zeros(len(chaves))
+    quantidade_linhas = np.zeros(len(chaves))
+    for coluna in COLUNAS_NOTAS:
+        notas = dados.valores(coluna)[selecionadas].astype("float64", copy=False)
+        validas = ~np.isnan(notas)
+        notas = np.where(validas, notas, 0.0)
+        somas.append(np.bincount(chaves, weights=notas, minlength=n_celulas))
+        quantidades.append(np.bincount(chaves, weights=validas, minlength=n_celulas))
+        soma_linhas += notas
+        quantidade_linhas += validas
+
+    # Somatória: média das notas válidas de cada linha (como calcular_somatoria)
+    validas = quantidade_linhas > 0
+    somatoria = np.divide(soma_linhas, quantidade_linhas, out=np.zeros_like(soma_linhas), where=validas)
+    somas.append(np.bincount(chaves, weights=somatoria, minlength=n_celulas))
+    quantidades.append(np.bincount(chaves, weights=validas, minlength=n_celulas))
+
+    return ParcialCruzamento(
+        alunos=np.bincount(chaves, minlength=n_celulas).reshape(formato),
+        somas=np.stack(somas, axis=-1).reshape(*formato, -1),
+        quantidades=np.stack(quantidades, axis=-1).reshape(*formato, -1),
+        categorias_linhas=categorias_linhas,
+        categorias_colunas=categorias_colunas
+    )
+
+
+def top_n(serie: pd.Series, n: int = 10) -> pd.Series:
+    """Maiores 'n' médias de um ranking, em ordem crescente (para barras horizontais)."""
+    return serie.nlargest(n).sort_values(ascending=True)
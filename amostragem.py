@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from typing import Dict
+import numpy as np
+import pyarrow as pa
+from agregacoes import COLUNAS_NOTAS, ResumoFiltro, agregar_parcial, calcular_somatoria
+from tabela_enem import TabelaEnem
+
+# ========================
+# Amostra estratificada e respostas aproximadas
+# ========================
+# Amostra própria do dashboard, sorteada das partições por UF (não é a amostra do amostrar_df
+# do notebook de pré-processamento, que tem fração e regras próprias): cada par (UF, município)
+# é um estrato, do qual se sorteiam round(alunos * FRACAO_AMOSTRA) alunos, e ao menos um. O
+# sample(frac) do notebook pode deixar estratos pequenos sem nenhum aluno; aqui todo município
+# entra, para que qualquer filtro de município tenha estimativa.
+# Cada linha da amostra carrega o seu peso amostral (alunos do estrato / alunos sorteados),
+# então qualquer filtro aplicado à amostra dá estimativas das contagens e médias da base
+# completa. Os intervalos de confiança usam a variância do estimador estratificado por
+# linearização, com correção de população finita; os filtros entram como domínios (as
+# linhas fora do filtro contam como zero no seu estrato). Estratos com um único aluno sorteado
+# (municípios pequenos) não têm variância interna estimável e entram com um termo conservador.
+
+FRACAO_AMOSTRA = 0.036
+COLUNA_PESO = "peso_amostra"
+COLUNA_ESTRATO = "estrato_amostra"
+Z_95 = 1.96
+
+
+def amostra_estratificada(dados: TabelaEnem, fracao: float, rng: np.random.Generator,
+                          primeiro_estrato: int = 0) -> pa.Table:
+    """
+    Amostra de cada município da tabela (uma partição por UF: os estratos são UF x município),
+    com as colunas de peso e de estrato. Os estratos são numerados a partir de 'primeiro_estrato'.
+    """
+    municipios = dados.codigos("municipio_prova")
+    ordem = np.argsort(municipios, kind="stable")
+    _, inicios, tamanhos = np.unique(municipios[ordem], return_index=True, return_counts=True)
+    sorteados = np.maximum(np.rint(tamanhos * fracao), 1).astype(np.int64)
+
+    linhas = np.concatenate([
+        ordem[inicio + rng.choice(tamanho, n, replace=False)]
+        for inicio, tamanho, n in zip(inicios, tamanhos, sorteados)
+    ]) if len(tamanhos) else np.array([], dtype=np.int64)
+    pesos = np.repeat(tamanhos / sorteados, sorteados)
+    estratos = np.repeat(np.arange(len(tamanhos), dtype=np.int32) + primeiro_estrato, sorteados)
+
+    # Linhas na ordem da tabela (a partição é ordenada por município)
+    ordem_linhas = np.argsort(linhas, kind="stable")
+    amostra = dados.tabela.take(pa.array(linhas[ordem_linhas]))
+    amostra = amostra.append_column(COLUNA_PESO, pa.array(pesos[ordem_linhas]))
+    return amostra.append_column(COLUNA_ESTRATO, pa.array(estratos[ordem_linhas]))
+
+
+@dataclass(frozen=True)
+class ResumoAproximado:
+    """
+    Estimativas de uma seleção calculadas na amostra: o ResumoFiltro estimado (mesmos
+    campos do exato) e a meia-largura do intervalo de 95% do total e de cada média.
+    """
+    resumo: ResumoFiltro
+    n_amostra: int
+    intervalo_total: float
+    intervalos: Dict[str, float]
+
+
+def _variancia_estratificada(z: np.ndarray, estratos: np.ndarray, pesos: np.ndarray) -> float:
+    """Variância de sum(z) sob amostragem aleatória simples sem reposição em cada estrato."""
+    n = np.bincount(estratos)
+    s1 = np.bincount(estratos, weights=z)
+    s2 = np.bincount(estratos, weights=z ** 2)
+    # Fração amostral do estrato = 1 / peso (igual para todas as linhas do estrato)
+    fracao = np.bincount(estratos, weights=1 / pesos) / np.maximum(n, 1)
+    multiplos = n > 1
+    # (s2 - s1²/n pode sair levemente negativo por arredondamento quando z é constante no estrato)
+    variancia = np.sum((1 - fracao[multiplos]) * n[multiplos] / (n[multiplos] - 1)
+                       * np.maximum(s2[multiplos] - s1[multiplos] ** 2 / n[multiplos], 0))
+    # Estrato com um único aluno sorteado: o desvio desse aluno em relação à média de z por aluno
+    # sorteado faz as vezes da variância do estrato (o "adjust" do pacote survey do R), o que a
+    # superestima em vez de zerá-la. Estratos inteiros na amostra (fração 1) continuam sem variância.
+    unicos = n == 1
+    variancia += np.sum((1 - fracao[unicos]) * (s1[unicos] - z.mean()) ** 2) if len(z) else 0.0
+    return float(variancia)
+
+
+def agregar_amostra(amostra: TabelaEnem, mask: np.ndarray) -> ResumoAproximado:
+    """Estimativas (com intervalos de 95%) das métricas da base completa para as linhas de 'mask' da amostra."""
+    mask = np.asarray(mask, dtype=bool)
+    pesos = amostra.valores(COLUNA_PESO)
+    estratos = amostra.valores(COLUNA_ESTRATO)
+    resumo = agregar_parcial(amostra, mask, pesos).finalizar()
+
+    intervalo_total = Z_95 * np.sqrt(_variancia_estratificada(np.where(mask, pesos, 0.0), estratos, pesos))
+    notas = np.column_stack([amostra.valores(coluna) for coluna in COLUNAS_NOTAS]).astype("float64", copy=False)
+    notas = np.column_stack([notas, calcular_somatoria(notas)])
+    intervalos = {}
+    for i, nome in enumerate(COLUNAS_NOTAS + ["nota_somatoria"]):
+        dominio = mask & ~np.isnan(notas[:, i])
+        peso_dominio = pesos[dominio].sum()
+        if peso_dominio == 0:
+            intervalos[nome] = np.nan
+            continue
+        # Linearização da média ponderada: z = peso * (y - média) / soma dos pesos, zero fora do domínio
+        z = np.where(dominio, pesos * (np.nan_to_num(notas[:, i]) - resumo.medias[nome]) / peso_dominio, 0.0)
+        intervalos[nome] = Z_95 * np.sqrt(_variancia_estratificada(z, estratos, pesos))
+    return ResumoAproximado(resumo, int(mask.sum()), float(intervalo_total), intervalos)
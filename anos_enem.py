@@ -0,0 +1,75 @@
+from typing import Dict, Tuple
+
+# ========================
+# Mapeamento das colunas dos microdados por edição do ENEM
+# ========================
+
+ANOS_ENEM = [2019, 2020, 2021, 2022, 2023, 2024]
+
+# Colunas com o mesmo código INEP em todas as edições
+COLUNAS_PARTICIPANTES_COMUNS = {
+    "TP_FAIXA_ETARIA": "faixa_etaria",
+    "TP_SEXO": "sexo",
+    "TP_ESTADO_CIVIL": "estado_civil",
+    "TP_COR_RACA": "cor_raca",
+    "NO_MUNICIPIO_PROVA": "municipio_prova",
+    "SG_UF_PROVA": "uf_prova",
+    "Q001": "q_escolaridade_pai",
+    "Q002": "q_escolaridade_mae"
+}
+
+COLUNAS_RESULTADOS = {
+    "NO_MUNICIPIO_PROVA": "municipio_prova",
+    "SG_UF_PROVA": "uf_prova",
+    "NU_NOTA_CN": "nota_ciencias_natureza",
+    "NU_NOTA_CH": "nota_ciencias_humanas",
+    "NU_NOTA_LC": "nota_linguagens_codigos",
+    "NU_NOTA_MT": "nota_matematica",
+    "NU_NOTA_REDACAO": "nota_redacao"
+}
+
+# Até 2023 a renda familiar era a Q006 e o tipo de escola vinha de TP_ESCOLA;
+# em 2024 o questionário foi renumerado (Q007) e ganhou a pergunta Q023 sobre o Ensino Médio
+COLUNAS_PARTICIPANTES_POR_ANO = {
+    **{ano: {"Q006": "q_renda_familiar", "TP_ESCOLA": "q_tipo_em"} for ano in range(2019, 2024)},
+    2024: {"Q007": "q_renda_familiar", "Q023": "q_tipo_em"}
+}
+
+# Até 2023 os microdados vêm em um único arquivo; em 2024, separados em participantes e resultados
+ARQUIVOS_POR_ANO = {
+    **{ano: {"microdados": f"MICRODADOS_ENEM_{ano}.csv"} for ano in range(2019, 2024)},
+    2024: {"participantes": "PARTICIPANTES_2024.csv", "resultados": "RESULTADOS_2024.csv"}
+}
+
+# Tipo de escola no Ensino Médio: código -> (ordinal, rótulo)
+MAPA_ESCOLA_EM_2024 = {
+    "A": (1, "Somente escola pública"),
+    "B": (3, "Escola pública + privada (sem bolsa)"),
+    "C": (2, "Escola pública + privada (com bolsa)"),
+    "D": (5, "Somente escola privada (sem bolsa)"),
+    "E": (4, "Somente escola privada (com bolsa)"),
+    "F": (0, "Não frequentou EM")
+}
+
+# TP_ESCOLA (até 2023) não distingue bolsa nem escola mista
+MAPA_TP_ESCOLA = {
+    1: (-1, "Não respondeu"),
+    2: (1, "Somente escola pública"),
+    3: (6, "Somente escola privada"),
+    4: (7, "Exterior")
+}
+
+MAPA_ESCOLA_EM_POR_ANO = {
+    **{ano: MAPA_TP_ESCOLA for ano in range(2019, 2024)},
+    2024: MAPA_ESCOLA_EM_2024
+}
+
+
+def colunas_participantes(ano: int) -> Dict[str, str]:
+    """Código INEP -> nome padronizado das colunas de participantes de uma edição."""
+    return {**COLUNAS_PARTICIPANTES_COMUNS, **COLUNAS_PARTICIPANTES_POR_ANO[ano]}
+
+
+def mapa_escola_em(ano: int) -> Dict[str | int, Tuple[int, str]]:
+    """Código -> (ordinal, rótulo) do tipo de escola no Ensino Médio de uma edição."""
+    return MAPA_ESCOLA_EM_POR_ANO[ano]
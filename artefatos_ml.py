@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+from typing import Any, Callable, Dict
+import joblib
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Artefatos pré-calculados das análises de ML
+# ========================
+# Cada resultado é guardado em PASTA_ARTEFATOS/<análise>/<hash dos dados>/<hash dos parâmetros>.joblib:
+# dados novos (outro CSV, outras colunas) geram outro hash e, portanto, outra versão do artefato,
+# sem sobrescrever as anteriores. O lote (lote_ml.py) grava os artefatos; a página só os lê e
+# calcula ao vivo apenas combinações que o lote não cobriu.
+
+PASTA_ARTEFATOS = "artefatos"
+
+# Incrementar quando o formato do resultado de alguma análise mudar
+VERSAO_ARTEFATOS = 1
+
+
+def hash_dados(dados: np.ndarray | pd.DataFrame) -> str:
+    """Impressão digital (sha256) do conteúdo da matriz ou DataFrame de entrada."""
+    h = hashlib.sha256()
+    if isinstance(dados, pd.DataFrame):
+        h.update(json.dumps(list(map(str, dados.columns))).encode())
+        h.update(pd.util.hash_pandas_object(dados, index=False).to_numpy().tobytes())
+    else:
+        dados = np.ascontiguousarray(dados)
+        h.update(f"{dados.dtype}{dados.shape}".encode())
+        h.update(dados.tobytes())
+    return h.hexdigest()
+
+
+def normalizar_valor(valor: Any) -> Any:
+    # Valores de slider como 1.2000000000000002 e 1.2 devem cair no mesmo artefato
+    if isinstance(valor, (float, np.floating)):
+        return round(float(valor), 6)
+    if isinstance(valor, np.integer):
+        return int(valor)
+    return valor
+
+
+def hash_parametros(parametros: Dict[str, Any]) -> str:
+    normalizados = {nome: normalizar_valor(valor) for nome, valor in sorted(parametros.items())}
+    texto = json.dumps({"versao": VERSAO_ARTEFATOS, **normalizados}, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+
+def caminho_artefato(analise: str, dados: np.ndarray | pd.DataFrame, parametros: Dict[str, Any]) -> str:
+    return caminho_por_hash(analise, hash_dados(dados), parametros)
+
+
+def caminho_por_hash(analise: str, hash_entrada: str, parametros: Dict[str, Any]) -> str:
+    """Como caminho_artefato, para quem consulta muitos artefatos dos mesmos dados (hash calculado uma vez)."""
+    return os.path.join(PASTA_ARTEFATOS, analise, hash_entrada[:16], f"{hash_parametros(parametros)}.joblib")
+
+
+def ler_artefato(caminho: str) -> Any | None:
+    """Resultado guardado no artefato, ou None se ele não existir (ou estiver corrompido)."""
+    if not os.path.exists(caminho):
+        return None
+    try:
+        return joblib.load(caminho)["resultado"]
+    except Exception:
+        logger.warning("Artefato ilegível ignorado: %s", caminho)
+        return None
+
+
+def gravar_artefato(caminho: str, analise: str, parametros: Dict[str, Any], resultado: Any):
+    """Grava o artefato com os metadados da execução (escrita atômica)."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    joblib.dump({
+        "analise": analise,
+        "parametros": {nome: normalizar_valor(valor) for nome, valor in parametros.items()},
+        "versao": VERSAO_ARTEFATOS,
+        "resultado": resultado
+    }, temporario)
+    os.replace(temporario, caminho)
+
+
+def precalculavel(analise: str) -> Callable:
+    """
+    Decorador das funções de análise: o primeiro argumento são os dados e os demais, os
+    parâmetros. A chamada normal devolve o artefato pré-calculado, se houver, e senão calcula
+    ao vivo (sem gravar). 'funcao.precalcular(...)' calcula e grava o artefato se ele não existir.
+    """
+    def decorador(funcao: Callable) -> Callable:
+        assinatura = inspect.signature(funcao)
+
+        def localizar(*args, **kwargs):
+            argumentos = assinatura.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            dados, *_ = argumentos.arguments.values()
+            parametros = dict(list(argumentos.arguments.items())[1:])
+            return caminho_artefato(analise, dados, parametros), parametros
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            caminho, _ = localizar(*args, **kwargs)
+            resultado = ler_artefato(caminho)
+            if resultado is None:
+                resultado = funcao(*args, **kwargs)
+            return resultado
+
+        def precalcular(*args, **kwargs) -> bool:
+            """Calcula e grava o artefato; devolve False se ele já existia."""
+            caminho, parametros = localizar(*args, **kwargs)
+            if os.path.exists(caminho):
+                return False
+            gravar_artefato(caminho, analise, parametros, funcao(*args, **kwargs))
+            return True
+
+        envoltorio.precalcular = precalcular
+        return envoltorio
+    return decorador
@@ -0,0 +1,461 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import streamlit as st
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1.element_tree import ElementTree, parse_tree_from_messages
+from tornado.websocket import websocket_connect
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Teste de carga do dashboard (sessões simultâneas)
+# ========================
+# O dashboard roda num 'streamlit run' local de verdade (ou num servidor já no ar, --url) e
+# cada sessão simulada é uma conexão websocket que fala o protocolo do navegador: envia o
+# estado dos widgets, recebe os elementos do rerun e os lê com a árvore de elementos do
+# streamlit.testing. As sessões sorteiam sequências de interações realistas (filtros da barra
+# lateral, toggles das seções, que reexecutam só o fragmento, e troca de página) com um tempo
+# de "leitura" entre elas; cada rerun é cronometrado do envio até o fim do script.
+# A carga é aplicada em níveis crescentes de sessões simultâneas e o relatório (JSON) traz,
+# por nível, p50/p95/p99 das latências, vazão e memória residente do servidor, junto com a
+# versão do código e a máquina, para comparar execuções (--comparar).
+# As mensagens do websocket usam os protos internos do Streamlit e a árvore de elementos do
+# streamlit.testing, que mudam entre versões menores: o harness confere se o cliente e o
+# servidor estão na versão fixada no requirements.txt (--aceitar-versao só avisa).
+# Os toggles sorteados são os da página de dados, lidos da árvore de elementos do app.
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+REQUISITOS = os.path.join(os.path.dirname(SCRIPT), "requirements.txt")
+PAGINAS = ["📊 Dados e Filtros - ENEM", "🤖 Algoritmos de clusterização - Colégio Teste"]
+PERCENTIS_LATENCIA = [50, 95, 99]
+
+# Filtros multiselect da página de dados sorteados pelas sessões
+FILTROS = [
+    "ufs_selecionadas",
+    "faixas_etarias_selecionadas",
+    "estados_civis_selecionados",
+    "cores_racas_selecionadas",
+    "rendas_familiares_selecionadas",
+    "tipos_escola_selecionados"
+]
+
+# Pesos das interações na página de dados; "pagina" é a ida e volta à página de ML
+PESOS = {"filtro": 0.55, "resetar_filtro": 0.1, "toggle": 0.2, "ano": 0.05, "pagina": 0.1}
+
+
+def versao_fixada() -> str:
+    """Versão do Streamlit fixada no requirements.txt (gravado em UTF-16)."""
+    with open(REQUISITOS, "rb") as arquivo:
+        bruto = arquivo.read()
+    texto = bruto.decode("utf-16") if bruto.startswith((b"\xff\xfe", b"\xfe\xff")) else bruto.decode("utf-8")
+    for linha in texto.splitlines():
+        nome, _, versao = linha.strip().partition("==")
+        if nome.lower() == "streamlit":
+            return versao
+    raise RuntimeError(f"streamlit não está fixado em {REQUISITOS}.")
+
+
+def conferir_versao(versao: str, origem: str, aceitar: bool = False):
+    """Falha (ou só avisa, com 'aceitar') se a versão menor do Streamlit difere da fixada."""
+    fixada = versao_fixada()
+    if versao.split(".")[:2] == fixada.split(".")[:2]:
+        return
+    mensagem = (f"Streamlit {versao} no {origem}, mas o protocolo usado pelo harness foi validado "
+                f"com a versão fixada no requirements.txt ({fixada}).")
+    if not aceitar:
+        raise RuntimeError(mensagem + " Use --aceitar-versao para rodar mesmo assim.")
+    logger.warning(mensagem)
+
+
+def rss_mb(pid: int) -> float | None:
+    """Memória residente de um processo (Linux, /proc); None quando não disponível."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for linha in status:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# ========================
+# Servidor local
+# ========================
+
+def iniciar_servidor(porta: int, timeout: float = 120.0) -> subprocess.Popen:
+    """Sobe 'streamlit run dashboard.py' na porta dada e espera o health check responder."""
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", SCRIPT, "--server.headless", "true",
+         "--server.port", str(porta), "--browser.gatherUsageStats", "false"],
+        cwd=os.path.dirname(SCRIPT), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor do Streamlit terminou com código {processo.returncode}.")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{porta}/_stcore/health", timeout=2):
+                return processo
+        except OSError:
+            time.sleep(0.5)
+    processo.terminate()
+    raise TimeoutError(f"O servidor do Streamlit não respondeu em {timeout:.0f} s.")
+
+
+# ========================
+# Sessão simulada (cliente websocket)
+# ========================
+
+class _Sessao:
+    """Uma aba do navegador: conexão, estado dos widgets alterados e árvore do último rerun."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url.rstrip("/").replace("http", "ws", 1) + "/_stcore/stream"
+        self.timeout = timeout
+        self.conexao = None
+        self.estados: Dict[str, WidgetState] = {}
+        self.mensagens: Dict[Tuple[int, ...], ForwardMsg] = {}
+        self.fragmentos: Dict[str, str] = {}
+        self.arvore: ElementTree | None = None
+        self.erros = 0
+        self.versao_servidor: str | None = None
+
+    async def conectar(self):
+        self.conexao = await websocket_connect(self.url, subprotocols=["streamlit"])
+
+    def fechar(self):
+        self.conexao.close()
+
+    async def rerun(self, fragmento: str = "") -> float:
+        """Envia o estado atual dos widgets e espera o fim do script; devolve a latência em segundos."""
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = ""
+        mensagem.rerun_script.fragment_id = fragmento
+        mensagem.rerun_script.widget_states.widgets.extend(self.estados.values())
+        # Um rerun completo substitui a página inteira; o de fragmento, só os elementos dele
+        if not fragmento:
+            self.mensagens = {}
+        inicio = time.perf_counter()
+        await self.conexao.write_message(mensagem.SerializeToString(), binary=True)
+        while True:
+            bruta = await asyncio.wait_for(self.conexao.read_message(), self.timeout)
+            if bruta is None:
+                raise ConnectionError("O servidor fechou a conexão.")
+            recebida = ForwardMsg()
+            recebida.ParseFromString(bruta)
+            tipo = recebida.WhichOneof("type")
+            if tipo == "new_session":
+                self.versao_servidor = recebida.new_session.initialize.environment_info.streamlit_version
+            elif tipo == "delta":
+                self.mensagens[tuple(recebida.metadata.delta_path)] = recebida
+            elif tipo == "script_finished" and recebida.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        latencia = time.perf_counter() - inicio
+        self.arvore = parse_tree_from_messages([self.mensagens[caminho] for caminho in sorted(self.mensagens)])
+        # Widgets criados dentro de um fragmento: interagir com eles reexecuta só o fragmento
+        for recebida in self.mensagens.values():
+            elemento = recebida.delta.new_element
+            if recebida.delta.fragment_id and elemento.WhichOneof("type"):
+                widget_id = getattr(getattr(elemento, elemento.WhichOneof("type")), "id", "")
+                if widget_id:
+                    self.fragmentos[widget_id] = recebida.delta.fragment_id
+        self.erros = len(self.arvore.exception)
+        return latencia
+
+    def widgets(self, tipo: str, chaves: List[str]) -> list:
+        return [widget for widget in getattr(self.arvore, tipo) if widget.key in chaves]
+
+    def toggles_secoes(self) -> list:
+        """Toggles do corpo da página (seções que abrem e fecham), como o app os exibe agora."""
+        return [widget for widget in self.arvore.main.toggle if widget.key]
+
+    def multiselect(self, widget, valores: List[str]):
+        estado = WidgetState(id=widget.id)
+        estado.string_array_value.data[:] = valores
+        self.estados[widget.id] = estado
+
+    def toggle(self, widget) -> str:
+        """Inverte um toggle; devolve o fragmento que o contém ("" se nenhum)."""
+        atual = self.estados[widget.id].bool_value if widget.id in self.estados else widget.proto.default
+        self.estados[widget.id] = WidgetState(id=widget.id, bool_value=not atual)
+        return self.fragmentos.get(widget.id, "")
+
+    def radio(self, widget, opcao: str):
+        # O radio envia o texto da opção nas versões do Streamlit com Radio.raw_value; antes, o índice
+        if "raw_value" in widget.proto.DESCRIPTOR.fields_by_name:
+            self.estados[widget.id] = WidgetState(id=widget.id, string_value=opcao)
+        else:
+            self.estados[widget.id] = WidgetState(id=widget.id, int_value=list(widget.options).index(opcao))
+
+
+# ========================
+# Interações de uma sessão
+# ========================
+# Cada interação altera o estado de uma sessão na página de dados e devolve o nome com que
+# o rerun será contabilizado e o fragmento a reexecutar ("" = script inteiro).
+
+def _filtro(sessao: _Sessao, rng: random.Random) -> Tuple[str, str]:
+    widget = rng.choice(sessao.widgets("multiselect", FILTROS))
+    opcoes = list(widget.options)
+    # Metade das vezes restringe a poucas opções, como quem investiga um grupo
+    quantidade = rng.randint(1, min(3, len(opcoes))) if rng.random() < 0.5 else rng.randint(1, len(opcoes))
+    sessao.multiselect(widget, rng.sample(opcoes, quantidade))
+    return f"filtro:{widget.key}", ""
+
+
+def _resetar_filtro(sessao: _Sessao, rng: random.Random) -> Tuple[str, str]:
+    widget = rng.choice(sessao.widgets("multiselect", FILTROS))
+    sessao.multiselect(widget, list(widget.options))
+    return "filtro:todos", ""
+
+
+def _toggle(sessao: _Sessao, rng: random.Random) -> Tuple[str, str]:
+    widget = rng.choice(sessao.toggles_secoes())
+    return f"toggle:{widget.key}", sessao.toggle(widget)
+
+
+def _ano(sessao: _Sessao, rng: random.Random) -> Tuple[str, str]:
+    widget = sessao.widgets("multiselect", ["anos_selecionados"])[0]
+    opcoes = list(widget.options)
+    sessao.multiselect(widget, sorted(rng.sample(opcoes, rng.randint(1, len(opcoes)))))
+    return "filtro:anos_selecionados", ""
+
+
+INTERACOES: Dict[str, Callable[[_Sessao, random.Random], Tuple[str, str]]] = {
+    "filtro": _filtro,
+    "resetar_filtro": _resetar_filtro,
+    "toggle": _toggle,
+    "ano": _ano
+}
+
+
+async def simular_sessao(url: str, indice: int, n_interacoes: int, pausa: float, semente: int,
+                         timeout: float) -> Tuple[Dict[str, List[float]], Dict[str, int]]:
+    """
+    Uma sessão: abertura do dashboard e n_interacoes sorteadas, com pausas exponenciais de
+    média 'pausa' s. Devolve as latências e o nº de reruns com exceção, por interação.
+    """
+    rng = random.Random(semente + indice)
+    latencias: Dict[str, List[float]] = {}
+    erros: Dict[str, int] = {}
+    sessao = _Sessao(url, timeout)
+    await sessao.conectar()
+
+    async def rerun(interacao: str, fragmento: str = ""):
+        latencias.setdefault(interacao, []).append(await sessao.rerun(fragmento))
+        if sessao.erros:
+            erros[interacao] = erros.get(interacao, 0) + 1
+
+    try:
+        await rerun("abertura")
+        nomes, pesos = list(PESOS), list(PESOS.values())
+        for _ in range(n_interacoes):
+            if pausa > 0:
+                await asyncio.sleep(rng.expovariate(1 / pausa))
+            escolha = rng.choices(nomes, pesos)[0]
+            if escolha == "pagina":
+                navegacao = sessao.arvore.sidebar.radio[0]
+                sessao.radio(navegacao, PAGINAS[1])
+                await rerun("pagina:ml")
+                sessao.radio(sessao.arvore.sidebar.radio[0], PAGINAS[0])
+                await rerun("pagina:dados")
+            else:
+                await rerun(*INTERACOES[escolha](sessao, rng))
+    finally:
+        sessao.fechar()
+    return latencias, erros
+
+
+# ========================
+# Execução e relatório
+# ========================
+
+def _estatisticas(valores: List[float]) -> Dict[str, float]:
+    valores = np.asarray(valores) * 1000
+    resumo = {"reruns": int(len(valores)), "media_ms": round(float(valores.mean()), 1)}
+    for p, valor in zip(PERCENTIS_LATENCIA, np.percentile(valores, PERCENTIS_LATENCIA)):
+        resumo[f"p{p}_ms"] = round(float(valor), 1)
+    resumo["max_ms"] = round(float(valores.max()), 1)
+    return resumo
+
+
+def _versao() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(SCRIPT), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+async def executar_nivel(url: str, sessoes: int, interacoes: int, pausa: float, semente: int,
+                         timeout: float, pid: int | None = None) -> Dict:
+    """Um nível de carga: 'sessoes' sessões simultâneas; devolve latências, vazão e memória do servidor."""
+    rss_inicial = rss_mb(pid) if pid else None
+    rss_pico = rss_inicial
+
+    async def monitorar_memoria():
+        nonlocal rss_pico
+        while True:
+            await asyncio.sleep(0.2)
+            atual = rss_mb(pid)
+            if atual is not None:
+                rss_pico = max(rss_pico or 0.0, atual)
+
+    monitor = asyncio.create_task(monitorar_memoria()) if rss_inicial is not None else None
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(
+        simular_sessao(url, i, interacoes, pausa, semente, timeout) for i in range(sessoes)
+    ))
+    duracao = time.perf_counter() - inicio
+    if monitor:
+        monitor.cancel()
+
+    latencias: Dict[str, List[float]] = {}
+    erros: Dict[str, int] = {}
+    for latencias_sessao, erros_sessao in resultados:
+        for nome, valores in latencias_sessao.items():
+            latencias.setdefault(nome, []).extend(valores)
+        for nome, quantidade in erros_sessao.items():
+            erros[nome] = erros.get(nome, 0) + quantidade
+    todas = [valor for valores in latencias.values() for valor in valores]
+    nivel = {
+        "sessoes": sessoes,
+        "duracao_s": round(duracao, 2),
+        "vazao_reruns_s": round(len(todas) / duracao, 2),
+        "latencia": _estatisticas(todas),
+        "latencia_por_interacao": {nome: _estatisticas(valores) for nome, valores in sorted(latencias.items())},
+        "erros": erros
+    }
+    if rss_inicial is not None:
+        nivel["memoria_mb"] = {
+            "inicial": round(rss_inicial, 1),
+            "pico": round(rss_pico, 1),
+            # Crescimento do servidor dividido pelas sessões (as sessões compartilham os caches)
+            "por_sessao": round((rss_pico - rss_inicial) / sessoes, 1)
+        }
+    return nivel
+
+
+async def executar_carga(url: str, niveis: List[int], interacoes: int, pausa: float = 1.0,
+                         semente: int = 42, timeout: float = 300.0, pid: int | None = None,
+                         aceitar_versao: bool = False) -> Dict:
+    """Aquece o servidor com uma sessão e aplica os níveis de carga em sequência; devolve o relatório."""
+    # A primeira abertura carrega os dados no processo: o relatório mede o regime, não o arranque
+    aquecimento = _Sessao(url, timeout)
+    await aquecimento.conectar()
+    try:
+        await aquecimento.rerun()
+    finally:
+        aquecimento.fechar()
+    conferir_versao(aquecimento.versao_servidor or "desconhecida", "servidor", aceitar_versao)
+    resultados = []
+    for sessoes in niveis:
+        logger.info("Nível de %d sessões simultâneas...", sessoes)
+        resultados.append(await executar_nivel(url, sessoes, interacoes, pausa, semente, timeout, pid))
+    return {
+        "versao": _versao(),
+        "maquina": {
+            "cpus": os.cpu_count(),
+            "plataforma": platform.platform(),
+            "python": platform.python_version(),
+            "streamlit": st.__version__,
+            "streamlit_servidor": aquecimento.versao_servidor
+        },
+        "parametros": {"interacoes": interacoes, "pausa_s": pausa, "semente": semente},
+        "niveis": resultados
+    }
+
+
+def comparar(atual: Dict, base: Dict) -> List[str]:
+    """Linhas com a variação das métricas principais, nível a nível, em relação a um relatório anterior."""
+    linhas = [f"Base: versão {base['versao']}, {base['maquina']['cpus']} CPUs"]
+    niveis_base = {nivel["sessoes"]: nivel for nivel in base["niveis"]}
+    for nivel in atual["niveis"]:
+        anterior = niveis_base.get(nivel["sessoes"])
+        if anterior is None:
+            continue
+        metricas = [(f"p{p}", anterior["latencia"][f"p{p}_ms"], nivel["latencia"][f"p{p}_ms"]) for p in PERCENTIS_LATENCIA]
+        metricas.append(("vazão", anterior["vazao_reruns_s"], nivel["vazao_reruns_s"]))
+        if "memoria_mb" in anterior and "memoria_mb" in nivel:
+            metricas.append(("RSS pico", anterior["memoria_mb"]["pico"], nivel["memoria_mb"]["pico"]))
+        partes = [f"{nome} {antes} -> {depois} ({100 * (depois - antes) / antes:+.1f}%)" if antes else f"{nome} {antes} -> {depois}"
+                  for nome, antes, depois in metricas]
+        linhas.append(f"{nivel['sessoes']} sessões: " + "; ".join(partes))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com sessões simultâneas simuladas.")
+    parser.add_argument("--sessoes", default="1,2,4,8",
+                        help="Níveis de sessões simultâneas, separados por vírgula (padrão: 1,2,4,8).")
+    parser.add_argument("--interacoes", type=int, default=10, help="Interações por sessão (após a abertura).")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Tempo médio (s) entre interações de uma sessão.")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Tempo máximo (s) de um rerun.")
+    parser.add_argument("--url", default=None, help="Servidor já no ar; sem ele, um 'streamlit run' local é iniciado.")
+    parser.add_argument("--pid", type=int, default=None, help="PID do servidor dado em --url (para a memória).")
+    parser.add_argument("--porta", type=int, default=8599, help="Porta do servidor local.")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do relatório.")
+    parser.add_argument("--comparar", default=None, help="Relatório JSON anterior para comparação.")
+    parser.add_argument("--aceitar-versao", action="store_true",
+                        help="Roda mesmo com o Streamlit fora da versão fixada no requirements.txt (só avisa).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        conferir_versao(st.__version__, "cliente", args.aceitar_versao)
+    except RuntimeError as erro:
+        parser.error(str(erro))
+    niveis = [int(n) for n in args.sessoes.split(",")]
+
+    servidor = None
+    url, pid = args.url, args.pid
+    if url is None:
+        servidor = iniciar_servidor(args.porta)
+        url, pid = f"http://localhost:{args.porta}", servidor.pid
+    try:
+        relatorio = asyncio.run(executar_carga(url, niveis, args.interacoes, args.pausa,
+                                               args.semente, args.timeout, pid, args.aceitar_versao))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    for nivel in relatorio["niveis"]:
+        latencia = nivel["latencia"]
+        memoria = nivel.get("memoria_mb")
+        logger.info("%d sessões: %d reruns em %.1f s (%.2f reruns/s); p50 %.0f ms, p95 %.0f ms, p99 %.0f ms%s.",
+                    nivel["sessoes"], latencia["reruns"], nivel["duracao_s"], nivel["vazao_reruns_s"],
+                    latencia["p50_ms"], latencia["p95_ms"], latencia["p99_ms"],
+                    f"; RSS pico {memoria['pico']:.0f} MB ({memoria['por_sessao']:.1f} MB/sessão)" if memoria else "")
+        if nivel["erros"]:
+            logger.warning("  Reruns com exceção: %s", nivel["erros"])
+    for nome, estatisticas in relatorio["niveis"][-1]["latencia_por_interacao"].items():
+        logger.info("  %-40s n=%-4d p50 %6.0f ms  p95 %6.0f ms", nome, estatisticas["reruns"],
+                    estatisticas["p50_ms"], estatisticas["p95_ms"])
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            for linha in comparar(relatorio, json.load(arquivo)):
+                logger.info(linha)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        logger.info("Relatório gravado em %s.", args.saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+from anos_enem import ANOS_ENEM, mapa_escola_em
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Codebook: códigos INEP -> (ordinal, rótulo)
+# ========================
+# Cada campo traduzido no pré-processamento é declarado uma única vez: a coluna com o código
+# INEP, a coluna ordinal (usada pelos modelos), a coluna de rótulos (usada pelo dashboard) e
+# o mapa código -> (ordinal, rótulo). Os mapas são compilados em tabelas de consulta (um
+# pd.Index dos códigos e arrays de ordinais/rótulos): aplicar o codebook é um get_indexer e
+# dois takes por coluna, sem chamadas Python por linha. Os rótulos saem como Categorical com
+# as categorias fixas do codebook, então blocos processados separadamente (read_csv com
+# chunksize) concatenam sem perder o tipo.
+#
+# Códigos fora do mapa: caem em 'outros' quando o campo define um, viram NaN (com aviso no log)
+# nos campos que o pré-processamento sempre traduziu com .map (estado civil e cor/raça) e
+# interrompem o processamento nos demais.
+#
+# A ordem de exibição dos rótulos é a dos ordinais; ordinais negativos ("Não sei",
+# "Não respondeu") vão para o fim. É a ordem das opções dos filtros do dashboard.
+
+Codigo = int | str
+Mapa = Dict[Codigo, Tuple[int, str]]
+
+MAPA_FAIXA_ETARIA: Mapa = {
+    1: (1, "Até 16"),
+    2: (2, "17"),
+    **{codigo: (3, "18-20") for codigo in range(3, 6)},
+    **{codigo: (4, "21-25") for codigo in range(6, 11)},
+    11: (5, "26-30"),
+    **{codigo: (6, "31-40") for codigo in (12, 13)},
+    **{codigo: (7, "41-50") for codigo in (14, 15)},
+    **{codigo: (8, "51-60") for codigo in (16, 17)},
+    **{codigo: (9, "60+") for codigo in (18, 19, 20)}
+}
+
+MAPA_SEXO: Mapa = {
+    "F": (0, "Feminino"),
+    "M": (1, "Masculino")
+}
+
+MAPA_ESTADO_CIVIL: Mapa = {
+    0: (0, "Não informado"),
+    1: (1, "Solteiro(a)"),
+    2: (2, "Casado(a)/Mora com companheiro(a)"),
+    3: (3, "Divorciado(a)/Desquitado(a)/Separado(a)"),
+    4: (4, "Viúvo(a)")
+}
+
+MAPA_COR_RACA: Mapa = {
+    0: (0, "Não declarado"),
+    1: (1, "Branca"),
+    2: (2, "Preta"),
+    3: (3, "Parda"),
+    4: (4, "Amarela"),
+    5: (5, "Indígena"),
+    6: (6, "Não dispõe da informação")
+}
+
+MAPA_ESCOLARIDADE: Mapa = {
+    "A": (0, "Nunca estudou"),
+    "B": (1, "Fundamental I incompleto"),
+    "C": (2, "Fundamental I completo, mas não Fundamental II"),
+    "D": (3, "Fundamental II completo, mas não Médio"),
+    "E": (4, "Médio completo"),
+    "F": (5, "Superior completo"),
+    "G": (6, "Pós-graduação"),
+    "H": (-1, "Não sei")
+}
+
+# Faixas de salários mínimos (SM) agrupadas
+MAPA_RENDA: Mapa = {
+    "A": (0, "Nenhuma renda"),
+    **{codigo: (1, "Muito baixa (até 2 SM)") for codigo in "BCD"},
+    **{codigo: (2, "Baixa (2-4 SM)") for codigo in "EFG"},
+    **{codigo: (3, "Média-baixa (4-7 SM)") for codigo in "HIJ"},
+    **{codigo: (4, "Média (7-10 SM)") for codigo in "KLM"},
+    **{codigo: (5, "Média-alta (10-15 SM)") for codigo in "NO"},
+    "P": (6, "Alta (15-20 SM)"),
+    "Q": (7, "Muito alta (20+ SM)")
+}
+
+
+@dataclass(frozen=True)
+class CampoCodebook:
+    origem: str                         # coluna com o código INEP (nome padronizado)
+    ordinal: str                        # coluna numérica gerada
+    rotulos: str                        # coluna de rótulos gerada
+    mapa: Mapa
+    outros: Tuple[int, str] | None = None  # (ordinal, rótulo) dos códigos fora do mapa
+    desconhecido_nulo: bool = False     # sem 'outros': códigos fora do mapa viram NaN em vez de erro
+
+
+def codebook(ano: int) -> List[CampoCodebook]:
+    """Campos traduzidos no pré-processamento de uma edição (só o tipo de escola muda entre edições)."""
+    return [
+        # Códigos ausentes (faixa etária e escolaridade) caem na última faixa / "Não sei"
+        CampoCodebook("faixa_etaria", "faixa_etaria", "faixa_etaria_labels", MAPA_FAIXA_ETARIA, outros=(9, "60+")),
+        CampoCodebook("sexo", "sexo", "sexo_labels", MAPA_SEXO),
+        CampoCodebook("estado_civil", "estado_civil", "estado_civil_labels", MAPA_ESTADO_CIVIL, desconhecido_nulo=True),
+        CampoCodebook("cor_raca", "cor_raca", "cor_raca_labels", MAPA_COR_RACA, desconhecido_nulo=True),
+        CampoCodebook("q_escolaridade_pai", "escolaridade_pai", "escolaridade_pai_labels", MAPA_ESCOLARIDADE, outros=(-1, "Não sei")),
+        CampoCodebook("q_escolaridade_mae", "escolaridade_mae", "escolaridade_mae_labels", MAPA_ESCOLARIDADE, outros=(-1, "Não sei")),
+        CampoCodebook("q_renda_familiar", "renda_familiar", "renda_familiar_labels", MAPA_RENDA),
+        CampoCodebook("q_tipo_em", "tipo_escola_em", "tipo_escola_em_labels", mapa_escola_em(ano))
+    ]
+
+
+def _ordenar(pares: Iterable[Tuple[int, str]]) -> List[str]:
+    """Rótulos distintos pela ordem de exibição: ordinal crescente, negativos no fim."""
+    ordinais = {}
+    for ordinal, rotulo in pares:
+        ordinais.setdefault(rotulo, ordinal)
+    return sorted(ordinais, key=lambda rotulo: (ordinais[rotulo] < 0, ordinais[rotulo]))
+
+
+@dataclass(frozen=True)
+class _Consulta:
+    codigos: pd.Index
+    ordinais: np.ndarray     # ordinal de cada código (+ 'outros' na última posição)
+    posicoes: np.ndarray     # posição do rótulo de cada código em 'categorias' (idem)
+    categorias: List[str]
+    tem_outros: bool
+
+
+@lru_cache(maxsize=None)
+def _compilar(ano: int, indice: int) -> _Consulta:
+    campo = codebook(ano)[indice]
+    pares = list(campo.mapa.values()) + ([campo.outros] if campo.outros else [])
+    categorias = _ordenar(pares)
+    posicao = {rotulo: i for i, rotulo in enumerate(categorias)}
+    return _Consulta(
+        codigos=pd.Index(list(campo.mapa)),
+        ordinais=np.array([ordinal for ordinal, _ in pares], dtype=np.int64),
+        posicoes=np.array([posicao[rotulo] for _, rotulo in pares], dtype=np.int64),
+        categorias=categorias,
+        tem_outros=campo.outros is not None
+    )
+
+
+def aplicar_codebook(df: pd.DataFrame, ano: int) -> pd.DataFrame:
+    """
+    Cria as colunas ordinais e de rótulos de todos os campos do codebook numa passada
+    vetorizada (o DataFrame pode ser um bloco do read_csv). As colunas de origem ficam.
+    """
+    novas = {}
+    for indice, campo in enumerate(codebook(ano)):
+        consulta = _compilar(ano, indice)
+        linhas = consulta.codigos.get_indexer(df[campo.origem])
+        desconhecidos = linhas < 0
+        nulos = None
+        if desconhecidos.any():
+            if consulta.tem_outros:
+                linhas[desconhecidos] = len(consulta.codigos)
+            else:
+                codigos = ", ".join(sorted(map(str, pd.unique(df[campo.origem][desconhecidos]))))
+                if not campo.desconhecido_nulo:
+                    raise ValueError(f"Códigos sem rótulo no codebook de {campo.origem} ({ano}): {codigos}")
+                logger.warning("Códigos sem rótulo no codebook de %s (%d), mantidos como NaN: %s",
+                               campo.origem, ano, codigos)
+                nulos = desconhecidos
+                linhas[nulos] = 0  # posição qualquer: ordinal e rótulo são trocados por NaN abaixo
+        ordinais = consulta.ordinais[linhas]
+        posicoes = consulta.posicoes[linhas]
+        if nulos is not None:
+            ordinais = ordinais.astype(float)
+            ordinais[nulos] = np.nan
+            posicoes[nulos] = -1  # código -1 do Categorical = NaN
+        novas[campo.ordinal] = ordinais
+        novas[campo.rotulos] = pd.Categorical.from_codes(posicoes, categories=consulta.categorias)
+    return df.assign(**{coluna: pd.Series(valores, index=df.index) for coluna, valores in novas.items()})
+
+
+def ordem_rotulos(coluna: str, anos: Iterable[int] = ANOS_ENEM) -> List[str]:
+    """Ordem de exibição dos rótulos de uma coluna '*_labels', unindo as edições pedidas."""
+    pares = []
+    for ano in anos:
+        for campo in codebook(ano):
+            if campo.rotulos == coluna:
+                pares += list(campo.mapa.values()) + ([campo.outros] if campo.outros else [])
+    return _ordenar(pares)
+
+
+def ordenar_rotulos(coluna: str, rotulos: Iterable[str]) -> List[str]:
+    """Rótulos na ordem do codebook; rótulos fora dele vão para o fim, em ordem alfabética."""
+    rotulos = set(rotulos)
+    ordem = [rotulo for rotulo in ordem_rotulos(coluna) if rotulo in rotulos]
+    return ordem + sorted(rotulos - set(ordem))
@@ -0,0 +1,516 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import reduce
+from typing import Callable, Dict, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+import pyarrow as pa
+from agregacoes import (
+    COLUNAS_CATEGORICAS,
+    CruzamentoNotas,
+    ParcialCruzamento,
+    ParcialFiltro,
+    ResumoFiltro,
+    agregar_cruzamento,
+    agregar_parciais,
+    agregar_parcial
+)
+from amostragem import COLUNA_ESTRATO, FRACAO_AMOSTRA, ResumoAproximado, agregar_amostra, amostra_estratificada
+from escolas_enem import RankingEscolas, abrir_ranking
+from tabela_enem import (
+    TabelaEnem,
+    abrir_arrow,
+    escrever_particoes_uf,
+    escrever_tabela_arrow,
+    listar_particoes_uf,
+    pasta_versao_atual
+)
+
+logger = logging.getLogger(__name__)
+
+# Dataset particionado por edição (um CSV por ano) e, em disco, por UF (um arquivo Arrow
+# por UF, ver pasta_particoes): só as partições selecionadas são lidas
+PASTA_DADOS = "data"
+PADRAO_DATASET = re.compile(r"enem_(\d{4})_dash_sample\.csv")
+
+# Colunas filtráveis pela barra lateral. Uma seleção é um dicionário coluna -> valores;
+# para "municipio_prova", lista vazia significa "sem filtro de município".
+COLUNAS_FILTRO = [
+    "uf_prova",
+    "municipio_prova",
+    "sexo_labels",
+    "faixa_etaria_labels",
+    "estado_civil_labels",
+    "cor_raca_labels",
+    "escolaridade_pai_labels",
+    "escolaridade_mae_labels",
+    "renda_familiar_labels",
+    "tipo_escola_em_labels"
+]
+
+Selecao = Dict[str, List[str]]
+
+# ========================
+# Carregamento dos dados
+# ========================
+
+def caminho_dataset(ano: int) -> str:
+    return os.path.join(PASTA_DADOS, f"enem_{ano}_dash_sample.csv")
+
+def anos_disponiveis() -> List[int]:
+    """Edições com partição disponível na pasta de dados."""
+    anos = [int(m.group(1)) for m in map(PADRAO_DATASET.fullmatch, os.listdir(PASTA_DADOS)) if m]
+    return sorted(anos)
+
+def versao_dataset(ano: int) -> float:
+    """Versão da partição (data de modificação), usada nas chaves dos caches."""
+    return os.path.getmtime(caminho_dataset(ano))
+
+def pasta_particoes(ano: int) -> str:
+    """Pasta com um arquivo Arrow por UF da edição (gerada a partir do CSV)."""
+    return os.path.join(PASTA_DADOS, f"enem_{ano}_dash_sample")
+
+def _preparar_particoes(caminho_csv: str, pasta: str):
+    """
+    Gera (ou regenera, se o CSV for mais novo) as partições por UF a partir do CSV.
+    Uma pasta sem nenhuma partição (geração interrompida antes do ponteiro ATUAL, que deixa
+    só a pasta tmp_*) também é regenerada, mesmo sendo mais nova que o CSV.
+    """
+    atual = pasta_versao_atual(pasta)
+    if (os.path.isdir(atual) and listar_particoes_uf(pasta)
+            and os.path.getmtime(atual) >= os.path.getmtime(caminho_csv)):
+        return
+    # Colunas de rótulos como "category": viram arrays de dicionário no Arrow, com o
+    # mesmo dicionário (o da edição inteira) em todas as partições
+    df = pd.read_csv(
+        caminho_csv,
+        sep=";",
+        encoding="latin1",
+        dtype={coluna: "category" for coluna in COLUNAS_CATEGORICAS}
+    )
+    escrever_particoes_uf(df, pasta)
+    logger.info("Partições por UF geradas em %s.", pasta)
+
+# cache_resource (e não cache_data): todas as sessões recebem o mesmo objeto, sem cópia
+@st.cache_resource
+def _listar_particoes(caminho_csv: str, versao: float) -> Dict[str, str]:
+    pasta = os.path.splitext(caminho_csv)[0]
+    _preparar_particoes(caminho_csv, pasta)
+    return listar_particoes_uf(pasta)
+
+@st.cache_resource
+def _abrir_particao(caminho_arrow: str, versao: float) -> TabelaEnem:
+    return abrir_arrow(caminho_arrow)
+
+def ufs_particionadas(ano: int) -> List[str]:
+    """UFs com partição na edição (lidas da listagem da pasta, sem abrir os arquivos)."""
+    return sorted(_listar_particoes(caminho_dataset(ano), versao_dataset(ano)))
+
+def carregar_particao(ano: int, uf: str) -> TabelaEnem:
+    """Partição de uma UF em uma edição, mapeada em memória e compartilhada entre sessões e processos."""
+    caminho = _listar_particoes(caminho_dataset(ano), versao_dataset(ano))[uf]
+    return _abrir_particao(caminho, versao_dataset(ano))
+
+def particao_referencia(ano: int) -> TabelaEnem:
+    """Uma partição qualquer da edição: esquema e dicionários são os mesmos em todas."""
+    ufs = ufs_particionadas(ano)
+    if not ufs:
+        raise FileNotFoundError(
+            f"Nenhuma partição por UF para {ano} em {pasta_particoes(ano)}; confira {caminho_dataset(ano)}."
+        )
+    return carregar_particao(ano, ufs[0])
+
+def colunas_dataset(ano: int) -> List[str]:
+    """Colunas do dataset da edição (iguais em todas as partições)."""
+    return particao_referencia(ano).colunas
+
+# Amostra estratificada da edição (ver amostragem.py), gravada ao lado das partições; a
+# fração entra no nome, para que uma amostra de outra fração não seja reaproveitada
+NOME_AMOSTRA = f"amostra_{FRACAO_AMOSTRA:g}.arrow"
+
+@st.cache_resource
+def _abrir_amostra(caminho_csv: str, versao: float) -> TabelaEnem:
+    particoes_uf = _listar_particoes(caminho_csv, versao)
+    if not particoes_uf:
+        raise FileNotFoundError(f"Nenhuma partição por UF gerada a partir de {caminho_csv}.")
+    # Na mesma versão das partições listadas (ver tabela_enem.escrever_particoes_uf)
+    caminho = os.path.join(os.path.dirname(next(iter(particoes_uf.values()))), NOME_AMOSTRA)
+    if not os.path.exists(caminho) or os.path.getmtime(caminho) < os.path.getmtime(caminho_csv):
+        rng = np.random.default_rng(42)
+        tabelas, estratos = [], 0
+        for uf in sorted(particoes_uf):
+            amostra = amostra_estratificada(_abrir_particao(particoes_uf[uf], versao), FRACAO_AMOSTRA, rng, estratos)
+            estratos = int(amostra.column(COLUNA_ESTRATO).to_numpy().max()) + 1
+            tabelas.append(amostra)
+        escrever_tabela_arrow(pa.concat_tables(tabelas).combine_chunks(), caminho)
+        logger.info("Amostra estratificada gerada em %s.", caminho)
+    return abrir_arrow(caminho)
+
+def carregar_amostra(ano: int) -> TabelaEnem:
+    """Amostra estratificada por UF e município da edição, com pesos amostrais."""
+    return _abrir_amostra(caminho_dataset(ano), versao_dataset(ano))
+
+def particoes(ano: int, selecao: Selecao) -> Iterator[Tuple[str, TabelaEnem]]:
+    """
+    Partições lidas por uma seleção: apenas as UFs selecionadas e, havendo municípios
+    selecionados, apenas os intervalos de linhas desses municípios (predicado empurrado
+    para a leitura). Demais filtros continuam a cargo de filtrar_dados.
+    """
+    disponiveis = set(ufs_particionadas(ano))
+    municipios = selecao.get("municipio_prova", [])
+    for uf in sorted(set(selecao.get("uf_prova", [])) & disponiveis):
+        dados = carregar_particao(ano, uf)
+        if not municipios:
+            yield uf, dados
+            continue
+        for fatia in dados.fatias_municipios(municipios):
+            yield uf, fatia
+
+def caminho_escolas(ano: int) -> str:
+    """Agregados por escola da edição, gerados por escolas_enem.py a partir dos resultados completos."""
+    return os.path.join(PASTA_DADOS, f"enem_{ano}_escolas.arrow")
+
+@st.cache_resource
+def _abrir_ranking(caminho: str, versao: float) -> RankingEscolas:
+    return abrir_ranking(caminho)
+
+def ranking_escolas(ano: int) -> RankingEscolas | None:
+    """Ranking de escolas da edição, ou None se os agregados por escola não foram gerados."""
+    caminho = caminho_escolas(ano)
+    if not os.path.exists(caminho):
+        return None
+    return _abrir_ranking(caminho, os.path.getmtime(caminho))
+
+# ========================
+# Funções cacheadas para extrair filtros
+# ========================
+
+# As opções vêm dos dicionários das partições (compartilhados por todas as UFs da
+# edição) e do índice de municípios nos metadados: nenhuma linha é lida
+
+@st.cache_data
+def _opcoes(ano: int, versao: float, coluna: str) -> List[str]:
+    ufs = ufs_particionadas(ano)
+    if not ufs:
+        return []
+    return sorted(carregar_particao(ano, ufs[0]).categorias(coluna))
+
+@st.cache_data
+def _municipios(ano: int, versao: float, uf_list: List[str]) -> List[str]:
+    disponiveis = set(ufs_particionadas(ano))
+    municipios = set()
+    for uf in set(uf_list) & disponiveis:
+        municipios.update(carregar_particao(ano, uf).indice_municipios)
+    return sorted(municipios)
+
+def get_ufs(ano: int) -> List[str]:
+    return ufs_particionadas(ano)
+
+def get_municipios(ano: int, uf_list: str | List[str]) -> List[str]:
+    if isinstance(uf_list, str):  # Caso seja só 1 UF na seleção
+        uf_list = [uf_list]
+    return _municipios(ano, versao_dataset(ano), sorted(uf_list))
+
+def get_sexos(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'sexo_labels')
+
+def get_faixas_etarias(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'faixa_etaria_labels')
+
+def get_estados_civis(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'estado_civil_labels')
+
+def get_cores_racas(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'cor_raca_labels')
+
+def get_escolaridades_pais(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'escolaridade_pai_labels')
+
+def get_escolaridades_maes(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'escolaridade_mae_labels')
+
+def get_rendas_familiares(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'renda_familiar_labels')
+
+def get_tipos_escola(ano: int) -> List[str]:
+    return _opcoes(ano, versao_dataset(ano), 'tipo_escola_em_labels')
+
+# ========================
+# Filtros e agregação
+# ========================
+# Os caches das agregações ficam só na memória (limitados por max_entries), sem persist="disk":
+# o st.cache_data não apaga do disco as entradas que saem da memória, e cada seleção, par de
+# grupos ou par de colunas explorado deixaria os seus pickles para sempre. Após um reinício,
+# a amostra responde enquanto as agregações exatas são refeitas.
+
+def filtrar_dados(dados: TabelaEnem, selecao: Selecao) -> np.ndarray:
+    """
+    Máscara booleana das linhas da tabela que atendem às seleções do usuário (a tabela
+    não é copiada nem filtrada). Considera UFs obrigatoriamente e municípios apenas se
+    existirem selecionados.
+    """
+    mask = np.ones(len(dados), dtype=bool)
+    for coluna in COLUNAS_FILTRO:
+        valores = selecao.get(coluna, [])
+        # Só aplica filtro de município se houver seleção
+        if coluna == "municipio_prova" and not valores:
+            continue
+        if isinstance(valores, str):
+            valores = [valores]
+        mask &= dados.isin(coluna, valores)
+    return mask
+
+# Parcial por UF: cada partição é agregada uma única vez por seleção e reaproveitada
+# por qualquer combinação de UFs que a contenha
+def _agregar_particao(selecao: Selecao, ano: int, uf: str) -> ParcialFiltro | None:
+    parcial = None
+    for _, dados in particoes(ano, {**selecao, "uf_prova": [uf]}):
+        atual = agregar_parcial(dados, filtrar_dados(dados, selecao))
+        parcial = atual if parcial is None else parcial.mesclar(atual)
+    return parcial
+
+@st.cache_data(max_entries=512)
+def _parcial_particao(selecao: Selecao, ano: int, uf: str, versao: float) -> ParcialFiltro:
+    return _agregar_particao(selecao, ano, uf)
+
+def _selecoes_ufs(selecao: Selecao, ano: int) -> Iterator[Tuple[str, Selecao]]:
+    """UFs selecionadas com partição, cada uma com só os seus municípios na seleção (chave dos parciais da UF)."""
+    for uf in sorted(set(selecao["uf_prova"]) & set(ufs_particionadas(ano))):
+        municipios = selecao["municipio_prova"]
+        if municipios:
+            municipios = sorted(set(municipios) & set(carregar_particao(ano, uf).indice_municipios))
+            if not municipios:
+                continue
+        yield uf, {**selecao, "municipio_prova": municipios}
+
+def _mesclar_ufs(selecao: Selecao, ano: int, parcial_uf: Callable[[Selecao, str], ParcialFiltro | None]) -> ResumoFiltro:
+    parciais = []
+    for uf, selecao_uf in _selecoes_ufs(selecao, ano):
+        parcial = parcial_uf(selecao_uf, uf)
+        if parcial is not None:
+            parciais.append(parcial)
+    if not parciais:  # Nenhuma linha selecionada: resumo vazio com as categorias da edição
+        return agregar_parcial(particao_referencia(ano).fatia(0, 0)).finalizar()
+    return reduce(ParcialFiltro.mesclar, parciais).finalizar()
+
+@st.cache_data(max_entries=64)
+def _resumo_filtrado(selecao: Selecao, ano: int, versao: float) -> ResumoFiltro:
+    return _mesclar_ufs(selecao, ano, lambda selecao_uf, uf: _parcial_particao(selecao_uf, ano, uf, versao))
+
+def resumo_filtrado(selecao: Selecao, ano: int) -> ResumoFiltro:
+    """
+    Agregação cacheada de uma seleção em uma edição. A ordem dos valores selecionados
+    não importa: a seleção é normalizada antes de virar chave do cache.
+    Só as partições das UFs selecionadas são lidas; os parciais de cada UF são mesclados.
+    """
+    return _resumo_filtrado(_normalizar(selecao), ano, versao_dataset(ano))
+
+def _normalizar(selecao: Selecao) -> Selecao:
+    return {coluna: sorted(selecao.get(coluna, [])) for coluna in COLUNAS_FILTRO}
+
+def chave_selecao(selecao: Selecao, ano: int) -> str:
+    """
+    Identifica a seleção numa versão dos dados de uma edição: chave barata para caches
+    derivados dos agregados (como o das figuras), que assim não precisam hashear os dados.
+    """
+    return json.dumps({"ano": ano, "versao": versao_dataset(ano), "selecao": _normalizar(selecao)}, sort_keys=True)
+
+def selecao_padrao(ano: int) -> Selecao:
+    """Seleção inicial da barra lateral: todas as categorias, sem filtro de município."""
+    return {
+        "uf_prova": get_ufs(ano),
+        "municipio_prova": [],
+        "sexo_labels": get_sexos(ano),
+        "faixa_etaria_labels": get_faixas_etarias(ano),
+        "estado_civil_labels": get_estados_civis(ano),
+        "cor_raca_labels": get_cores_racas(ano),
+        "escolaridade_pai_labels": get_escolaridades_pais(ano),
+        "escolaridade_mae_labels": get_escolaridades_maes(ano),
+        "renda_familiar_labels": get_rendas_familiares(ano),
+        "tipo_escola_em_labels": get_tipos_escola(ano)
+    }
+
+# ========================
+# Cruzamentos de duas colunas de rótulos
+# ========================
+# Mesmo esquema do resumo: o cruzamento de um par de colunas é agregado por UF (bincount
+# das células, ver agregacoes.agregar_cruzamento), guardado em cache e mesclado entre as
+# UFs selecionadas. Só o par pedido é calculado; os demais pares não custam nada.
+
+@st.cache_data(max_entries=512)
+def _cruzamento_particao(selecao: Selecao, ano: int, uf: str, versao: float,
+                         coluna_linhas: str, coluna_colunas: str) -> ParcialCruzamento | None:
+    parcial = None
+    for _, dados in particoes(ano, {**selecao, "uf_prova": [uf]}):
+        atual = agregar_cruzamento(dados, filtrar_dados(dados, selecao), coluna_linhas, coluna_colunas)
+        parcial = atual if parcial is None else parcial.mesclar(atual)
+    return parcial
+
+@st.cache_data(max_entries=64)
+def _cruzamento_filtrado(selecao: Selecao, ano: int, versao: float, coluna_linhas: str, coluna_colunas: str) -> CruzamentoNotas:
+    parciais = [
+        _cruzamento_particao(selecao_uf, ano, uf, versao, coluna_linhas, coluna_colunas)
+        for uf, selecao_uf in _selecoes_ufs(selecao, ano)
+    ]
+    parciais = [parcial for parcial in parciais if parcial is not None]
+    if not parciais:  # Nenhuma linha selecionada: células vazias com as categorias da edição
+        vazia = particao_referencia(ano).fatia(0, 0)
+        return agregar_cruzamento(vazia, np.zeros(0, dtype=bool), coluna_linhas, coluna_colunas).finalizar()
+    return reduce(ParcialCruzamento.mesclar, parciais).finalizar()
+
+def cruzamento_filtrado(selecao: Selecao, ano: int, coluna_linhas: str, coluna_colunas: str) -> CruzamentoNotas:
+    """Alunos e notas médias de cada par de rótulos (coluna_linhas x coluna_colunas) na seleção."""
+    return _cruzamento_filtrado(_normalizar(selecao), ano, versao_dataset(ano), coluna_linhas, coluna_colunas)
+
+# ========================
+# Comparação de grupos
+# ========================
+# Dois ou mais grupos (seleções completas, que podem se sobrepor) são agregados juntos: cada
+# partição da união das UFs é lida uma única vez e agregar_parciais calcula os parciais de
+# todos os grupos na mesma varredura. Trocar de grupo na tela não refaz a agregação.
+
+@st.cache_data(max_entries=64)
+def _resumos_grupos(selecoes: List[Selecao], ano: int, versao: float) -> List[ResumoFiltro]:
+    parciais: List[ParcialFiltro | None] = [None] * len(selecoes)
+    # Havendo grupo sem filtro de município, a partição é lida inteira
+    municipios = []
+    if all(selecao["municipio_prova"] for selecao in selecoes):
+        municipios = sorted(set().union(*(selecao["municipio_prova"] for selecao in selecoes)))
+    ufs = set().union(*(selecao["uf_prova"] for selecao in selecoes)) & set(ufs_particionadas(ano))
+    for uf in sorted(ufs):
+        for _, dados in particoes(ano, {"uf_prova": [uf], "municipio_prova": municipios}):
+            masks = [filtrar_dados(dados, selecao) for selecao in selecoes]
+            if not any(mask.any() for mask in masks):
+                continue
+            for i, atual in enumerate(agregar_parciais(dados, masks)):
+                parciais[i] = atual if parciais[i] is None else parciais[i].mesclar(atual)
+    # Grupo sem nenhuma linha: resumo vazio com as categorias da edição
+    vazio = agregar_parcial(particao_referencia(ano).fatia(0, 0))
+    return [(parcial or vazio).finalizar() for parcial in parciais]
+
+def resumos_grupos(selecoes: List[Selecao], ano: int) -> List[ResumoFiltro]:
+    """Um ResumoFiltro por seleção, calculados juntos numa única leitura das partições."""
+    return _resumos_grupos([_normalizar(selecao) for selecao in selecoes], ano, versao_dataset(ano))
+
+# ========================
+# Respostas progressivas (amostra primeiro, valor exato em segundo plano)
+# ========================
+# Uma seleção ainda não agregada é respondida na hora pela amostra estratificada, com
+# intervalos de confiança; a agregação exata (resumo_filtrado) roda num pool de threads do
+# processo e a página troca as estimativas pelos valores exatos quando ela termina.
+# Se o valor exato sair em até ESPERA_EXATO segundos, a estimativa nem é exibida.
+
+ESPERA_EXATO = 0.3
+MAX_REFINAMENTOS = 64
+NOME_THREAD_REFINAMENTO = "refinamento-exato"
+
+@st.cache_data(max_entries=256)
+def _resumo_aproximado(selecao: Selecao, ano: int, versao: float) -> ResumoAproximado:
+    amostra = carregar_amostra(ano)
+    return agregar_amostra(amostra, filtrar_dados(amostra, selecao))
+
+def resumo_aproximado(selecao: Selecao, ano: int) -> ResumoAproximado:
+    """Estimativas de uma seleção a partir da amostra estratificada (com intervalos de 95%)."""
+    return _resumo_aproximado(_normalizar(selecao), ano, versao_dataset(ano))
+
+class _Refinamentos:
+    """Agregações exatas em andamento ou concluídas, compartilhadas entre as sessões do processo."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=NOME_THREAD_REFINAMENTO)
+        self.futuros: "OrderedDict[str, Future]" = OrderedDict()
+        self.trava = threading.Lock()
+
+    def disparar(self, selecao: Selecao, ano: int) -> Future:
+        chave = json.dumps([ano, selecao], ensure_ascii=False)
+        with self.trava:
+            futuro = self.futuros.get(chave)
+            if futuro is not None:
+                self.futuros.move_to_end(chave)
+                return futuro
+            futuro = self.futuros[chave] = self.executor.submit(_resumo_filtrado, selecao, ano, versao_dataset(ano))
+            # Os resultados ficam no cache do _resumo_filtrado; aqui só o estado das tarefas
+            while len(self.futuros) > MAX_REFINAMENTOS and next(iter(self.futuros.values())).done():
+                self.futuros.popitem(last=False)
+        # Fora da trava: o callback roda aqui mesmo se a tarefa já tiver terminado
+        futuro.add_done_callback(lambda concluido: self._descartar_falha(chave, concluido))
+        return futuro
+
+    def _descartar_falha(self, chave: str, futuro: Future):
+        """Tira do registro uma tarefa que falhou: a próxima chamada refaz o cálculo em vez de repetir o erro."""
+        if futuro.exception() is None:
+            return
+        with self.trava:
+            if self.futuros.get(chave) is futuro:
+                del self.futuros[chave]
+
+    def pendente(self, selecao: Selecao, ano: int) -> bool:
+        """Se há cálculo em andamento para a seleção (sem disparar um novo)."""
+        with self.trava:
+            futuro = self.futuros.get(json.dumps([ano, selecao], ensure_ascii=False))
+        return futuro is not None and not futuro.done()
+
+@st.cache_resource
+def _refinamentos() -> _Refinamentos:
+    _filtrar_aviso_sem_contexto()
+    return _Refinamentos()
+
+def resumo_progressivo(selecao: Selecao, ano: int, espera: float | None = ESPERA_EXATO) -> Tuple[ResumoFiltro, ResumoAproximado | None]:
+    """
+    Resumo da seleção para exibir agora: o exato, se ficar pronto em até 'espera' segundos
+    (None = esperar o cálculo; ele segue em segundo plano caso contrário), ou o estimado pela amostra.
+    Devolve (resumo, estimativas); 'estimativas' é None quando o resumo é o exato.
+    """
+    futuro = _refinamentos().disparar(_normalizar(selecao), ano)
+    wait([futuro], timeout=espera)
+    if futuro.done():
+        return futuro.result(), None  # Repassa uma eventual falha do cálculo exato
+    aproximado = resumo_aproximado(selecao, ano)
+    return aproximado.resumo, aproximado
+
+def refinamento_pendente(selecao: Selecao, ano: int) -> bool:
+    """Se o cálculo exato da seleção ainda está em andamento."""
+    return _refinamentos().pendente(_normalizar(selecao), ano)
+
+# ========================
+# Aquecimento dos caches
+# ========================
+
+NOME_THREAD_AQUECIMENTO = "aquecimento-caches"
+
+class _IgnorarAvisoSemContexto(logging.Filter):
+    """As threads de aquecimento e de refinamento não pertencem a nenhuma sessão; o aviso de 'missing ScriptRunContext' é esperado."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not threading.current_thread().name.startswith((NOME_THREAD_AQUECIMENTO, NOME_THREAD_REFINAMENTO))
+
+@st.cache_resource
+def _filtrar_aviso_sem_contexto():
+    """Instala o filtro do aviso uma única vez por processo (refinamento e aquecimento o pedem)."""
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_IgnorarAvisoSemContexto())
+
+def aquecer_caches():
+    """Carrega a edição mais recente, os filtros e a agregação da visão padrão."""
+    try:
+        ano = max(anos_disponiveis())
+        selecao = selecao_padrao(ano)
+        get_municipios(ano, selecao["uf_prova"])
+        # Uma única agregação: o refinamento grava no mesmo cache do resumo_filtrado, então
+        # as duas formas da página (com e sem respostas rápidas) saem aquecidas
+        resumo_progressivo(selecao, ano, espera=None)
+        logger.info("Caches do dashboard aquecidos.")
+    except Exception:
+        logger.exception("Falha ao aquecer os caches do dashboard.")
+
+@st.cache_resource
+def iniciar_aquecimento() -> threading.Thread:
+    """Dispara, uma única vez por processo, o aquecimento dos caches em segundo plano."""
+    _filtrar_aviso_sem_contexto()
+    thread = threading.Thread(target=aquecer_caches, name=NOME_THREAD_AQUECIMENTO, daemon=True)
+    thread.start()
+    return thread
@@ -1,82 +1,93 @@
+import logging
+import os
+import time
 from typing import List
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-from ml_notas import clusters_colegio_teste
+from agregacoes import NBINS_SKETCH, NOTA_MAXIMA, RESOLUCAO_SKETCH, ResumoFiltro, SketchNotas, top_n
+from codebook_enem import ordem_rotulos, ordenar_rotulos
+from dados_enem import (
+    anos_disponiveis,
+    chave_selecao,
+    colunas_dataset,
+    cruzamento_filtrado,
+    get_cores_racas,
+    get_escolaridades_maes,
+    get_escolaridades_pais,
+    get_estados_civis,
+    get_faixas_etarias,
+    get_municipios,
+    get_rendas_familiares,
+    get_sexos,
+    get_tipos_escola,
+    get_ufs,
+    iniciar_aquecimento,
+    ranking_escolas,
+    refinamento_pendente,
+    resumo_filtrado,
+    resumo_progressivo,
+    resumos_grupos
+)
+from exportacao import FORMATOS, arquivo_exportacao, caminho_exportacao
+from figuras_plotly import figura
+
+logger = logging.getLogger(__name__)
+
+# Início da execução (para a métrica de tempo até a primeira renderização)
+inicio_execucao = time.perf_counter()
 
 # --- Configurações da página --- #
 # Título, ícone e layout da página
 st.set_page_config(
-    page_title="Dashboard ENEM 2024 + Machine learning",
+    page_title="Dashboard ENEM + Machine learning",
     page_icon=":books:",
     layout="wide"
 )
 
+# Aquece, em segundo plano e uma vez por processo, os dados e a visão padrão
+iniciar_aquecimento()
+
 # Menu lateral de navegação
 st.sidebar.title("Navegação")
-pagina = st.sidebar.radio("Ir para:", ["📊 Dados e Filtros - ENEM 2024", "🤖 Algoritmos de clusterização - Colégio Teste"])
+pagina = st.sidebar.radio("Ir para:", ["📊 Dados e Filtros - ENEM", "🤖 Algoritmos de clusterização - Colégio Teste"])
 
 # ======================
 # ABA 1 - VISÃO GERAL
 # ======================
 
-if pagina == "📊 Dados e Filtros - ENEM 2024":
-    # --- Função cacheada para carregar os dados --- #
-    @st.cache_data
-    def carregar_df():
-        return pd.read_csv("data/enem_2024_dash_sample.csv", sep=";", encoding="latin1")
-
-    # Chamada da função
-    df = carregar_df()
-
-    # --- Funções cacheadas para extrair filtros --- #
-    @st.cache_data
-    def get_ufs(df: pd.DataFrame) -> List[str]:
-        return sorted(df["uf_prova"].unique())
-
-    @st.cache_data
-    def get_municipios(df: pd.DataFrame, uf_list: str | List[str]) -> List[str]:
-        if isinstance(uf_list, str):  # Caso seja só 1 UF na seleção
-            uf_list = [uf_list]
-        return sorted(df[df["uf_prova"].isin(uf_list)]["municipio_prova"].unique())
-
-    @st.cache_data
-    def get_sexos(df: pd.DataFrame) -> List[str]:
-        return sorted(df['sexo_labels'].unique())
-
-    @st.cache_data
-    def get_faixas_etarias(df: pd.DataFrame) -> List[str]:
-        return sorted(df['faixa_etaria_labels'].unique())
-
-    @st.cache_data
-    def get_estados_civis(df: pd.DataFrame) -> List[str]:
-        return sorted(df['estado_civil_labels'].unique())
-
-    @st.cache_data
-    def get_cores_racas(df: pd.DataFrame) -> List[str]:
-        return sorted(df['cor_raca_labels'].unique())
+if pagina == "📊 Dados e Filtros - ENEM":
+    # --- Barra lateral (Filtros) --- #
+    st.sidebar.header(":mag: --- Filtros --- :mag_right:")
 
-    @st.cache_data
-    def get_escolaridades_pais(df: pd.DataFrame) -> List[str]:
-        return sorted(df['escolaridade_pai_labels'].unique())
+    # --- Filtro de edição (ano) --- #
+    edicoes_disponiveis = anos_disponiveis()
+    if not edicoes_disponiveis:
+        st.error("Nenhuma partição do dataset foi encontrada na pasta de dados.")
+        st.stop()
 
-    @st.cache_data
-    def get_escolaridades_maes(df: pd.DataFrame) -> List[str]:
-        return sorted(df['escolaridade_mae_labels'].unique())
+    if "anos_selecionados" not in st.session_state:
+        st.session_state["anos_selecionados"] = edicoes_disponiveis[-1:]
 
-    @st.cache_data
-    def get_rendas_familiares(df: pd.DataFrame) -> List[str]:
-        return sorted(df['renda_familiar_labels'].unique())
+    anos_selecionados = st.sidebar.multiselect(
+        "Edição (ano)",
+        edicoes_disponiveis,
+        key="anos_selecionados"
+    )
+    anos_selecionados = sorted(anos_selecionados) or edicoes_disponiveis[-1:]
 
-    @st.cache_data
-    def get_tipos_escola(df: pd.DataFrame) -> List[str]:
-        return sorted(df['tipo_escola_em_labels'].unique())
+    # A edição mais recente selecionada é a referência dos gráficos; as demais entram nas comparações
+    ano_referencia = anos_selecionados[-1]
+    ano_anterior = anos_selecionados[-2] if len(anos_selecionados) > 1 else None
 
-    # --- Barra lateral (Filtros) --- #
-    st.sidebar.header(":mag: --- Filtros --- :mag_right:")
+    # --- Opções dos filtros: vêm dos metadados das partições das edições selecionadas --- #
+    def unir_opcoes(funcao, *args) -> List[str]:
+        """União das opções de um filtro entre as edições selecionadas."""
+        return sorted(set().union(*(funcao(ano, *args) for ano in anos_selecionados)))
 
     # --- Filtro de UF --- #
-    ufs_disponiveis = get_ufs(df)
+    ufs_disponiveis = unir_opcoes(get_ufs)
 
     if "ufs_selecionadas" not in st.session_state:
         st.session_state["ufs_selecionadas"] = ufs_disponiveis.copy()
@@ -92,7 +103,7 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de município (dependente do(s) estado(s) selecionados(s)) --- #
-    municipios_disponiveis = get_municipios(df, ufs_selecionadas)
+    municipios_disponiveis = unir_opcoes(get_municipios, ufs_selecionadas)
 
     # Inicializações no session_state
     if "municipios_visiveis" not in st.session_state:
@@ -144,7 +155,7 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.sidebar.write("Municípios selecionados:", st.session_state["municipios_visiveis"])
             
     # --- Filtro de sexo --- #
-    sexos_disponiveis = get_sexos(df)
+    sexos_disponiveis = ordenar_rotulos("sexo_labels", unir_opcoes(get_sexos))
     sexos_selecionados = st.sidebar.multiselect(
         "Sexo",
         options=sexos_disponiveis,
@@ -152,11 +163,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
     )
 
     # --- Filtro de faixa etária --- #
-    faixas_etarias_disponiveis = get_faixas_etarias(df)
+    faixas_etarias_disponiveis = unir_opcoes(get_faixas_etarias)
 
-    # Reordenação
-    faixas_reordenadas = (["Até 16"] if "Até 16" in faixas_etarias_disponiveis else []) + \
-                        [faixa for faixa in faixas_etarias_disponiveis if faixa != "Até 16"]
+    # Reordenação (ordem do codebook do pré-processamento)
+    faixas_reordenadas = ordenar_rotulos("faixa_etaria_labels", faixas_etarias_disponiveis)
 
     if "faixas_etarias_selecionadas" not in st.session_state:
         st.session_state["faixas_etarias_selecionadas"] = faixas_reordenadas.copy()
@@ -172,12 +182,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de estado civil --- #
-    estados_civis_disponiveis = get_estados_civis(df)
-
-    # Reordenação
-    ordem_ec = ["Não informado", "Solteiro(a)", "Casado(a)/Mora com companheiro(a)", "Divorciado(a)/Desquitado(a)/Separado(a)", "Viúvo(a)"]
+    estados_civis_disponiveis = unir_opcoes(get_estados_civis)
 
-    estados_civis_reordenados = [ec for ec in ordem_ec if ec in estados_civis_disponiveis]
+    # Reordenação (ordem do codebook do pré-processamento)
+    estados_civis_reordenados = ordenar_rotulos("estado_civil_labels", estados_civis_disponiveis)
 
     if "estados_civis_selecionados" not in st.session_state:
         st.session_state["estados_civis_selecionados"] = estados_civis_reordenados.copy()
@@ -193,18 +201,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de cor/raça --- #
-    cores_racas_disponiveis = get_cores_racas(df)
+    cores_racas_disponiveis = unir_opcoes(get_cores_racas)
 
-    # Reordenação
-    ordem_cr = ["Não declarado",
-                "Branca",
-                "Preta",
-                "Parda",
-                "Amarela",
-                "Indígena",
-                "Não dispõe da informação"]
-
-    cores_racas_reordenadas = [cr for cr in ordem_cr if cr in cores_racas_disponiveis]
+    # Reordenação (ordem do codebook do pré-processamento)
+    cores_racas_reordenadas = ordenar_rotulos("cor_raca_labels", cores_racas_disponiveis)
 
     if "cores_racas_selecionadas" not in st.session_state:
         st.session_state["cores_racas_selecionadas"] = cores_racas_reordenadas.copy()
@@ -220,19 +220,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de escolaridade do pai --- #
-    escolaridades_pais_disponiveis = get_escolaridades_pais(df)
-
-    # Reordenação
-    ordem_esc = ["Nunca estudou",
-                "Fundamental I incompleto",
-                "Fundamental I completo, mas não Fundamental II",
-                "Fundamental II completo, mas não Médio",
-                "Médio completo",
-                "Superior completo",
-                "Pós-graduação",
-                "Não sei"]
+    escolaridades_pais_disponiveis = unir_opcoes(get_escolaridades_pais)
 
-    escolaridades_pais_reordenadas = [esc for esc in ordem_esc if esc in escolaridades_pais_disponiveis]
+    # Reordenação (ordem do codebook do pré-processamento)
+    escolaridades_pais_reordenadas = ordenar_rotulos("escolaridade_pai_labels", escolaridades_pais_disponiveis)
 
     if "escolaridades_pais_selecionadas" not in st.session_state:
         st.session_state["escolaridades_pais_selecionadas"] = escolaridades_pais_reordenadas.copy()
@@ -248,19 +239,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de escolaridade da mãe --- #
-    escolaridades_maes_disponiveis = get_escolaridades_maes(df)
+    escolaridades_maes_disponiveis = unir_opcoes(get_escolaridades_maes)
 
-    # Reordenação
-    ordem_esc = ["Nunca estudou",
-                "Fundamental I incompleto",
-                "Fundamental I completo, mas não Fundamental II",
-                "Fundamental II completo, mas não Médio",
-                "Médio completo",
-                "Superior completo",
-                "Pós-graduação",
-                "Não sei"]
-
-    escolaridades_maes_reordenadas = [esc for esc in ordem_esc if esc in escolaridades_maes_disponiveis]
+    # Reordenação (ordem do codebook do pré-processamento)
+    escolaridades_maes_reordenadas = ordenar_rotulos("escolaridade_mae_labels", escolaridades_maes_disponiveis)
 
     if "escolaridades_maes_selecionadas" not in st.session_state:
         st.session_state["escolaridades_maes_selecionadas"] = escolaridades_maes_reordenadas.copy()
@@ -276,19 +258,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de renda familiar --- #
-    rendas_familiares_disponiveis = get_rendas_familiares(df)
-
-    # Reordenação
-    ordem_rf = ["Nenhuma renda",
-                "Muito baixa (até 2 SM)",
-                "Baixa (2-4 SM)",
-                "Média-baixa (4-7 SM)",
-                "Média (7-10 SM)",
-                "Média-alta (10-15 SM)",
-                "Alta (15-20 SM)",
-                "Muito alta (20+ SM)"]
+    rendas_familiares_disponiveis = unir_opcoes(get_rendas_familiares)
 
-    rendas_familiares_reordenadas = [rf for rf in ordem_rf if rf in rendas_familiares_disponiveis]
+    # Reordenação (ordem do codebook do pré-processamento)
+    rendas_familiares_reordenadas = ordenar_rotulos("renda_familiar_labels", rendas_familiares_disponiveis)
 
     if "rendas_familiares_selecionadas" not in st.session_state:
         st.session_state["rendas_familiares_selecionadas"] = rendas_familiares_reordenadas.copy()
@@ -304,17 +277,10 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.rerun()
 
     # --- Filtro de tipo de escola --- #
-    tipos_escola_disponiveis = get_tipos_escola(df)
+    tipos_escola_disponiveis = unir_opcoes(get_tipos_escola)
 
-    # Reordenação
-    ordem_te = ["Não frequentou EM",
-                "Somente escola pública",
-                "Escola pública + privada (com bolsa)",
-                "Escola pública + privada (sem bolsa)",
-                "Somente escola privada (com bolsa)",
-                "Somente escola privada (sem bolsa)"]
-
-    tipos_escola_reordenados = [te for te in ordem_te if te in tipos_escola_disponiveis]
+    # Reordenação (ordem do codebook do pré-processamento)
+    tipos_escola_reordenados = ordenar_rotulos("tipo_escola_em_labels", tipos_escola_disponiveis)
 
     if "tipos_escola_selecionados" not in st.session_state:
         st.session_state["tipos_escola_selecionados"] = tipos_escola_reordenados.copy()
@@ -329,114 +295,148 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
         st.session_state.pop("tipos_escola_selecionados")
         st.rerun()
 
+    # --- Respostas rápidas (estimativas por amostra enquanto o cálculo exato roda) --- #
+    if "respostas_rapidas" not in st.session_state:
+        st.session_state["respostas_rapidas"] = True
+
+    respostas_rapidas = st.sidebar.toggle(
+        "⚡ Respostas rápidas",
+        key="respostas_rapidas",
+        help="Seleções ainda não calculadas aparecem primeiro com estimativas de uma amostra estratificada por UF e município, com intervalos de confiança de 95%; os valores exatos substituem as estimativas assim que ficam prontos."
+    )
+
     # --- Aplicando filtros no DataFrame --- #
-    def filtrar_dados(
-        df: pd.DataFrame,
-        ufs_selecionadas: List[str],
-        sexos_selecionados: List[str],
-        faixas_etarias_selecionadas: List[str],
-        estados_civis_selecionados: List[str],
-        cores_racas_selecionadas: List[str],
-        escolaridades_pais_selecionadas: List[str],
-        escolaridades_maes_selecionadas: List[str],
-        rendas_familiares_selecionadas: List[str],
-        tipos_escola_selecionados: List[str]
-    ):
-        """
-        Aplica filtros no DataFrame de acordo com as seleções do usuário.
-        Considera UFs obrigatoriamente e municípios apenas se existirem selecionados.
-        """
-
-        # Se houver municípios visíveis no session_state, usa eles
-        municipios_tratados = (
-            st.session_state["municipios_visiveis"]
-            if len(st.session_state["municipios_visiveis"]) > 0
-            else None
+    selecao = {
+        "uf_prova": ufs_selecionadas,
+        "municipio_prova": st.session_state["municipios_visiveis"],
+        "sexo_labels": sexos_selecionados,
+        "faixa_etaria_labels": faixas_etarias_selecionadas,
+        "estado_civil_labels": estados_civis_selecionados,
+        "cor_raca_labels": cores_racas_selecionadas,
+        "escolaridade_pai_labels": escolaridades_pais_selecionadas,
+        "escolaridade_mae_labels": escolaridades_maes_selecionadas,
+        "renda_familiar_labels": rendas_familiares_selecionadas,
+        "tipo_escola_em_labels": tipos_escola_selecionados
+    }
+
+    # --- Histograma a partir das contagens pré-agregadas --- #
+    def histograma_agregado(resumo, chave: tuple, coluna: str, title: str, labels: dict, cor: str):
+        contagens, bordas = resumo.histogramas[coluna]
+        centros = (bordas[:-1] + bordas[1:]) / 2
+        # Marcadores de P10, mediana e P90
+        marcadores = [
+            ("add_vline", dict(
+                x=valor,
+                line_dash="dash",
+                line_color="grey",
+                annotation_text="Mediana" if q == 0.5 else f"P{q * 100:.0f}"
+            ))
+            for q, valor in resumo.percentis(coluna).items()
+        ]
+        return figura(
+            px.bar,
+            chave=(chave, "histograma", coluna),
+            x=centros,
+            y=contagens,
+            title=title,
+            labels={"x": labels[coluna], "y": "Quantidade"},
+            ajustes=[
+                ("update_traces", dict(width=bordas[1] - bordas[0], marker_color=cor)),
+                ("update_layout", dict(bargap=0, yaxis_title="Quantidade", title_x=0.1)),
+                *marcadores
+            ]
         )
 
-        # Começa filtrando pelas UFs
-        mask = df['uf_prova'].isin(ufs_selecionadas)
-
-        # Só aplica filtro de município se houver seleção
-        if municipios_tratados:
-            if isinstance(municipios_tratados, str):
-                municipios_tratados = [municipios_tratados]
-            mask &= df["municipio_prova"].isin(municipios_tratados)
-
-        # Aplica os demais filtros
-        mask &= df['sexo_labels'].isin(sexos_selecionados)
-        mask &= df['faixa_etaria_labels'].isin(faixas_etarias_selecionadas)
-        mask &= df['estado_civil_labels'].isin(estados_civis_selecionados)
-        mask &= df['cor_raca_labels'].isin(cores_racas_selecionadas)
-        mask &= df['escolaridade_pai_labels'].isin(escolaridades_pais_selecionadas)
-        mask &= df['escolaridade_mae_labels'].isin(escolaridades_maes_selecionadas)
-        mask &= df['renda_familiar_labels'].isin(rendas_familiares_selecionadas)
-        mask &= df['tipo_escola_em_labels'].isin(tipos_escola_selecionados)
-
-        return df[mask]
-
-    df_filtrado = filtrar_dados(
-        df,
-        ufs_selecionadas,
-        sexos_selecionados,
-        faixas_etarias_selecionadas,
-        estados_civis_selecionados,
-        cores_racas_selecionadas,
-        escolaridades_pais_selecionadas,
-        escolaridades_maes_selecionadas,
-        rendas_familiares_selecionadas,
-        tipos_escola_selecionados,
-    )
+    # Áreas avaliadas (coluna, rótulo), na ordem das métricas
+    AREAS_NOTAS = [
+        ("nota_ciencias_natureza", "Ciências da Natureza"),
+        ("nota_ciencias_humanas", "Ciências Humanas"),
+        ("nota_linguagens_codigos", "Linguagens e Códigos"),
+        ("nota_matematica", "Matemática"),
+        ("nota_redacao", "Redação"),
+        ("nota_somatoria", "Somatória")
+    ]
 
     # --- Página principal --- #
     st.markdown("Por conta do tamanho do dataset original (+ de 4 milhões de linhas), ficou impraticável trabalhar com ele em ferramentas como o GitHub e o Streamlit; como medida paliativa, extraiu-se um sample ponderado pelas UFs e pelos municípos, com 156 mil linhas.")
     st.markdown("---")
-    st.title(":books: Dashboard para análise dos microdados do ENEM 2024")
-    st.markdown("Explore os dados dos participantes do ENEM 2024. Utilize os filtros à esquerda para refinar suas análises.")
+    st.title(f":books: Dashboard para análise dos microdados do ENEM {ano_referencia}")
+    st.markdown(f"Explore os dados dos participantes do ENEM {ano_referencia}. Utilize os filtros à esquerda para refinar suas análises e selecione mais de uma edição para comparar os anos.")
 
     # --- Métricas gerais --- #
     st.subheader("Métricas gerais")
     st.markdown("Médias das notas obtidas em cada uma das 5 áreas avaliadas, além da média da somatória dessas mesmas notas.")
 
-    if not df_filtrado.empty:
-        # Cria a coluna com a média da somatória das notas
-        df_filtrado["nota_somatoria"] = df_filtrado[[
-            "nota_redacao",
-            "nota_ciencias_natureza",
-            "nota_ciencias_humanas",
-            "nota_matematica",
-            "nota_linguagens_codigos"
-        ]].mean(axis=1)
-
-        total_inscritos = df_filtrado.shape[0]
-        media_natureza = df_filtrado["nota_ciencias_natureza"].mean()
-        media_humanas = df_filtrado["nota_ciencias_humanas"].mean()
-        media_linguagens = df_filtrado["nota_linguagens_codigos"].mean()
-        media_matematica = df_filtrado["nota_matematica"].mean()
-        media_redacao = df_filtrado["nota_redacao"].mean()
-        media_somatoria = df_filtrado["nota_somatoria"].mean()
-        maxima_natureza = df_filtrado["nota_ciencias_natureza"].max()
-        maxima_humanas = df_filtrado["nota_ciencias_humanas"].max()
-        maxima_linguagens = df_filtrado["nota_linguagens_codigos"].max()
-        maxima_matematica = df_filtrado["nota_matematica"].max()
-        maxima_redacao = df_filtrado["nota_redacao"].max()
-        maxima_somatoria = df_filtrado["nota_somatoria"].max() 
+    # Agregação única (métricas, contagens, histogramas e rankings) sobre as linhas filtradas;
+    # com respostas rápidas, as edições ainda em cálculo vêm estimadas pela amostra
+    if respostas_rapidas:
+        progressivos = {ano: resumo_progressivo(selecao, ano) for ano in anos_selecionados}
+        resumos = {ano: resumo for ano, (resumo, _) in progressivos.items()}
+        estimativas = {ano: estimativa for ano, (_, estimativa) in progressivos.items() if estimativa is not None}
+    else:
+        resumos = {ano: resumo_filtrado(selecao, ano) for ano in anos_selecionados}
+        estimativas = {}
+    resumo = resumos[ano_referencia]
+    estimativa = estimativas.get(ano_referencia)
+    # Identidade dos dados de cada resumo para o cache de figuras (o estimado e o exato diferem)
+    chaves = {ano: (chave_selecao(selecao, ano), ano in estimativas) for ano in anos_selecionados}
+    chave_resumo = chaves[ano_referencia]
+    sem_dados = resumo.total == 0
+
+    def formatar_media(coluna: str, valor: float) -> str:
+        """Nota média, com a margem do intervalo de 95% quando ela é estimada."""
+        if estimativa is None or sem_dados:
+            return f"{valor:.1f}"
+        return f"{valor:.1f} ± {estimativa.intervalos[coluna]:.1f}"
+
+    # Só é exibido enquanto há estimativas na página. Quando o cálculo exato termina, a página
+    # inteira é reexecutada e, já sem estimativas, não chama mais o fragmento: o temporizador
+    # dele deixa de existir e a sessão para de consultar o andamento
+    @st.fragment(run_every=0.5)
+    def aguardar_refinamento(selecao: dict, anos: List[int]):
+        """Acompanha o cálculo exato e recarrega a página com os valores exatos quando ele termina."""
+        if not any(refinamento_pendente(selecao, ano) for ano in anos):
+            st.rerun(scope="app")
+
+    def delta_anual(coluna: str):
+        """Variação da nota média em relação à edição anterior selecionada."""
+        if ano_anterior is None or sem_dados or resumos[ano_anterior].total == 0:
+            return None
+        return f"{resumo.medias[coluna] - resumos[ano_anterior].medias[coluna]:+.1f} vs {ano_anterior}"
+
+    if not sem_dados:
+        total_inscritos = resumo.total
+        media_natureza = resumo.medias["nota_ciencias_natureza"]
+        media_humanas = resumo.medias["nota_ciencias_humanas"]
+        media_linguagens = resumo.medias["nota_linguagens_codigos"]
+        media_matematica = resumo.medias["nota_matematica"]
+        media_redacao = resumo.medias["nota_redacao"]
+        media_somatoria = resumo.medias["nota_somatoria"]
+        maxima_natureza = resumo.maximas["nota_ciencias_natureza"]
+        maxima_humanas = resumo.maximas["nota_ciencias_humanas"]
+        maxima_linguagens = resumo.maximas["nota_linguagens_codigos"]
+        maxima_matematica = resumo.maximas["nota_matematica"]
+        maxima_redacao = resumo.maximas["nota_redacao"]
+        maxima_somatoria = resumo.maximas["nota_somatoria"]
     else:
         total_inscritos = 0
         media_natureza, media_humanas, media_linguagens, media_matematica, media_redacao, media_somatoria = 0, 0, 0, 0, 0, 0
         maxima_natureza, maxima_humanas, maxima_linguagens, maxima_matematica, maxima_redacao, maxima_somatoria = 0, 0, 0, 0, 0, 0
         
+    texto_total = f"{total_inscritos:,}"
+    if estimativa is not None and not sem_dados:
+        texto_total = f"≈ {texto_total} (± {estimativa.intervalo_total:,.0f})"
     st.markdown(
-        f"<h3 style='text-align: center;'>Total de inscritos: {total_inscritos:,}".replace(",", ".") + "</h3>",
+        f"<h3 style='text-align: center;'>Total de inscritos: {texto_total}".replace(",", ".") + "</h3>",
         unsafe_allow_html=True
     )
     col1, col2, col3, col4, col5, col6 = st.columns(6)
-    col1.metric("Ciências da Natureza - Nota média", f"{media_natureza:.1f}")
-    col2.metric("Ciências Humanas - Nota média", f"{media_humanas:.1f}")
-    col3.metric("Linguagens e Códigos - Nota média", f"{media_linguagens:.1f}")
-    col4.metric("Matemática - Nota média", f"{media_matematica:.1f}")
-    col5.metric("Redação - Nota média", f"{media_redacao:.1f}")
-    col6.metric("Somatória - Nota média", f"{media_somatoria:.1f}")
+    col1.metric("Ciências da Natureza - Nota média", formatar_media("nota_ciencias_natureza", media_natureza), delta=delta_anual("nota_ciencias_natureza"))
+    col2.metric("Ciências Humanas - Nota média", formatar_media("nota_ciencias_humanas", media_humanas), delta=delta_anual("nota_ciencias_humanas"))
+    col3.metric("Linguagens e Códigos - Nota média", formatar_media("nota_linguagens_codigos", media_linguagens), delta=delta_anual("nota_linguagens_codigos"))
+    col4.metric("Matemática - Nota média", formatar_media("nota_matematica", media_matematica), delta=delta_anual("nota_matematica"))
+    col5.metric("Redação - Nota média", formatar_media("nota_redacao", media_redacao), delta=delta_anual("nota_redacao"))
+    col6.metric("Somatória - Nota média", formatar_media("nota_somatoria", media_somatoria), delta=delta_anual("nota_somatoria"))
     col7, col8, col9, col10, col11, col12 = st.columns(6)
     col7.metric("Ciências da Natureza - Nota máxima", f"{maxima_natureza:.1f}")
     col8.metric("Ciências Humanas - Nota máxima", f"{maxima_humanas:.1f}")
@@ -444,419 +444,794 @@ if pagina == "📊 Dados e Filtros - ENEM 2024":
     col10.metric("Matemática - Nota máxima", f"{maxima_matematica:.1f}")
     col11.metric("Redação - Nota máxima", f"{maxima_redacao:.1f}")
     col12.metric("Somatória - Nota máxima", f"{maxima_somatoria:.1f}")
-    st.markdown("---")
 
-    # --- Visualizações --- #
-    st.subheader("Visualizações gráficas")
-    st.markdown("Abaixo, encontram-se gráficos que fixam, de acordo com os filtros aplicados, proporções entre aspectos sociais dos estudantes, tais como (i) sexos, (ii) cores/raças, (iii) estados civis e (iv) tipos de escola em que eles frequentaram no Ensino Médio.")
-
-    col_graf1, col_graf2 = st.columns(2)
-
-    with col_graf1:
-        if not df_filtrado.empty:
-            sexo_contagem = df_filtrado['sexo_labels'].value_counts().reset_index()
-            sexo_contagem.columns = ['sexo', 'quantidade']
-            grafico_sexo = px.pie(
-                sexo_contagem,
-                names='sexo',
-                values='quantidade',
-                title='Sexos',
-                hole=0.4,
-                color='sexo',
-                color_discrete_map={
-                    "Masculino": "blue",
-                    "Feminino": "red"
-                }
-            )
-            grafico_sexo.update_traces(textinfo='percent+label')
-            grafico_sexo.update_layout(
-                showlegend=False
+    # Medianas e faixas P10-P90 a partir dos sketches de quantis
+    linha_medianas = st.columns(6)
+    linha_faixas = st.columns(6)
+    for col_mediana, col_faixa, (coluna, area) in zip(linha_medianas, linha_faixas, AREAS_NOTAS):
+        percentis = resumo.percentis(coluna) if not sem_dados else {0.1: 0, 0.5: 0, 0.9: 0}
+        col_mediana.metric(f"{area} - Mediana", f"{percentis[0.5]:.1f}")
+        col_faixa.metric(f"{area} - P10 / P90", f"{percentis[0.1]:.0f} / {percentis[0.9]:.0f}")
+    st.caption(f"Medianas e percentis calculados a partir de sketches de quantis mescláveis (erro máximo de ±{SketchNotas.erro_maximo} ponto).")
+
+    if estimativas:
+        edicoes = ", ".join(str(ano) for ano in sorted(estimativas))
+        alunos_amostra = f"{sum(e.n_amostra for e in estimativas.values()):,}".replace(",", ".")
+        st.info(
+            f"⏳ Valores estimados ({edicoes}) a partir de uma amostra estratificada por UF e município "
+            f"({alunos_amostra} alunos da amostra na seleção), com intervalos de confiança de 95% "
+            "no total e nas médias. Máximas, percentis e gráficos também são estimativas. "
+            "Os valores exatos serão exibidos assim que o cálculo terminar."
+        )
+        aguardar_refinamento(selecao, list(estimativas))
+
+    # --- Evolução entre as edições selecionadas --- #
+    if len(anos_selecionados) > 1:
+        evolucao = pd.DataFrame([
+            {"Ano": str(ano), "Área": area, "Nota média": r.medias[coluna]}
+            for ano, r in resumos.items() if r.total > 0
+            for coluna, area in AREAS_NOTAS
+        ])
+        if not evolucao.empty:
+            grafico_evolucao = figura(
+                px.line,
+                evolucao,
+                chave=("evolucao", tuple(chaves.values())),
+                x="Ano",
+                y="Nota média",
+                color="Área",
+                markers=True,
+                title="Evolução das notas médias entre as edições selecionadas"
             )
-            st.plotly_chart(grafico_sexo, use_container_width=True)
-        else:
-            st.warning("Nenhum dado para ser exibido nos gráficos. Cheque os filtros.")
+            st.plotly_chart(grafico_evolucao, use_container_width=True)
+    st.markdown("---")
 
-    with col_graf2:
-        if not df_filtrado.empty:
-            cor_raca_contagem = df_filtrado['cor_raca_labels'].value_counts().reset_index()
-            cor_raca_contagem.columns = ['cor_raca', 'quantidade']
-            grafico_cor_raca = px.pie(
-                cor_raca_contagem,
-                names='cor_raca',
-                values='quantidade',
-                title='Cores/raças',
-                hole=0.4,
-                color='cor_raca',
-                color_discrete_map={
-                    "Não declarado": "grey",
-                    "Branca": "#e6e6e6ed",
-                    "Preta": "black",
-                    "Parda": "peru",
-                    "Amarela": "yellow",
-                    "Indígena": "red",
-                    "Não dispõe da informação": "green"
-                }
-            )
-            grafico_cor_raca.update_traces(
-                textinfo='percent+label',
-            )
-            grafico_cor_raca.update_layout(
-                showlegend=False
-            )
-            st.plotly_chart(grafico_cor_raca, use_container_width=True)
+    # --- Visualizações: perfil social (pizzas e barras) --- #
+    # Cada grupo de gráficos é um fragmento: interações internas reexecutam só o próprio grupo.
+    # O perfil social aparece por padrão; as seções mais caras (distribuições das notas,
+    # rankings, comparação e cruzamentos) começam recolhidas e só são montadas quando o
+    # interruptor é ligado. Ligar ou desligar um grupo não reexecuta o resto da página
+    @st.fragment
+    def secao_perfil_social(resumo: ResumoFiltro, chave: tuple):
+        sem_dados = resumo.total == 0
+        st.subheader("Visualizações gráficas")
+        st.markdown("Abaixo, encontram-se gráficos que fixam, de acordo com os filtros aplicados, proporções entre aspectos sociais dos estudantes, tais como (i) sexos, (ii) cores/raças, (iii) estados civis e (iv) tipos de escola em que eles frequentaram no Ensino Médio.")
+
+        if not st.toggle("Exibir gráficos de perfil social", value=True, key="exibir_perfil_social"):
+            return
+
+        col_graf1, col_graf2 = st.columns(2)
+
+        with col_graf1:
+            if not sem_dados:
+                sexo_contagem = resumo.contagens['sexo_labels'].reset_index()
+                sexo_contagem.columns = ['sexo', 'quantidade']
+                grafico_sexo = figura(
+                    px.pie,
+                    sexo_contagem,
+                    chave=(chave, "contagens", "sexo_labels"),
+                    names='sexo',
+                    values='quantidade',
+                    title='Sexos',
+                    hole=0.4,
+                    color='sexo',
+                    color_discrete_map={
+                        "Masculino": "blue",
+                        "Feminino": "red"
+                    },
+                    ajustes=[
+                        ("update_traces", dict(textinfo='percent+label')),
+                        ("update_layout", dict(showlegend=False))
+                    ]
+                )
+                st.plotly_chart(grafico_sexo, use_container_width=True)
+            else:
+                st.warning("Nenhum dado para ser exibido nos gráficos. Cheque os filtros.")
+
+        with col_graf2:
+            if not sem_dados:
+                cor_raca_contagem = resumo.contagens['cor_raca_labels'].reset_index()
+                cor_raca_contagem.columns = ['cor_raca', 'quantidade']
+                grafico_cor_raca = figura(
+                    px.pie,
+                    cor_raca_contagem,
+                    chave=(chave, "contagens", "cor_raca_labels"),
+                    names='cor_raca',
+                    values='quantidade',
+                    title='Cores/raças',
+                    hole=0.4,
+                    color='cor_raca',
+                    color_discrete_map={
+                        "Não declarado": "grey",
+                        "Branca": "#e6e6e6ed",
+                        "Preta": "black",
+                        "Parda": "peru",
+                        "Amarela": "yellow",
+                        "Indígena": "red",
+                        "Não dispõe da informação": "green"
+                    },
+                    ajustes=[
+                        ("update_traces", dict(textinfo='percent+label')),
+                        ("update_layout", dict(showlegend=False))
+                    ]
+                )
+                st.plotly_chart(grafico_cor_raca, use_container_width=True)
 
-    col_graf3, col_graf4 = st.columns(2)
-    st.markdown("---")
+        col_graf3, col_graf4 = st.columns(2)
+        st.markdown("---")
 
-    with col_graf3:
-        if not df_filtrado.empty:
-            estado_civil_contagem = df_filtrado['estado_civil_labels'].value_counts().reset_index()
-            estado_civil_contagem.columns = ['estado_civil', 'quantidade']
+        with col_graf3:
+            if not sem_dados:
+                estado_civil_contagem = resumo.contagens['estado_civil_labels'].reset_index()
+                estado_civil_contagem.columns = ['estado_civil', 'quantidade']
             
-            estado_civil_contagem["estado_civil_simplificado"] = estado_civil_contagem["estado_civil"].str.split("/").str[0]
+                estado_civil_contagem["estado_civil_simplificado"] = estado_civil_contagem["estado_civil"].str.split("/").str[0]
             
-            grafico_estado_civil = px.pie(
-                estado_civil_contagem,
-                names='estado_civil_simplificado',
-                values='quantidade',
-                title='Estados civis',
-                hole=0.4,
-                color='estado_civil_simplificado',
-                color_discrete_map={
-                    "Não informado": "grey",
-                    "Solteiro(a)": "orange",
-                    "Casado(a)": "lightpink",
-                    "Divorciado(a)": "blue",
-                    "Viúvo(a)": "purple"
-                }
-            )
-            grafico_estado_civil.update_traces(
-                textinfo='percent+label',
-            )
-            grafico_estado_civil.update_layout(
-                showlegend=False
-            )
-            st.plotly_chart(grafico_estado_civil, use_container_width=True)
+                grafico_estado_civil = figura(
+                    px.pie,
+                    estado_civil_contagem,
+                    chave=(chave, "contagens", "estado_civil_labels"),
+                    names='estado_civil_simplificado',
+                    values='quantidade',
+                    title='Estados civis',
+                    hole=0.4,
+                    color='estado_civil_simplificado',
+                    color_discrete_map={
+                        "Não informado": "grey",
+                        "Solteiro(a)": "orange",
+                        "Casado(a)": "lightpink",
+                        "Divorciado(a)": "blue",
+                        "Viúvo(a)": "purple"
+                    },
+                    ajustes=[
+                        ("update_traces", dict(textinfo='percent+label')),
+                        ("update_layout", dict(showlegend=False))
+                    ]
+                )
+                st.plotly_chart(grafico_estado_civil, use_container_width=True)
 
-    with col_graf4:
-        if not df_filtrado.empty:
-            tipo_escola_contagem = df_filtrado['tipo_escola_em_labels'].value_counts().reset_index()
-            tipo_escola_contagem.columns = ['tipo_escola', 'quantidade']
+        with col_graf4:
+            if not sem_dados:
+                tipo_escola_contagem = resumo.contagens['tipo_escola_em_labels'].reset_index()
+                tipo_escola_contagem.columns = ['tipo_escola', 'quantidade']
             
-            mapa_simplificado = {
-                "Não frequentou EM": "Não frequentou",
-                "Somente escola pública": "Apenas pública",
-                "Somente escola privada (sem bolsa)": "Privada s/ bolsa",
-                "Somente escola privada (com bolsa)": "Privada c/ bolsa",
-                "Escola pública + privada (sem bolsa)": "Mista s/ bolsa",
-                "Escola pública + privada (com bolsa)": "Mista c/ bolsa"
-            }
-
-            tipo_escola_contagem["tipo_escola_simplificado"] = (
-                tipo_escola_contagem["tipo_escola"]
-                .map(mapa_simplificado)
-                .fillna(tipo_escola_contagem["tipo_escola"])
-            )
-
-            grafico_tipo_escola = px.pie(
-                tipo_escola_contagem,
-                names='tipo_escola_simplificado',
-                values='quantidade',
-                title='Tipos de escola - Ensino Médio',
-                hole=0.4,
-                color='tipo_escola',
-                color_discrete_map={
-                    "Não frequentou EM": "grey",
-                    "Somente escola pública": "red",
-                    "Escola pública + privada (com bolsa)": "lightblue",
-                    "Escola pública + privada (sem bolsa)": "blue",
-                    "Somente escola privada (com bolsa)": "lightgreen",
-                    "Somente escola privada (sem bolsa)": "darkgreen"
+                mapa_simplificado = {
+                    "Não frequentou EM": "Não frequentou",
+                    "Somente escola pública": "Apenas pública",
+                    "Somente escola privada (sem bolsa)": "Privada s/ bolsa",
+                    "Somente escola privada (com bolsa)": "Privada c/ bolsa",
+                    "Escola pública + privada (sem bolsa)": "Mista s/ bolsa",
+                    "Escola pública + privada (com bolsa)": "Mista c/ bolsa",
+                    "Somente escola privada": "Apenas privada",
+                    "Não respondeu": "Não respondeu"
                 }
-            )
-            grafico_tipo_escola.update_traces(
-                textinfo='percent+label',
-            )
-            grafico_tipo_escola.update_layout(
-                showlegend=False
-            )
-            st.plotly_chart(grafico_tipo_escola, use_container_width=True)
-
-    st.markdown("Abaixo, encontram-se gráficos que fixam, de acordo com os filtros aplicados, distribuições por aspectos sociais dos estudantes, tais como (i) faixas etárias, (ii) escolaridades dos pais e (iii) faixas de renda familiar.")
-    col_graf5, col_graf6, col_graf7 = st.columns(3)
-    st.markdown("---")
-
-    with col_graf5:
-        if not df_filtrado.empty:
-            faixa_etaria_contagem = df_filtrado['faixa_etaria_labels'].value_counts().reset_index()
-            faixa_etaria_contagem.columns = ['Faixa etária', 'Quantidade']
-
-            grafico_bar_faixa_etaria = px.bar(
-                faixa_etaria_contagem,
-                x="Quantidade",
-                y="Faixa etária",
-                orientation="h",
-                title="Distribuição por Faixa Etária",
-                color="Faixa etária"
-            )
-            grafico_bar_faixa_etaria.update_layout(
-                showlegend=False
-            )
-            st.plotly_chart(grafico_bar_faixa_etaria, use_container_width=True)
-
-    with col_graf6:
-        if not df_filtrado.empty:
-            pais_maes = df_filtrado.melt(
-                value_vars=["escolaridade_pai_labels", "escolaridade_mae_labels"],
-                var_name="Origem",
-                value_name="escolaridade"
-            )
-
-            # Simplificar os rótulos "Pai" e "Mãe"
-            pais_maes["Origem"] = pais_maes["Origem"].map({
-                "escolaridade_pai_labels": "Pai",
-                "escolaridade_mae_labels": "Mãe"
-            })
-
-            # Mapa para simplificar as categorias de escolaridade
-            mapa_escolaridade = {
-                "Nunca estudou": "Nunca estudou",
-                "Fundamental I incompleto": "Fund. I inc.",
-                "Fundamental I completo, mas não Fundamental II": "Fund. I comp.",
-                "Fundamental II completo, mas não Médio": "Fund. II comp.",
-                "Médio completo": "Médio comp.",
-                "Superior completo": "Superior comp.",
-                "Pós-graduação": "Pós-grad.",
-                "Não sei": "Não sei"
-            }
-
-            pais_maes["escolaridade_simplificada"] = (
-                pais_maes["escolaridade"].map(mapa_escolaridade).fillna(pais_maes["escolaridade"])
-            )
 
-            ordem_escolaridade = [
-                "Nunca estudou", "Fund. I inc.",
-                "Fund. I comp.", "Fund. II comp.",
-                "Médio comp.", "Superior comp.",
-                "Pós-grad.", "Não sei"
-            ]
+                tipo_escola_contagem["tipo_escola_simplificado"] = (
+                    tipo_escola_contagem["tipo_escola"]
+                    .map(mapa_simplificado)
+                    .fillna(tipo_escola_contagem["tipo_escola"])
+                )
 
-            grafico_pais_maes = px.histogram(
-                pais_maes,
-                x="escolaridade_simplificada",
-                color="Origem",
-                barmode="group",
-                title="Escolaridade do Pai e da Mãe",
-                category_orders={"escolaridade_simplificada": ordem_escolaridade},
-                color_discrete_map={
-                    "Pai": "blue",
-                    "Mãe": "red"
+                grafico_tipo_escola = figura(
+                    px.pie,
+                    tipo_escola_contagem,
+                    chave=(chave, "contagens", "tipo_escola_em_labels"),
+                    names='tipo_escola_simplificado',
+                    values='quantidade',
+                    title='Tipos de escola - Ensino Médio',
+                    hole=0.4,
+                    color='tipo_escola',
+                    color_discrete_map={
+                        "Não frequentou EM": "grey",
+                        "Somente escola pública": "red",
+                        "Escola pública + privada (com bolsa)": "lightblue",
+                        "Escola pública + privada (sem bolsa)": "blue",
+                        "Somente escola privada (com bolsa)": "lightgreen",
+                        "Somente escola privada (sem bolsa)": "darkgreen",
+                        "Somente escola privada": "green",
+                        "Exterior": "purple",
+                        "Não respondeu": "black"
+                    },
+                    ajustes=[
+                        ("update_traces", dict(textinfo='percent+label')),
+                        ("update_layout", dict(showlegend=False))
+                    ]
+                )
+                st.plotly_chart(grafico_tipo_escola, use_container_width=True)
+
+        st.markdown("Abaixo, encontram-se gráficos que fixam, de acordo com os filtros aplicados, distribuições por aspectos sociais dos estudantes, tais como (i) faixas etárias, (ii) escolaridades dos pais e (iii) faixas de renda familiar.")
+        col_graf5, col_graf6, col_graf7 = st.columns(3)
+        st.markdown("---")
+
+        with col_graf5:
+            if not sem_dados:
+                faixa_etaria_contagem = resumo.contagens['faixa_etaria_labels'].reset_index()
+                faixa_etaria_contagem.columns = ['Faixa etária', 'Quantidade']
+
+                grafico_bar_faixa_etaria = figura(
+                    px.bar,
+                    faixa_etaria_contagem,
+                    chave=(chave, "contagens", "faixa_etaria_labels"),
+                    x="Quantidade",
+                    y="Faixa etária",
+                    orientation="h",
+                    title="Distribuição por Faixa Etária",
+                    color="Faixa etária",
+                    ajustes=[("update_layout", dict(showlegend=False))]
+                )
+                st.plotly_chart(grafico_bar_faixa_etaria, use_container_width=True)
+
+        with col_graf6:
+            if not sem_dados:
+                # Contagens de pai e mãe lado a lado (sem duplicar as linhas com melt)
+                pais_maes = pd.concat([
+                    resumo.contagens["escolaridade_pai_labels"].rename_axis("escolaridade").reset_index(name="quantidade").assign(Origem="Pai"),
+                    resumo.contagens["escolaridade_mae_labels"].rename_axis("escolaridade").reset_index(name="quantidade").assign(Origem="Mãe")
+                ], ignore_index=True)
+
+                # Mapa para simplificar as categorias de escolaridade
+                mapa_escolaridade = {
+                    "Nunca estudou": "Nunca estudou",
+                    "Fundamental I incompleto": "Fund. I inc.",
+                    "Fundamental I completo, mas não Fundamental II": "Fund. I comp.",
+                    "Fundamental II completo, mas não Médio": "Fund. II comp.",
+                    "Médio completo": "Médio comp.",
+                    "Superior completo": "Superior comp.",
+                    "Pós-graduação": "Pós-grad.",
+                    "Não sei": "Não sei"
                 }
-            )
-
-            grafico_pais_maes.update_xaxes(title="Escolaridade", tickangle=45)
-            grafico_pais_maes.update_yaxes(title="Quantidade")
-            st.plotly_chart(grafico_pais_maes, use_container_width=True)
 
+                pais_maes["escolaridade_simplificada"] = (
+                    pais_maes["escolaridade"].map(mapa_escolaridade).fillna(pais_maes["escolaridade"])
+                )
 
-    with col_graf7:
-        if not df_filtrado.empty:
-            renda_contagem = df_filtrado['renda_familiar_labels'].value_counts().reset_index()
-            renda_contagem.columns = ['Renda', 'Quantidade']
+                ordem_escolaridade = [mapa_escolaridade.get(esc, esc) for esc in ordem_rotulos("escolaridade_pai_labels")]
+
+                grafico_pais_maes = figura(
+                    px.bar,
+                    pais_maes,
+                    chave=(chave, "contagens", "escolaridade_pais"),
+                    x="escolaridade_simplificada",
+                    y="quantidade",
+                    color="Origem",
+                    barmode="group",
+                    title="Escolaridade do Pai e da Mãe",
+                    category_orders={"escolaridade_simplificada": ordem_escolaridade},
+                    color_discrete_map={
+                        "Pai": "blue",
+                        "Mãe": "red"
+                    },
+                    ajustes=[
+                        ("update_xaxes", dict(title="Escolaridade", tickangle=45)),
+                        ("update_yaxes", dict(title="Quantidade"))
+                    ]
+                )
 
-            renda_grafico_bar = px.bar(
-                renda_contagem,
-                x="Quantidade",
-                y="Renda",
-                orientation="h",
-                title="Distribuição por Renda Familiar",
-                color="Renda"
-            )
-            renda_grafico_bar.update_xaxes(tickangle=45)
-            renda_grafico_bar.update_layout(
-                showlegend=False
-            )
-            st.plotly_chart(renda_grafico_bar, use_container_width=True)
-
-    st.markdown("Abaixo, encontram-se gráficos que fixam, de acordo com os filtros aplicados, as distribuições da pontuação dos estudantes em cada uma das 5 áreas avaliadas, além da distribuição da média da somatória das 5 notas obtidas.")
-    col_graf8, col_graf9, col_graf10 = st.columns(3)
-
-    with col_graf8:
-        if not df_filtrado.empty:
-            grafico_hist_natureza = px.histogram(
-                df_filtrado,
-                x='nota_ciencias_natureza',
-                nbins=30,
-                title='Distribuição - Ciências da Natureza',
-                labels={'nota_ciencias_natureza': 'Notas - Ciências da Natureza'}
-            )
-            grafico_hist_natureza.update_layout(
-                yaxis_title="Quantidade",
-                title_x=0.1
-            )
-            grafico_hist_natureza.update_traces(
-                marker_color="green"
-            )
-            st.plotly_chart(grafico_hist_natureza, use_container_width=True)
-
-    with col_graf9:
-        if not df_filtrado.empty:
-            grafico_hist_humanas = px.histogram(
-                df_filtrado,
-                x='nota_ciencias_humanas',
-                nbins=30,
-                title='Distribuição - Ciências Humanas',
-                labels={'nota_ciencias_humanas': 'Notas - Ciências Humanas'}
-            )
-            grafico_hist_humanas.update_layout(
-                yaxis_title="Quantidade",
-                title_x=0.1
-            )
-            grafico_hist_humanas.update_traces(
-                marker_color="red"
-            )
-            st.plotly_chart(grafico_hist_humanas, use_container_width=True)
-
-    with col_graf10:
-        if not df_filtrado.empty:
-            grafico_hist_linguagens = px.histogram(
-                df_filtrado,
-                x='nota_linguagens_codigos',
-                nbins=30,
-                title='Distribuição - Linguagens e Códigos',
-                labels={'nota_linguagens_codigos': 'Notas - Linguagens e Códigos'}
-            )
-            grafico_hist_linguagens.update_layout(
-                yaxis_title="Quantidade",
-                title_x=0.1
-            )
-            grafico_hist_linguagens.update_traces(
-                marker_color="blue"
-            )
-            st.plotly_chart(grafico_hist_linguagens, use_container_width=True)
+                st.plotly_chart(grafico_pais_maes, use_container_width=True)
+
+
+        with col_graf7:
+            if not sem_dados:
+                renda_contagem = resumo.contagens['renda_familiar_labels'].reset_index()
+                renda_contagem.columns = ['Renda', 'Quantidade']
+
+                renda_grafico_bar = figura(
+                    px.bar,
+                    renda_contagem,
+                    chave=(chave, "contagens", "renda_familiar_labels"),
+                    x="Quantidade",
+                    y="Renda",
+                    orientation="h",
+                    title="Distribuição por Renda Familiar",
+                    color="Renda",
+                    ajustes=[
+                        ("update_xaxes", dict(tickangle=45)),
+                        ("update_layout", dict(showlegend=False))
+                    ]
+                )
+                st.plotly_chart(renda_grafico_bar, use_container_width=True)
+
+    secao_perfil_social(resumo, chave_resumo)
+
+    # --- Distribuições das notas (histogramas) --- #
+    @st.fragment
+    def secao_histogramas(resumo: ResumoFiltro, chave: tuple):
+        sem_dados = resumo.total == 0
+        st.markdown("Abaixo, encontram-se gráficos que fixam, de acordo com os filtros aplicados, as distribuições da pontuação dos estudantes em cada uma das 5 áreas avaliadas, além da distribuição da média da somatória das 5 notas obtidas.")
+        if not st.toggle("Exibir distribuições das notas", value=False, key="exibir_histogramas"):
+            return
+
+        col_graf8, col_graf9, col_graf10 = st.columns(3)
+
+        with col_graf8:
+            if not sem_dados:
+                grafico_hist_natureza = histograma_agregado(
+                    resumo,
+                    chave,
+                    'nota_ciencias_natureza',
+                    title='Distribuição - Ciências da Natureza',
+                    labels={'nota_ciencias_natureza': 'Notas - Ciências da Natureza'},
+                    cor="green"
+                )
+                st.plotly_chart(grafico_hist_natureza, use_container_width=True)
+
+        with col_graf9:
+            if not sem_dados:
+                grafico_hist_humanas = histograma_agregado(
+                    resumo,
+                    chave,
+                    'nota_ciencias_humanas',
+                    title='Distribuição - Ciências Humanas',
+                    labels={'nota_ciencias_humanas': 'Notas - Ciências Humanas'},
+                    cor="red"
+                )
+                st.plotly_chart(grafico_hist_humanas, use_container_width=True)
+
+        with col_graf10:
+            if not sem_dados:
+                grafico_hist_linguagens = histograma_agregado(
+                    resumo,
+                    chave,
+                    'nota_linguagens_codigos',
+                    title='Distribuição - Linguagens e Códigos',
+                    labels={'nota_linguagens_codigos': 'Notas - Linguagens e Códigos'},
+                    cor="blue"
+                )
+                st.plotly_chart(grafico_hist_linguagens, use_container_width=True)
+
+        col_graf11, col_graf12, col_graf13 = st.columns(3)
+        st.markdown("---")
+
+        with col_graf11:
+            if not sem_dados:
+                grafico_hist_matematica = histograma_agregado(
+                    resumo,
+                    chave,
+                    'nota_matematica',
+                    title='Distribuição - Matemática',
+                    labels={'nota_matematica': 'Notas - Matemática'},
+                    cor="yellow"
+                )
+                st.plotly_chart(grafico_hist_matematica, use_container_width=True)
+
+        with col_graf12:
+            if not sem_dados:
+                grafico_hist_redacao = histograma_agregado(
+                    resumo,
+                    chave,
+                    'nota_redacao',
+                    title='Distribuição - Redação',
+                    labels={'nota_redacao': 'Notas - Redação'},
+                    cor="purple"
+                )
+                st.plotly_chart(grafico_hist_redacao, use_container_width=True)
+
+        with col_graf13:
+            if not sem_dados:
+                grafico_hist_somatoria = histograma_agregado(
+                    resumo,
+                    chave,
+                    'nota_somatoria',
+                    title='Distribuição - Média da Somatória',
+                    labels={'nota_somatoria': 'Notas - Média da Somatória'},
+                    cor="orange"
+                )
+                st.plotly_chart(grafico_hist_somatoria, use_container_width=True)
+
+    secao_histogramas(resumo, chave_resumo)
+
+    # --- Rankings (Top 10 UFs e municípios) --- #
+    @st.fragment
+    def secao_rankings(resumo: ResumoFiltro, chave: tuple, municipios_visiveis: List[str], ufs_selecionadas: List[str], ano: int):
+        sem_dados = resumo.total == 0
+        if not st.toggle("Exibir rankings de UFs e municípios", value=False, key="exibir_rankings"):
+            return
+
+        if len(municipios_visiveis) == 0:
+            st.markdown("Finalmente, abaixo encontram-se gráficos que fixam, de acordo com os filtros das UFs aplicados, as (i) UFs e os (ii) Municípios com as maiores médias da somatória das notas.")
+            col_graf14, col_graf15 = st.columns(2)
+
+            with col_graf14:
+                if not sem_dados:
+                    top_ufs = top_n(resumo.rankings['uf_prova']).rename('nota_somatoria').reset_index()
+
+                    grafico_ufs_bar = figura(
+                        px.bar,
+                        top_ufs,
+                        chave=(chave, "rankings", "uf_prova"),
+                        x='nota_somatoria',
+                        y='uf_prova',
+                        orientation='h',
+                        color='uf_prova',
+                        color_discrete_sequence=px.colors.qualitative.Light24,
+                        title='Top 10 UFs por média da somatória das notas',
+                        labels={'nota_somatoria': 'Média da somatória das notas', 'uf_prova': 'UF'},
+                        ajustes=[("update_layout", dict(yaxis={'categoryorder': 'total ascending'}, showlegend=False))]
+                    )
+                    st.plotly_chart(grafico_ufs_bar, use_container_width=True)
+
+            col_municipios = col_graf15
 
-    col_graf11, col_graf12, col_graf13 = st.columns(3)
-    st.markdown("---")
+        else:
+            st.markdown("Finalmente, abaixo encontram-se gráficos que fixam, de acordo com os filtros dos Municípios aplicados, os Municípios com as maiores médias da somatória das notas.")
+            col_municipios, = st.columns(1)
 
-    with col_graf11:
-        if not df_filtrado.empty:
-            grafico_hist_matematica = px.histogram(
-                df_filtrado,
-                x='nota_matematica',
-                nbins=30,
-                title='Distribuição - Matemática',
-                labels={'nota_matematica': 'Notas - Matemática'}
-            )
-            grafico_hist_matematica.update_layout(
-                yaxis_title="Quantidade",
-                title_x=0.1
-            )
-            grafico_hist_matematica.update_traces(
-                marker_color="yellow"
-            )
-            st.plotly_chart(grafico_hist_matematica, use_container_width=True)
-
-    with col_graf12:
-        if not df_filtrado.empty:
-            grafico_hist_redacao = px.histogram(
-                df_filtrado,
-                x='nota_redacao',
-                nbins=30,
-                title='Distribuição - Redação',
-                labels={'nota_redacao': 'Notas - Redação'}
-            )
-            grafico_hist_redacao.update_layout(
-                yaxis_title="Quantidade",
-                title_x=0.1
-            )
-            grafico_hist_redacao.update_traces(
-                marker_color="purple"
-            )
-            st.plotly_chart(grafico_hist_redacao, use_container_width=True)
-
-    with col_graf13:
-        if not df_filtrado.empty:
-            grafico_hist_somatoria = px.histogram(
-                df_filtrado,
-                x='nota_somatoria',
-                nbins=30,
-                title='Distribuição - Média da Somatória',
-                labels={'nota_somatoria': 'Notas - Média da Somatória'}
-            )
-            grafico_hist_somatoria.update_layout(
-                yaxis_title="Quantidade",
-                title_x=0.1
-            )
-            grafico_hist_somatoria.update_traces(
-                marker_color="orange"
-            )
-            st.plotly_chart(grafico_hist_somatoria, use_container_width=True)
-
-    if len(st.session_state["municipios_visiveis"]) == 0:
-        st.markdown("Finalmente, abaixo encontram-se gráficos que fixam, de acordo com os filtros das UFs aplicados, as (i) UFs e os (ii) Municípios com as maiores médias da somatória das notas.")
-        col_graf14, col_graf15 = st.columns(2)
-
-        with col_graf14:
-            if not df_filtrado.empty:
-                top_ufs = (
-                    df_filtrado.groupby('uf_prova', as_index=False)['nota_somatoria']
-                    .mean()
-                    .nlargest(10, 'nota_somatoria')
-                    .sort_values('nota_somatoria', ascending=True)
-                )
+        with col_municipios:
+            if not sem_dados:
+                top_municipios = top_n(resumo.rankings['municipio_prova']).rename('nota_somatoria').reset_index()
 
-                grafico_ufs_bar = px.bar(
-                    top_ufs,
+                grafico_municipios_bar = figura(
+                    px.bar,
+                    top_municipios,
+                    chave=(chave, "rankings", "municipio_prova"),
                     x='nota_somatoria',
-                    y='uf_prova',
+                    y='municipio_prova',
                     orientation='h',
-                    color='uf_prova',
-                    color_discrete_sequence=px.colors.qualitative.Light24,
-                    title='Top 10 UFs por média da somatória das notas',
-                    labels={'nota_somatoria': 'Média da somatória das notas', 'uf_prova': 'UF'}
+                    color='municipio_prova',
+                    color_discrete_sequence=px.colors.qualitative.Dark24_r,
+                    title='Top 10 Municípios por média da somatória das notas',
+                    labels={'nota_somatoria': 'Média da somatória das notas', 'municipio_prova': 'Município'},
+                    ajustes=[("update_layout", dict(yaxis={'categoryorder': 'total ascending'}, showlegend=False))]
                 )
-
-                grafico_ufs_bar.update_layout(
-                    yaxis={'categoryorder': 'total ascending'},
-                    showlegend=False
+                st.plotly_chart(grafico_municipios_bar, use_container_width=True)
+
+        # --- Top escolas (agregados por escola, quando gerados para a edição) --- #
+        ranking = ranking_escolas(ano)
+        if ranking is None:
+            st.caption(f"Ranking de escolas indisponível para {ano}: gere os agregados com `python escolas_enem.py`.")
+            return
+
+        st.markdown("O ranking de escolas considera a UF e o município da escola e apenas escolas com ao menos 10 alunos.")
+        mask_escolas = ranking.filtrar(ufs_selecionadas, municipios_visiveis)
+        top_escolas = ranking.top("nota_somatoria", mask_escolas)
+        if top_escolas.empty:
+            st.warning("Nenhuma escola com os filtros selecionados.")
+            return
+
+        top_escolas["escola"] = (
+            top_escolas["codigo_escola"].astype(str) + " - "
+            + top_escolas["municipio_escola"].astype(str) + "/" + top_escolas["uf_escola"].astype(str)
+        )
+        grafico_escolas_bar = figura(
+            px.bar,
+            top_escolas,
+            # O top depende só do arquivo de agregados (caminho e data) e dos filtros de local
+            chave=(ranking.escolas.versao, tuple(sorted(ufs_selecionadas)), tuple(sorted(municipios_visiveis)), "escolas"),
+            x='media_nota_somatoria',
+            y='escola',
+            orientation='h',
+            color='escola',
+            color_discrete_sequence=px.colors.qualitative.Light24,
+            hover_data=['alunos', 'p10_nota_somatoria', 'p50_nota_somatoria', 'p90_nota_somatoria'],
+            title='Top 10 escolas por média da somatória das notas',
+            labels={'media_nota_somatoria': 'Média da somatória das notas', 'escola': 'Escola (código INEP)'},
+            ajustes=[("update_layout", dict(yaxis={'categoryorder': 'total ascending'}, showlegend=False))]
+        )
+        st.plotly_chart(grafico_escolas_bar, use_container_width=True)
+
+        codigo_escola = st.number_input("Posição de uma escola (código INEP)", min_value=0, step=1, value=0, key="codigo_escola_ranking")
+        if codigo_escola:
+            posicao = ranking.posicao(int(codigo_escola), "nota_somatoria", mask_escolas)
+            if posicao is None:
+                st.info("Escola fora dos filtros selecionados (ou com menos de 10 alunos).")
+            else:
+                lugar, total, percentil = posicao
+                st.metric("Posição no ranking", f"{lugar}º de {total}", help=f"Acima de {percentil:.1f}% das escolas filtradas")
+
+    secao_rankings(resumo, chave_resumo, st.session_state["municipios_visiveis"], ufs_selecionadas, ano_referencia)
+
+    # --- Faixas de percentis por UF --- #
+    @st.fragment
+    def secao_faixas_uf(resumo: ResumoFiltro, chave: tuple):
+        sem_dados = resumo.total == 0
+        if not sem_dados:
+            with st.expander("Faixas de percentis (P10 - mediana - P90) por UF"):
+                area_faixa = st.selectbox(
+                    "Nota",
+                    options=[coluna for coluna, _ in AREAS_NOTAS],
+                    format_func=dict(AREAS_NOTAS).get,
+                    key="area_faixa_uf"
                 )
-                st.plotly_chart(grafico_ufs_bar, use_container_width=True)
-
-        col_municipios = col_graf15
-
-    else:
-        st.markdown("Finalmente, abaixo encontram-se gráficos que fixam, de acordo com os filtros dos Municípios aplicados, os Municípios com as maiores médias da somatória das notas.")
-        col_municipios, = st.columns(1)
-
-    with col_municipios:
-        if not df_filtrado.empty:
-            top_municipios = (
-                df_filtrado.groupby('municipio_prova', as_index=False)['nota_somatoria']
-                .mean()
-                .nlargest(10, 'nota_somatoria')
-                .sort_values('nota_somatoria', ascending=True)
+                faixas_uf = resumo.faixas["uf_prova"][area_faixa].sort_values("p50").reset_index()
+                faixas_uf["acima"] = faixas_uf["p90"] - faixas_uf["p50"]
+                faixas_uf["abaixo"] = faixas_uf["p50"] - faixas_uf["p10"]
+
+                grafico_faixas_uf = figura(
+                    px.scatter,
+                    faixas_uf,
+                    chave=(chave, "faixas", "uf_prova", area_faixa),
+                    x="p50",
+                    y="uf_prova",
+                    error_x="acima",
+                    error_x_minus="abaixo",
+                    title=f"Mediana e faixa P10-P90 por UF - {dict(AREAS_NOTAS)[area_faixa]}",
+                    labels={"p50": "Nota (mediana, barras de P10 a P90)", "uf_prova": "UF"},
+                    ajustes=[("update_layout", dict(height=max(300, 25 * len(faixas_uf))))]
+                )
+                st.plotly_chart(grafico_faixas_uf, use_container_width=True)
+
+    secao_faixas_uf(resumo, chave_resumo)
+
+    # --- Comparação de grupos (ex.: escola pública x privada) --- #
+    # Dimensões comparáveis: as colunas filtráveis da barra lateral (exceto município)
+    DIMENSOES_COMPARACAO = {
+        "tipo_escola_em_labels": "Tipo de escola - Ensino médio",
+        "renda_familiar_labels": "Renda familiar mensal",
+        "sexo_labels": "Sexo",
+        "cor_raca_labels": "Cor/raça",
+        "faixa_etaria_labels": "Faixa etária",
+        "estado_civil_labels": "Estado civil",
+        "escolaridade_pai_labels": "Escolaridade do pai",
+        "escolaridade_mae_labels": "Escolaridade da mãe",
+        "uf_prova": "Estado/DF"
+    }
+
+    def nome_grupo(i: int, valores: List[str]) -> str:
+        nome = f"G{i + 1}: {' + '.join(valores)}"
+        return nome if len(nome) <= 40 else nome[:39] + "…"
+
+    @st.fragment
+    def secao_comparacao(selecao: dict, ano: int):
+        if not st.toggle("Comparar grupos lado a lado", key="exibir_comparacao"):
+            return
+        st.markdown("Compare dois ou mais grupos de uma mesma dimensão (por exemplo, escola pública x privada ou renda baixa x alta). Os demais filtros da barra lateral valem para todos os grupos, e todos são calculados juntos, numa única leitura dos dados.")
+
+        col_dimensao, col_n = st.columns([3, 1])
+        dimensao = col_dimensao.selectbox(
+            "Dimensão",
+            options=list(DIMENSOES_COMPARACAO),
+            format_func=DIMENSOES_COMPARACAO.get,
+            key="dimensao_comparacao"
+        )
+        n_grupos = col_n.number_input("Grupos", min_value=2, max_value=4, value=2, step=1, key="n_grupos_comparacao")
+
+        # Valores possíveis: os selecionados na barra lateral; por padrão, divididos em blocos consecutivos
+        opcoes = ordenar_rotulos(dimensao, selecao[dimensao]) if dimensao != "uf_prova" else sorted(selecao[dimensao])
+        if len(opcoes) < 2:
+            st.warning("Selecione ao menos dois valores dessa dimensão na barra lateral.")
+            return
+        blocos = [list(bloco) for bloco in np.array_split(opcoes, min(n_grupos, len(opcoes)))]
+        colunas_grupos = st.columns(n_grupos)
+        grupos = []
+        for i, col_grupo in enumerate(colunas_grupos):
+            valores = col_grupo.multiselect(
+                f"Grupo {i + 1}",
+                options=opcoes,
+                default=blocos[i] if i < len(blocos) else [],
+                key=f"grupo_comparacao_{dimensao}_{n_grupos}_{i}"
             )
+            if valores:
+                grupos.append((nome_grupo(i, valores), valores))
+        if len(grupos) < 2:
+            st.info("Escolha os valores de ao menos dois grupos.")
+            return
+
+        selecoes_grupos = [{**selecao, dimensao: valores} for _, valores in grupos]
+        resumos_comparados = resumos_grupos(selecoes_grupos, ano)
+        nomes = [nome for nome, _ in grupos]
+        # Chave das figuras: a seleção de cada grupo (com a versão dos dados) e os nomes exibidos
+        chave_grupos = (tuple(chave_selecao(selecao_grupo, ano) for selecao_grupo in selecoes_grupos), tuple(nomes))
+
+        # Métricas: médias de cada grupo e diferença para o primeiro
+        medias = pd.DataFrame(
+            {nome: {"Inscritos": r.total, **{area: r.medias[coluna] for coluna, area in AREAS_NOTAS}}
+             for nome, r in zip(nomes, resumos_comparados)}
+        ).T
+        diferencas = medias.drop(columns="Inscritos").sub(medias.drop(columns="Inscritos").iloc[0], axis=1).iloc[1:]
+        diferencas.index = [f"{nome.split(':')[0]} − G1" for nome in diferencas.index]
+        st.dataframe(
+            pd.concat([medias, diferencas]).style.format("{:.1f}", na_rep="-").format("{:,.0f}", subset="Inscritos", na_rep=""),
+            use_container_width=True
+        )
 
-            grafico_municipios_bar = px.bar(
-                top_municipios,
-                x='nota_somatoria',
-                y='municipio_prova',
-                orientation='h',
-                color='municipio_prova',
-                color_discrete_sequence=px.colors.qualitative.Dark24_r,
-                title='Top 10 Municípios por média da somatória das notas',
-                labels={'nota_somatoria': 'Média da somatória das notas', 'municipio_prova': 'Município'}
+        notas_grupos = pd.DataFrame([
+            {"Grupo": nome, "Área": area, "Nota média": r.medias[coluna]}
+            for nome, r in zip(nomes, resumos_comparados) if r.total > 0
+            for coluna, area in AREAS_NOTAS
+        ])
+        if notas_grupos.empty:
+            st.warning("Nenhum dado para ser exibido nos gráficos. Cheque os filtros.")
+            return
+        grafico_medias_grupos = figura(
+            px.bar,
+            notas_grupos,
+            chave=(chave_grupos, "comparacao", "medias"),
+            x="Área",
+            y="Nota média",
+            color="Grupo",
+            barmode="group",
+            title="Notas médias por grupo"
+        )
+        st.plotly_chart(grafico_medias_grupos, use_container_width=True)
+
+        # Distribuições sobrepostas, em % do grupo (os grupos têm tamanhos diferentes)
+        area_comparacao = st.selectbox(
+            "Nota",
+            options=[coluna for coluna, _ in AREAS_NOTAS],
+            format_func=dict(AREAS_NOTAS).get,
+            key="area_comparacao"
+        )
+        centros_sketch = np.arange(NBINS_SKETCH) * RESOLUCAO_SKETCH
+        distribuicoes = []
+        for nome, r in zip(nomes, resumos_comparados):
+            sketch = r.sketches[area_comparacao]
+            if sketch.total == 0:
+                continue
+            contagens, bordas = np.histogram(centros_sketch, bins=50, range=(0, NOTA_MAXIMA), weights=sketch.contagens)
+            distribuicoes.append(pd.DataFrame({
+                "Nota": (bordas[:-1] + bordas[1:]) / 2,
+                "% do grupo": 100 * contagens / sketch.total,
+                "Grupo": nome
+            }))
+        grafico_distribuicoes = figura(
+            px.bar,
+            pd.concat(distribuicoes, ignore_index=True),
+            chave=(chave_grupos, "comparacao", "distribuicao", area_comparacao),
+            x="Nota",
+            y="% do grupo",
+            color="Grupo",
+            barmode="overlay",
+            opacity=0.55,
+            title=f"Distribuição por grupo - {dict(AREAS_NOTAS)[area_comparacao]}",
+            ajustes=[("update_layout", dict(bargap=0))]
+        )
+        st.plotly_chart(grafico_distribuicoes, use_container_width=True)
+
+        # Top 10 do primeiro grupo, com as médias dos demais grupos nos mesmos lugares
+        col_ufs, col_municipios = st.columns(2)
+        for col_ranking, coluna, titulo, rotulo in [(col_ufs, "uf_prova", "UFs", "UF"), (col_municipios, "municipio_prova", "Municípios", "Município")]:
+            topo = top_n(resumos_comparados[0].rankings[coluna]).index
+            ranking_grupos = pd.DataFrame([
+                {"Local": local, "Grupo": nome, "Média da somatória": r.rankings[coluna].get(local, np.nan)}
+                for nome, r in zip(nomes, resumos_comparados)
+                for local in topo
+            ])
+            if ranking_grupos.empty:
+                continue
+            grafico_ranking_grupos = figura(
+                px.bar,
+                ranking_grupos,
+                chave=(chave_grupos, "comparacao", "ranking", coluna),
+                x="Média da somatória",
+                y="Local",
+                color="Grupo",
+                orientation="h",
+                barmode="group",
+                category_orders={"Local": list(topo[::-1])},
+                title=f"Top 10 {titulo} de {nomes[0]}",
+                labels={"Local": rotulo},
+                ajustes=[("update_layout", dict(height=500))]
             )
+            col_ranking.plotly_chart(grafico_ranking_grupos, use_container_width=True)
+
+    secao_comparacao(selecao, ano_referencia)
+
+    # --- Mapas de calor: nota média por par de características --- #
+    # Células com poucos alunos têm médias instáveis e ficam em branco
+    MIN_ALUNOS_CELULA = 10
+
+    @st.fragment
+    def secao_cruzamentos(selecao: dict, ano: int):
+        if not st.toggle("Exibir mapas de calor das notas médias por pares de características", key="exibir_cruzamentos"):
+            return
+
+        colunas_rotulos = [coluna for coluna in DIMENSOES_COMPARACAO if coluna != "uf_prova"]
+        col_linhas, col_colunas, col_nota = st.columns(3)
+        coluna_linhas = col_linhas.selectbox(
+            "Linhas",
+            options=colunas_rotulos,
+            index=colunas_rotulos.index("renda_familiar_labels"),
+            format_func=DIMENSOES_COMPARACAO.get,
+            key="linhas_cruzamento"
+        )
+        coluna_colunas = col_colunas.selectbox(
+            "Colunas",
+            options=[coluna for coluna in colunas_rotulos if coluna != coluna_linhas],
+            format_func=DIMENSOES_COMPARACAO.get,
+            key="colunas_cruzamento"
+        )
+        area_cruzamento = col_nota.selectbox(
+            "Nota",
+            options=[coluna for coluna, _ in AREAS_NOTAS],
+            index=len(AREAS_NOTAS) - 1,
+            format_func=dict(AREAS_NOTAS).get,
+            key="area_cruzamento"
+        )
 
-            grafico_municipios_bar.update_layout(
-                yaxis={'categoryorder': 'total ascending'},
-                showlegend=False
+        cruzamento = cruzamento_filtrado(selecao, ano, coluna_linhas, coluna_colunas)
+        # Só as categorias selecionadas na barra lateral, na ordem do codebook
+        linhas = ordenar_rotulos(coluna_linhas, selecao[coluna_linhas])
+        colunas = ordenar_rotulos(coluna_colunas, selecao[coluna_colunas])
+        alunos = cruzamento.alunos.reindex(index=linhas, columns=colunas, fill_value=0)
+        medias = cruzamento.medias[area_cruzamento].reindex(index=linhas, columns=colunas)
+        medias = medias.where(alunos >= MIN_ALUNOS_CELULA)
+        if medias.isna().all().all():
+            st.warning("Nenhum dado para ser exibido nos gráficos. Cheque os filtros.")
+            return
+
+        grafico_cruzamento = figura(
+            px.imshow,
+            medias,
+            chave=(chave_selecao(selecao, ano), "cruzamento", coluna_linhas, coluna_colunas, area_cruzamento),
+            text_auto=".0f",
+            aspect="auto",
+            color_continuous_scale="RdYlGn",
+            title=f"{dict(AREAS_NOTAS)[area_cruzamento]} - nota média por {DIMENSOES_COMPARACAO[coluna_linhas].lower()} e {DIMENSOES_COMPARACAO[coluna_colunas].lower()}",
+            labels={"x": DIMENSOES_COMPARACAO[coluna_colunas], "y": DIMENSOES_COMPARACAO[coluna_linhas], "color": "Nota média"},
+            ajustes=[
+                ("update_traces", dict(
+                    customdata=alunos.to_numpy(),
+                    hovertemplate="%{y}<br>%{x}<br>Nota média: %{z:.1f}<br>Alunos: %{customdata}<extra></extra>"
+                )),
+                ("update_layout", dict(height=max(400, 45 * len(linhas))))
+            ]
+        )
+        st.plotly_chart(grafico_cruzamento, use_container_width=True)
+        st.caption(f"Células com menos de {MIN_ALUNOS_CELULA} alunos ficam em branco.")
+
+    secao_cruzamentos(selecao, ano_referencia)
+
+    # --- Exportação das linhas filtradas --- #
+    @st.fragment
+    def secao_exportacao(selecao: dict, ano: int, total: int, estimado: bool = False):
+        with st.expander("Exportar os dados filtrados"):
+            colunas_disponiveis = colunas_dataset(ano)
+            colunas_exportadas = st.multiselect(
+                "Colunas",
+                options=colunas_disponiveis,
+                default=colunas_disponiveis,
+                key="colunas_exportacao"
             )
-            st.plotly_chart(grafico_municipios_bar, use_container_width=True)
+            formato = st.radio("Formato", options=list(FORMATOS), format_func=str.upper, horizontal=True, key="formato_exportacao")
+            linhas = f"{total:,.0f}".replace(",", ".")
+            st.caption(
+                f"{'Cerca de ' if estimado else ''}{linhas} linhas da edição {ano} atendem aos filtros. "
+                "O arquivo é gerado em lotes, sem carregar a seleção inteira na memória; o download, porém, "
+                "é servido pelo Streamlit, que lê o arquivo pronto inteiro na memória do servidor. Para "
+                "seleções muito grandes, prefira a linha de comando: `python exportacao.py --ano ... --saida ...`."
+            )
+            if not colunas_exportadas or total == 0:
+                return
+            if os.path.exists(caminho_exportacao(ano, selecao, colunas_exportadas, formato)):
+                # Arquivo já gerado: arquivo_exportacao só marca o uso (limite de disco das exportações)
+                caminho = arquivo_exportacao(ano, selecao, colunas_exportadas, formato)
+            elif st.button("Gerar arquivo", key="gerar_exportacao"):
+                with st.spinner("Gerando arquivo..."):
+                    caminho = arquivo_exportacao(ano, selecao, colunas_exportadas, formato)
+            else:
+                return
+            try:
+                arquivo = open(caminho, "rb")
+            except FileNotFoundError:
+                # Removido pelo limite de disco (outra sessão gerou exportações nesse meio-tempo)
+                st.warning("O arquivo foi removido pelo limite de disco das exportações. Gere-o novamente.")
+                return
+            with arquivo:
+                st.download_button(
+                    "⬇️ Baixar arquivo",
+                    data=arquivo,
+                    file_name=f"enem_{ano}_filtrado.{formato}",
+                    mime=FORMATOS[formato],
+                    key="baixar_exportacao"
+                )
+
+    secao_exportacao(selecao, ano_referencia, resumo.total, estimativa is not None)
 
 # ======================
 # ABA 2 - CLUSTERIZAÇÃO
 # ======================
 
 if pagina == "🤖 Algoritmos de clusterização - Colégio Teste":
+    # Import tardio: sklearn e minisom só são carregados quando esta página é aberta
+    from ml_notas import clusters_colegio_teste
     clusters_colegio_teste()
+
+# ======================
+# TEMPO ATÉ A PRIMEIRA RENDERIZAÇÃO
+# ======================
+
+if "tempo_primeira_renderizacao" not in st.session_state:
+    st.session_state["tempo_primeira_renderizacao"] = time.perf_counter() - inicio_execucao
+    logger.info("Tempo até a primeira renderização: %.3f s", st.session_state["tempo_primeira_renderizacao"])
+
+st.sidebar.caption(f"⏱️ Primeira renderização da sessão: {st.session_state['tempo_primeira_renderizacao']:.2f} s")
@@ -0,0 +1,211 @@
+import argparse
+import logging
+import os
+from dataclasses import dataclass
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from agregacoes import COLUNAS_NOTAS, NOTA_MAXIMA, PERCENTIS, calcular_somatoria, quantis_contagens
+from anos_enem import ARQUIVOS_POR_ANO
+from tabela_enem import TabelaEnem, abrir_arrow, escrever_arrow
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Agregados por escola (ranking de escolas)
+# ========================
+# Uma única leitura em blocos do arquivo de resultados acumula, por escola e por nota,
+# contagem, soma, soma dos quadrados e um sketch de contagens por faixa de nota (para os
+# percentis). O resultado é uma linha por escola, gravada em Arrow junto com a ordem
+# decrescente das escolas em cada métrica: top N, posição e percentil de uma escola sob
+# qualquer filtro de UF/município são apenas uma máscara aplicada a essa ordem.
+
+COLUNAS_ESCOLA = {
+    "CO_ESCOLA": "codigo_escola",
+    "SG_UF_ESC": "uf_escola",
+    "NO_MUNICIPIO_ESC": "municipio_escola",
+    "NU_NOTA_CN": "nota_ciencias_natureza",
+    "NU_NOTA_CH": "nota_ciencias_humanas",
+    "NU_NOTA_LC": "nota_linguagens_codigos",
+    "NU_NOTA_MT": "nota_matematica",
+    "NU_NOTA_REDACAO": "nota_redacao"
+}
+
+# Métricas por escola: as 5 notas e a somatória (média das notas de cada aluno)
+METRICAS_ESCOLA = COLUNAS_NOTAS + ["nota_somatoria"]
+
+# Sketch por escola mais grosso que o do dashboard (são dezenas de milhares de escolas):
+# faixas de 5 pontos (erro máximo de 2,5 pontos nos percentis). As contagens são uint32:
+# uint16 estouraria calado em 65.535 alunos numa faixa (escolas grandes ou várias edições)
+RESOLUCAO_ESCOLAS = 5.0
+NBINS_ESCOLAS = int(NOTA_MAXIMA / RESOLUCAO_ESCOLAS) + 1
+TIPO_SKETCH_ESCOLAS = np.uint32
+
+TAMANHO_BLOCO = 500_000
+MIN_ALUNOS = 10
+
+
+class _Acumulador:
+    """Somatórias por escola, com os arrays crescendo à medida que aparecem escolas novas."""
+
+    def __init__(self):
+        self.escolas = pd.Index([], dtype="int64")
+        self.uf = []
+        self.municipio = []
+        self.quantidades = np.zeros((0, len(METRICAS_ESCOLA)), dtype=np.int64)
+        self.somas = np.zeros((0, len(METRICAS_ESCOLA)))
+        self.quadrados = np.zeros((0, len(METRICAS_ESCOLA)))
+        self.sketches = np.zeros((0, len(METRICAS_ESCOLA), NBINS_ESCOLAS), dtype=TIPO_SKETCH_ESCOLAS)
+
+    def _indices(self, bloco: pd.DataFrame) -> np.ndarray:
+        codigos = bloco["codigo_escola"].to_numpy()
+        novas = bloco.loc[~np.isin(codigos, self.escolas)].drop_duplicates("codigo_escola")
+        if len(novas):
+            self.escolas = self.escolas.append(pd.Index(novas["codigo_escola"].to_numpy()))
+            self.uf += novas["uf_escola"].tolist()
+            self.municipio += novas["municipio_escola"].tolist()
+            n = len(novas)
+            self.quantidades = np.concatenate([self.quantidades, np.zeros((n,) + self.quantidades.shape[1:], np.int64)])
+            self.somas = np.concatenate([self.somas, np.zeros((n,) + self.somas.shape[1:])])
+            self.quadrados = np.concatenate([self.quadrados, np.zeros((n,) + self.quadrados.shape[1:])])
+            self.sketches = np.concatenate([self.sketches, np.zeros((n,) + self.sketches.shape[1:], TIPO_SKETCH_ESCOLAS)])
+        return self.escolas.get_indexer(codigos)
+
+    def adicionar(self, bloco: pd.DataFrame):
+        indices = self._indices(bloco)
+        notas = bloco[COLUNAS_NOTAS].to_numpy(dtype=float)
+        metricas = np.column_stack([notas, calcular_somatoria(notas)])
+        n_escolas = len(self.escolas)
+        for j in range(len(METRICAS_ESCOLA)):
+            validos = ~np.isnan(metricas[:, j])
+            escola, valores = indices[validos], metricas[validos, j]
+            self.quantidades[:, j] += np.bincount(escola, minlength=n_escolas)
+            self.somas[:, j] += np.bincount(escola, weights=valores, minlength=n_escolas)
+            self.quadrados[:, j] += np.bincount(escola, weights=valores ** 2, minlength=n_escolas)
+            bins = np.clip(np.rint(valores / RESOLUCAO_ESCOLAS), 0, NBINS_ESCOLAS - 1).astype(np.intp)
+            self.sketches[:, j] += np.bincount(
+                escola * NBINS_ESCOLAS + bins, minlength=n_escolas * NBINS_ESCOLAS
+            ).reshape(n_escolas, NBINS_ESCOLAS).astype(TIPO_SKETCH_ESCOLAS)
+
+    def finalizar(self) -> pd.DataFrame:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias = self.somas / self.quantidades
+            variancias = self.quadrados / self.quantidades - medias ** 2
+            # Variância amostral (n - 1), como o .var() do pandas
+            variancias = np.maximum(variancias, 0) * self.quantidades / (self.quantidades - 1)
+        quantis = quantis_contagens(self.sketches, PERCENTIS, RESOLUCAO_ESCOLAS)
+        colunas = {
+            "codigo_escola": self.escolas.to_numpy(),
+            "uf_escola": self.uf,
+            "municipio_escola": self.municipio,
+            "alunos": self.quantidades.max(axis=1)
+        }
+        for j, metrica in enumerate(METRICAS_ESCOLA):
+            colunas[f"quantidade_{metrica}"] = self.quantidades[:, j]
+            colunas[f"media_{metrica}"] = medias[:, j]
+            colunas[f"variancia_{metrica}"] = np.where(self.quantidades[:, j] > 1, variancias[:, j], np.nan)
+            for i, q in enumerate(PERCENTIS):
+                colunas[f"p{int(q * 100)}_{metrica}"] = quantis[:, j, i]
+        return pd.DataFrame(colunas)
+
+
+def agregar_escolas(caminho: str, tamanho_bloco: int = TAMANHO_BLOCO) -> pd.DataFrame:
+    """Uma linha por escola (CO_ESCOLA preenchido), lendo o arquivo de resultados uma única vez, em blocos."""
+    acumulador = _Acumulador()
+    leitor = pd.read_csv(
+        caminho,
+        sep=";",
+        encoding="latin1",
+        usecols=list(COLUNAS_ESCOLA),
+        chunksize=tamanho_bloco
+    )
+    for bloco in leitor:
+        bloco = bloco.rename(columns=COLUNAS_ESCOLA).dropna(subset=["codigo_escola"])
+        bloco["codigo_escola"] = bloco["codigo_escola"].astype(np.int64)
+        if len(bloco):
+            acumulador.adicionar(bloco)
+    return acumulador.finalizar()
+
+
+def gravar_escolas(escolas: pd.DataFrame, caminho: str):
+    """Grava os agregados ordenados por UF/município, com a ordem decrescente de cada métrica."""
+    escolas = escolas.sort_values(["uf_escola", "municipio_escola", "codigo_escola"]).reset_index(drop=True)
+    for metrica in METRICAS_ESCOLA:
+        # Linhas da tabela da melhor para a pior média (escolas sem nota ficam no fim)
+        ordem = np.argsort(-escolas[f"media_{metrica}"].fillna(-np.inf).to_numpy(), kind="stable")
+        escolas[f"ordem_{metrica}"] = ordem.astype(np.int32)
+    for coluna in ["uf_escola", "municipio_escola"]:
+        escolas[coluna] = escolas[coluna].astype("category")
+    escrever_arrow(escolas, caminho)
+
+
+@dataclass(frozen=True)
+class RankingEscolas:
+    """Consultas de ranking sobre os agregados por escola (sem reordenar nada a cada consulta)."""
+    escolas: TabelaEnem
+
+    def filtrar(self, ufs: List[str] | None = None, municipios: List[str] | None = None,
+                min_alunos: int = MIN_ALUNOS) -> np.ndarray:
+        """Máscara das escolas nas UFs/municípios pedidos (vazio ou None = sem filtro) e com alunos suficientes."""
+        mask = self.escolas.valores("alunos") >= min_alunos
+        if ufs:
+            mask &= self.escolas.isin("uf_escola", ufs)
+        if municipios:
+            mask &= self.escolas.isin("municipio_escola", municipios)
+        return mask
+
+    def _ordem(self, metrica: str, mask: np.ndarray) -> np.ndarray:
+        ordem = self.escolas.valores(f"ordem_{metrica}")
+        return ordem[mask[ordem]]
+
+    def top(self, metrica: str, mask: np.ndarray, n: int = 10) -> pd.DataFrame:
+        """As n escolas com maior média da métrica entre as da máscara."""
+        linhas = self._ordem(metrica, mask)[:n]
+        selecao = np.zeros(len(self.escolas), dtype=bool)
+        selecao[linhas] = True
+        colunas = ["codigo_escola", "uf_escola", "municipio_escola", "alunos",
+                   f"media_{metrica}"] + [f"p{int(q * 100)}_{metrica}" for q in PERCENTIS]
+        # to_pandas devolve na ordem da tabela; a ordem do ranking é refeita com 'linhas'
+        top = self.escolas.to_pandas(colunas, selecao)
+        top.index = np.flatnonzero(selecao)
+        return top.loc[linhas].reset_index(drop=True)
+
+    def perfis(self, mask: np.ndarray) -> pd.DataFrame:
+        """Perfil médio (média das 5 notas) e nº de alunos das escolas da máscara, indexado pelo código INEP."""
+        colunas = ["codigo_escola", "uf_escola", "municipio_escola", "alunos"] + [f"media_{nota}" for nota in COLUNAS_NOTAS]
+        perfis = self.escolas.to_pandas(colunas, mask).set_index("codigo_escola")
+        return perfis.rename(columns={f"media_{nota}": nota for nota in COLUNAS_NOTAS})
+
+    def posicao(self, codigo_escola: int, metrica: str, mask: np.ndarray) -> Tuple[int, int, float] | None:
+        """(posição, total, percentil) da escola entre as da máscara; None se ela não estiver na máscara."""
+        ordem = self._ordem(metrica, mask)
+        linha = np.flatnonzero(self.escolas.valores("codigo_escola") == codigo_escola)
+        if not len(linha):
+            return None
+        posicoes = np.flatnonzero(ordem == linha[0])
+        if not len(posicoes):
+            return None
+        posicao = int(posicoes[0]) + 1
+        total = len(ordem)
+        return posicao, total, 100.0 * (total - posicao) / max(total - 1, 1)
+
+
+def abrir_ranking(caminho: str) -> RankingEscolas:
+    return RankingEscolas(abrir_arrow(caminho))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agregados por escola (ranking) a partir dos resultados do ENEM 2024.")
+    parser.add_argument("--entrada", default=os.path.join("data", ARQUIVOS_POR_ANO[2024]["resultados"]))
+    parser.add_argument("--saida", default=os.path.join("data", "enem_2024_escolas.arrow"))
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    escolas = agregar_escolas(args.entrada, args.tamanho_bloco)
+    gravar_escolas(escolas, args.saida)
+    logger.info("%d escolas agregadas em %s.", len(escolas), args.saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+import pandas as pd
+from minisom import MiniSom
+from sklearn.cluster import DBSCAN, KMeans
+from sklearn.metrics import adjusted_rand_score
+from artefatos_ml import caminho_artefato, gravar_artefato, ler_artefato
+
+# ========================
+# Estabilidade dos agrupamentos por bootstrap
+# ========================
+# O agrupamento de referência (dados completos) é comparado com os agrupamentos de várias
+# reamostras bootstrap, ajustadas em paralelo num pool de processos. Para cada reamostra, só
+# os alunos sorteados (sem repetição) entram na comparação:
+#   - ARI (adjusted Rand) entre a referência e a reamostra;
+#   - Jaccard de cada cluster de referência com o cluster mais parecido da reamostra;
+#   - co-atribuição: fração das reamostras em que cada par de alunos ficou no mesmo cluster.
+# DBSCAN: ruído (-1) não é cluster, não entra no Jaccard e não conta como co-atribuição.
+# Os resultados ficam nos artefatos (artefatos_ml): a mesma análise não é refeita.
+
+ALGORITMOS = ["kmeans", "dbscan", "som"]
+N_REAMOSTRAS = 50
+
+
+def rotular(algoritmo: str, X: np.ndarray, parametros: Dict[str, Any], semente: int = 42) -> np.ndarray:
+    """Rótulos inteiros de um ajuste, com os mesmos hiperparâmetros fixos do ml_notas."""
+    if algoritmo == "kmeans":
+        return KMeans(n_clusters=parametros["n_clusters"], random_state=semente, n_init=10).fit_predict(X)
+    if algoritmo == "dbscan":
+        return DBSCAN(eps=parametros["eps"], min_samples=parametros["min_samples"]).fit_predict(X)
+    if algoritmo == "som":
+        som = MiniSom(parametros["grid_x"], parametros["grid_y"], X.shape[1], sigma=1.0, learning_rate=0.5, random_seed=semente)
+        som.random_weights_init(X)
+        som.train_random(X, 500)
+        return np.array([i * parametros["grid_y"] + j for i, j in (som.winner(x) for x in X)])
+    raise ValueError(f"Algoritmo desconhecido: {algoritmo}")
+
+
+def _reamostra(algoritmo: str, X: np.ndarray, parametros: Dict[str, Any], semente: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Ajusta uma reamostra bootstrap; devolve os alunos sorteados (sem repetição) e os seus rótulos."""
+    rng = np.random.default_rng(semente)
+    sorteio = rng.integers(0, len(X), len(X))
+    rotulos = rotular(algoritmo, X[sorteio], parametros, semente)
+    alunos, primeira = np.unique(sorteio, return_index=True)
+    return alunos, rotulos[primeira]
+
+
+@dataclass(frozen=True)
+class EstabilidadeClusters:
+    referencia: np.ndarray          # rótulos do ajuste nos dados completos
+    ari: np.ndarray                 # ARI de cada reamostra
+    jaccard: pd.Series              # Jaccard médio de cada cluster de referência
+    coatribuicao: np.ndarray        # (n, n): fração das reamostras com o par no mesmo cluster
+
+    @property
+    def n_reamostras(self) -> int:
+        return len(self.ari)
+
+
+def _jaccard_maximo(referencia: np.ndarray, rotulos: np.ndarray) -> Dict[int, float]:
+    jaccard = {}
+    for cluster in np.unique(referencia[referencia >= 0]):
+        membros = referencia == cluster
+        melhor = 0.0
+        for outro in np.unique(rotulos[rotulos >= 0]):
+            candidatos = rotulos == outro
+            melhor = max(melhor, (membros & candidatos).sum() / (membros | candidatos).sum())
+        jaccard[int(cluster)] = melhor
+    return jaccard
+
+
+def calcular_estabilidade(algoritmo: str, X: np.ndarray, parametros: Dict[str, Any],
+                          n_reamostras: int = N_REAMOSTRAS, semente: int = 42,
+                          progresso: Callable[[int, int], None] | None = None) -> EstabilidadeClusters:
+    """
+    Estabilidade de um agrupamento em 'n_reamostras' reamostras bootstrap, em paralelo.
+    'progresso(concluídas, total)' é chamado a cada reamostra concluída.
+    """
+    artefato = caminho_artefato(f"estabilidade_{algoritmo}", X, {**parametros, "n_reamostras": n_reamostras, "semente": semente})
+    resultado = ler_artefato(artefato)
+    if resultado is not None:
+        return resultado
+
+    referencia = rotular(algoritmo, X, parametros, semente)
+    n = len(X)
+    juntos = np.zeros((n, n))
+    presentes = np.zeros((n, n))
+    ari = np.zeros(n_reamostras)
+    jaccards = []
+    sementes = np.random.SeedSequence(semente).generate_state(n_reamostras)
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, n_reamostras)) as pool:
+        tarefas = {pool.submit(_reamostra, algoritmo, X, parametros, int(s)): i for i, s in enumerate(sementes)}
+        for concluidas, tarefa in enumerate(as_completed(tarefas), start=1):
+            alunos, rotulos = tarefa.result()
+            ari[tarefas[tarefa]] = adjusted_rand_score(referencia[alunos], rotulos)
+            jaccards.append(_jaccard_maximo(referencia[alunos], rotulos))
+            mesmo = (rotulos[:, None] == rotulos[None, :]) & (rotulos[:, None] >= 0)
+            juntos[np.ix_(alunos, alunos)] += mesmo
+            presentes[np.ix_(alunos, alunos)] += 1
+            if progresso:
+                progresso(concluidas, n_reamostras)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coatribuicao = juntos / presentes
+    jaccard = pd.DataFrame(jaccards).mean().sort_index().rename("jaccard").rename_axis("cluster")
+    resultado = EstabilidadeClusters(referencia, ari, jaccard, coatribuicao)
+    gravar_artefato(artefato, f"estabilidade_{algoritmo}", parametros, resultado)
+    return resultado
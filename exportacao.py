@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Iterator, List
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dados_enem import (
+    COLUNAS_FILTRO,
+    Selecao,
+    colunas_dataset,
+    filtrar_dados,
+    particao_referencia,
+    particoes,
+    selecao_padrao,
+    versao_dataset
+)
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Exportação das linhas filtradas
+# ========================
+# As linhas da seleção são lidas partição por partição (só as UFs/municípios selecionados,
+# ver dados_enem.particoes) e em lotes de TAMANHO_LOTE linhas: cada lote é filtrado, projetado
+# nas colunas pedidas e gravado antes do próximo. A memória usada depende do tamanho do lote,
+# não do tamanho da seleção. A mesma função atende o botão de download e a linha de comando.
+# Os arquivos gerados para o dashboard ficam em PASTA_EXPORTACOES, limitada (como o armazém
+# de modelos do modelos_ml) a LIMITE_BYTES_EXPORTACOES: acima disso saem os usados há mais tempo.
+
+TAMANHO_LOTE = 100_000
+FORMATOS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+PASTA_EXPORTACOES = os.path.join(tempfile.gettempdir(), "enem_exportacoes")
+LIMITE_BYTES_EXPORTACOES = 2 * 1024 ** 3
+# Temporários mais antigos que isso são de processos interrompidos no meio da escrita
+IDADE_MAXIMA_TEMPORARIOS = 3600
+
+
+def lotes_filtrados(ano: int, selecao: Selecao, colunas: List[str],
+                    tamanho_lote: int = TAMANHO_LOTE) -> Iterator[pa.RecordBatch]:
+    """Lotes Arrow com as linhas da seleção e apenas as colunas pedidas."""
+    for _, dados in particoes(ano, selecao):
+        for inicio in range(0, len(dados), tamanho_lote):
+            fatia = dados.fatia(inicio, min(inicio + tamanho_lote, len(dados)))
+            mask = filtrar_dados(fatia, selecao)
+            if mask.any():
+                yield from fatia.tabela.select(colunas).filter(pa.array(mask)).to_batches()
+
+
+def _gravar(ano: int, selecao: Selecao, colunas: List[str], formato: str, caminho: str, tamanho_lote: int) -> int:
+    linhas = 0
+    if formato == "parquet":
+        escritor = None
+        try:
+            for lote in lotes_filtrados(ano, selecao, colunas, tamanho_lote):
+                if escritor is None:
+                    escritor = pq.ParquetWriter(caminho, lote.schema)
+                escritor.write_batch(lote)
+                linhas += lote.num_rows
+            if escritor is None:  # seleção vazia: arquivo só com o esquema
+                esquema = particao_referencia(ano).tabela.select(colunas).schema
+                escritor = pq.ParquetWriter(caminho, esquema)
+        finally:
+            if escritor is not None:
+                escritor.close()
+    elif formato == "csv":
+        with open(caminho, "w", encoding="latin1", errors="replace", newline="") as arquivo:
+            arquivo.write(";".join(colunas) + "\n")
+            for lote in lotes_filtrados(ano, selecao, colunas, tamanho_lote):
+                lote.to_pandas().to_csv(arquivo, sep=";", index=False, header=False)
+                linhas += lote.num_rows
+    else:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    return linhas
+
+
+def exportar(ano: int, selecao: Selecao, colunas: List[str], formato: str, destino: str,
+             tamanho_lote: int = TAMANHO_LOTE) -> int:
+    """Grava a seleção em CSV (';', latin1, como os dados do projeto) ou Parquet; devolve o nº de linhas."""
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    try:
+        linhas = _gravar(ano, selecao, colunas, formato, temporario, tamanho_lote)
+        os.replace(temporario, destino)
+    finally:
+        # Se a escrita falhou, o arquivo parcial não fica para trás
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return linhas
+
+
+def caminho_exportacao(ano: int, selecao: Selecao, colunas: List[str], formato: str) -> str:
+    """
+    Arquivo da exportação em PASTA_EXPORTACOES, reaproveitado enquanto a partição não mudar:
+    o nome é o hash da seleção, das colunas, do formato e da versão dos dados.
+    """
+    chave = json.dumps({
+        "ano": ano,
+        "versao": versao_dataset(ano),
+        "selecao": {coluna: sorted(selecao.get(coluna, [])) for coluna in COLUNAS_FILTRO},
+        "colunas": colunas,
+        "formato": formato
+    }, sort_keys=True)
+    nome = hashlib.sha256(chave.encode()).hexdigest()[:20]
+    return os.path.join(PASTA_EXPORTACOES, f"{nome}.{formato}")
+
+
+def aplicar_limite(limite: int = LIMITE_BYTES_EXPORTACOES):
+    """Remove as exportações usadas há mais tempo até a pasta caber no limite (e temporários abandonados)."""
+    if not os.path.isdir(PASTA_EXPORTACOES):
+        return
+    arquivos = []
+    agora = time.time()
+    for nome in os.listdir(PASTA_EXPORTACOES):
+        caminho = os.path.join(PASTA_EXPORTACOES, nome)
+        try:
+            estado = os.stat(caminho)
+            if nome.endswith(".tmp"):
+                if agora - estado.st_mtime > IDADE_MAXIMA_TEMPORARIOS:
+                    os.remove(caminho)
+                continue
+        except FileNotFoundError:  # removido por outra sessão
+            continue
+        arquivos.append((estado.st_mtime, estado.st_size, caminho))
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+        logger.info("Exportação %s removida pelo limite de disco.", caminho)
+
+
+def arquivo_exportacao(ano: int, selecao: Selecao, colunas: List[str], formato: str) -> str:
+    """Gera (se ainda não existir) e devolve o arquivo da exportação da seleção."""
+    destino = caminho_exportacao(ano, selecao, colunas, formato)
+    if os.path.exists(destino):
+        os.utime(destino)  # marca o uso, para a remoção das menos usadas
+        return destino
+    os.makedirs(PASTA_EXPORTACOES, exist_ok=True)
+    exportar(ano, selecao, colunas, formato, destino)
+    aplicar_limite()
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta as linhas do dataset do dashboard que atendem aos filtros.")
+    parser.add_argument("--ano", type=int, required=True)
+    parser.add_argument("--saida", required=True)
+    parser.add_argument("--formato", choices=sorted(FORMATOS), default=None,
+                        help="Padrão: deduzido da extensão da saída.")
+    parser.add_argument("--coluna", action="append", help="Coluna a exportar (pode repetir); padrão: todas.")
+    parser.add_argument("--filtro", action="append", default=[], metavar="COLUNA=VALOR",
+                        help=f"Restringe uma coluna a um valor (pode repetir). Colunas: {', '.join(COLUNAS_FILTRO)}.")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # Sem filtro, uma coluna aceita todos os valores (como a seleção inicial da barra lateral)
+    selecao = selecao_padrao(args.ano)
+    restricoes = {}
+    for filtro in args.filtro:
+        coluna, _, valor = filtro.partition("=")
+        if coluna not in COLUNAS_FILTRO:
+            parser.error(f"Coluna de filtro desconhecida: {coluna}")
+        restricoes.setdefault(coluna, []).append(valor)
+    selecao.update(restricoes)
+
+    formato = args.formato or os.path.splitext(args.saida)[1].lstrip(".").lower()
+    if formato not in FORMATOS:
+        parser.error("Informe --formato (csv ou parquet) ou use uma saída .csv/.parquet.")
+    colunas = args.coluna or colunas_dataset(args.ano)
+
+    linhas = exportar(args.ano, selecao, colunas, formato, args.saida, args.tamanho_lote)
+    logger.info("%d linhas exportadas em %s.", linhas, args.saida)
+
+
+if __name__ == "__main__":
+    main()
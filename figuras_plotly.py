@@ -0,0 +1,67 @@
+import json
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+# ========================
+# Cache de figuras Plotly serializadas
+# ========================
+# Montar uma figura do plotly.express (validação de cada propriedade, mapas de cor, layout)
+# custa dezenas de milissegundos, e a página refazia todas as figuras a cada rerun. Aqui a
+# figura é descrita pela função do px, pelos dados agregados e pela configuração estática
+# (argumentos e ajustes aplicados depois, como update_layout ou add_vline); o JSON pronto
+# fica no cache, com a chave calculada pelo st.cache_data a partir dessas entradas. Um rerun
+# só monta as figuras cujas entradas mudaram; as demais são reconstruídas do JSON sem
+# validação, o que custa cerca de um milissegundo.
+# Calcular essa chave exige hashear os dados (pandas.util.hash_pandas_object), cerca de dois
+# milissegundos por figura mesmo com poucas linhas. Quando os dados vêm de um agregado com
+# identidade conhecida (seleção, edição e versão dos dados), quem chama passa 'chave' e os
+# dados deixam de ser hasheados: só a chave, a configuração estática e os ajustes entram.
+
+MAX_FIGURAS = 512
+
+# (método da figura, argumentos), aplicados em ordem depois do px: ("update_layout", {...})
+Ajuste = Tuple[str, Dict[str, Any]]
+
+
+# Argumentos que carregam dados: com 'chave', ficam fora do hash (a chave os identifica)
+TIPOS_DADOS = (pd.DataFrame, pd.Series, pd.Index, np.ndarray)
+
+
+def _montar_json(funcao: str, dados: Any, argumentos: Dict[str, Any], ajustes: List[Ajuste]) -> str:
+    figura = getattr(px, funcao)(dados, **argumentos)
+    for metodo, parametros in ajustes:
+        getattr(figura, metodo)(**parametros)
+    return pio.to_json(figura, validate=False)
+
+
+@st.cache_data(max_entries=MAX_FIGURAS, show_spinner=False)
+def _figura_json(funcao: str, dados: Any, argumentos: Dict[str, Any], ajustes: List[Ajuste]) -> str:
+    return _montar_json(funcao, dados, argumentos, ajustes)
+
+
+@st.cache_data(max_entries=MAX_FIGURAS, show_spinner=False)
+def _figura_json_chave(funcao: str, chave: Hashable, configuracao: Dict[str, Any], ajustes: List[Ajuste],
+                       _dados: Any, _argumentos: Dict[str, Any]) -> str:
+    return _montar_json(funcao, _dados, _argumentos, ajustes)
+
+
+def figura(funcao: Callable[..., go.Figure], dados: Any = None, ajustes: List[Ajuste] | None = None,
+           chave: Hashable | None = None, **argumentos) -> go.Figure:
+    """
+    Figura do plotly.express 'funcao' (px.bar, px.pie, ...) com 'dados' e 'argumentos',
+    seguida dos 'ajustes'; reaproveitada do cache enquanto as entradas não mudarem.
+    'chave', se informada, identifica os dados (o DataFrame e os argumentos array) e
+    substitui o hash deles: deve mudar sempre que eles mudarem.
+    """
+    if chave is None:
+        especificacao = _figura_json(funcao.__name__, dados, argumentos, ajustes or [])
+    else:
+        configuracao = {nome: valor for nome, valor in argumentos.items() if not isinstance(valor, TIPOS_DADOS)}
+        especificacao = _figura_json_chave(funcao.__name__, chave, configuracao, ajustes or [], dados, argumentos)
+    # O JSON veio de uma figura já validada: reconstruí-la sem validar é só copiar o dicionário
+    return go.Figure(json.loads(especificacao), _validate=False)
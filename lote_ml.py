@@ -0,0 +1,89 @@
+import argparse
+import itertools
+import logging
+import time
+from typing import Dict, List
+import artefatos_ml
+from ml_notas import (
+    CAMINHO_COLEGIO_TESTE,
+    NOME_COLEGIO_TESTE,
+    ajustar_pca,
+    carregar_escola,
+    importancia_random_forest,
+    preparar_matriz,
+    preparar_notas,
+    rotulos_dbscan,
+    rotulos_kmeans,
+    rotulos_som
+)
+from varredura_ml import GRADES
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Lote de pré-cálculo das análises da página de clusterização
+# ========================
+# Executa, fora do Streamlit, todas as análises de clusters_colegio_teste para cada escola
+# configurada e grava os resultados como artefatos (ver artefatos_ml.py). A página passa a
+# só ler resultados prontos. Artefatos já existentes são pulados: rodar o lote de novo só
+# calcula o que mudou (dados novos ou parâmetros novos).
+
+# Escolas/turmas configuradas: nome -> CSV no layout de notas_colegio_teste.csv
+ESCOLAS: Dict[str, str] = {
+    NOME_COLEGIO_TESTE: CAMINHO_COLEGIO_TESTE
+}
+
+# Grades de parâmetros: as mesmas faixas dos sliders da página (declaradas em varredura_ml)
+GRADE_K = GRADES["kmeans"]["n_clusters"]
+GRADE_EPS = GRADES["dbscan"]["eps"]
+GRADE_MIN_SAMPLES = GRADES["dbscan"]["min_samples"]
+GRADE_SOM_X = GRADES["som"]["grid_x"]
+GRADE_SOM_Y = GRADES["som"]["grid_y"]
+
+
+def conjuntos_colunas(colunas_numericas: List[str]) -> List[List[str]]:
+    """Seleções de colunas pré-calculadas: a seleção padrão da página e todas as notas."""
+    conjuntos = [colunas_numericas[:2], colunas_numericas]
+    return [c for i, c in enumerate(conjuntos) if len(c) >= 2 and c not in conjuntos[:i]]
+
+
+def precalcular_escola(nome: str, caminho: str) -> Dict[str, int]:
+    """Pré-calcula todas as análises de uma escola; devolve quantos artefatos novos cada análise gerou."""
+    df = carregar_escola(caminho)
+    novos = {"importancia_rf": 0, "pca": 0, "kmeans": 0, "dbscan": 0, "som": 0}
+
+    colunas_notas = preparar_notas(df)
+    novos["importancia_rf"] += importancia_random_forest.precalcular(colunas_notas)
+    novos["pca"] += ajustar_pca.precalcular(colunas_notas)
+
+    colunas_numericas = df.select_dtypes(include=["int64", "float64"]).columns.tolist()
+    for colunas in conjuntos_colunas(colunas_numericas):
+        _, X_scaled = preparar_matriz(df, colunas)
+        for k in GRADE_K:
+            novos["kmeans"] += rotulos_kmeans.precalcular(X_scaled, k)
+        for eps, min_samples in itertools.product(GRADE_EPS, GRADE_MIN_SAMPLES):
+            novos["dbscan"] += rotulos_dbscan.precalcular(X_scaled, eps, min_samples)
+        for grid_x, grid_y in itertools.product(GRADE_SOM_X, GRADE_SOM_Y):
+            novos["som"] += rotulos_som.precalcular(X_scaled, grid_x, grid_y)
+        logger.info("%s: colunas %s pré-calculadas.", nome, colunas)
+    return novos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcula os artefatos da página de clusterização.")
+    parser.add_argument("--escola", action="append", choices=sorted(ESCOLAS),
+                        help="Escola a processar (pode repetir); padrão: todas.")
+    parser.add_argument("--pasta", default=None, help="Pasta dos artefatos (padrão: artefatos_ml.PASTA_ARTEFATOS).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.pasta:
+        artefatos_ml.PASTA_ARTEFATOS = args.pasta
+
+    for nome in args.escola or sorted(ESCOLAS):
+        inicio = time.perf_counter()
+        novos = precalcular_escola(nome, ESCOLAS[nome])
+        logger.info("%s: %s artefatos novos em %.1f s.", nome, novos, time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    main()
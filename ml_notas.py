@@ -1,3 +1,5 @@
+import os
+import time
 import streamlit as st
 import numpy as np
 import pandas as pd
@@ -7,6 +9,279 @@ from sklearn.cluster import DBSCAN, KMeans
 from sklearn.decomposition import PCA
 from sklearn.ensemble import RandomForestRegressor
 from minisom import MiniSom
+from agregacoes import COLUNAS_NOTAS
+from anos_enem import ANOS_ENEM
+from artefatos_ml import precalculavel
+from dados_enem import caminho_escolas, ranking_escolas
+from escolas_enem import MIN_ALUNOS
+from figuras_plotly import figura
+from modelos_ml import modelo_persistente
+from estabilidade_ml import ALGORITMOS, N_REAMOSTRAS, calcular_estabilidade
+from varredura_ml import GRADES, METRICAS, varrer
+from vizinhos import IndiceVizinhos
+
+NOME_COLEGIO_TESTE = "colegio_teste"
+CAMINHO_COLEGIO_TESTE = f"data/notas_{NOME_COLEGIO_TESTE}.csv"
+
+# ========================
+# Preparação dos dados (compartilhada pela página e pelo lote de pré-cálculo)
+# ========================
+
+def carregar_escola(caminho: str) -> pd.DataFrame:
+    return pd.read_csv(caminho, sep=";", encoding="latin1")
+
+def preparar_matriz(df: pd.DataFrame, colunas: list):
+    """Linhas completas das colunas escolhidas e a matriz padronizada usada pelos agrupamentos."""
+    df_filtrado = df[colunas].dropna().copy()
+    return df_filtrado, StandardScaler().fit_transform(df_filtrado)
+
+def preparar_notas(df: pd.DataFrame) -> pd.DataFrame:
+    """Notas das 5 áreas (linhas completas), entrada do RandomForest e do PCA."""
+    return df[COLUNAS_NOTAS].dropna()
+
+# ========================
+# Ajustes cacheados: cada modelo só é reajustado quando os seus próprios parâmetros mudam.
+# Os resultados são lidos dos artefatos pré-calculados por lote_ml.py, quando existirem, e os
+# modelos ajustados ficam no armazém persistente (modelos_ml.py), que sobrevive a reinícios.
+# ========================
+
+@st.cache_data
+@precalculavel("importancia_rf")
+def importancia_random_forest(colunas_notas: pd.DataFrame) -> pd.Series:
+    y = colunas_notas.mean(axis=1) # média geral como "alvo" 
+    rf_scaled = StandardScaler().fit_transform(colunas_notas)
+    rf = modelo_persistente(
+        "random_forest", colunas_notas, {"n_estimators": 100, "random_state": 42},
+        lambda: RandomForestRegressor(n_estimators=100, random_state=42).fit(rf_scaled, y)
+    )
+    importancia = pd.Series(rf.feature_importances_, index=colunas_notas.columns)
+    return importancia.sort_values(ascending=True)
+
+@st.cache_data
+@precalculavel("kmeans")
+def rotulos_kmeans(X_scaled: np.ndarray, n_clusters: int) -> np.ndarray:
+    kmeans = modelo_persistente(
+        "kmeans", X_scaled, {"n_clusters": n_clusters, "random_state": 42, "n_init": 10},
+        lambda: KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit(X_scaled)
+    )
+    return kmeans.labels_
+
+@st.cache_data
+@precalculavel("dbscan")
+def rotulos_dbscan(X_scaled: np.ndarray, eps: float, min_samples: int) -> np.ndarray:
+    dbscan = DBSCAN(eps=eps, min_samples=min_samples)
+    return dbscan.fit_predict(X_scaled)
+
+def _treinar_som(X_scaled: np.ndarray, grid_x: int, grid_y: int) -> MiniSom:
+    som = MiniSom(grid_x, grid_y, X_scaled.shape[1], sigma=1.0, learning_rate=0.5, random_seed=42)
+    som.random_weights_init(X_scaled)
+    som.train_random(X_scaled, 500)
+    return som
+
+@st.cache_data
+@precalculavel("som")
+def rotulos_som(X_scaled: np.ndarray, grid_x: int, grid_y: int) -> list:
+    som = modelo_persistente(
+        "som", X_scaled,
+        {"grid_x": grid_x, "grid_y": grid_y, "sigma": 1.0, "learning_rate": 0.5, "iteracoes": 500, "random_seed": 42},
+        lambda: _treinar_som(X_scaled, grid_x, grid_y)
+    )
+    return [str(som.winner(x)) for x in X_scaled]
+
+@st.cache_data
+@precalculavel("pca")
+def ajustar_pca(colunas_notas: pd.DataFrame):
+    pca = modelo_persistente("pca", colunas_notas, {"n_components": 2}, lambda: PCA(n_components=2).fit(colunas_notas))
+    pca_resultado = pca.transform(colunas_notas)
+    # Cálculo dos loadings
+    loadings = pca.components_.T * np.sqrt(pca.explained_variance_)
+    return pca_resultado, pca.explained_variance_ratio_, loadings
+
+# ========================
+# Índices de vizinhos: a árvore é reaproveitada por todas as sessões
+# ========================
+
+# Poucas árvores por processo: a chave muda com as notas e com a estrutura escolhida
+MAX_INDICES = 4
+
+@st.cache_resource(max_entries=MAX_INDICES)
+def indice_alunos(notas: pd.DataFrame, algoritmo: str) -> IndiceVizinhos:
+    """Índice das notas dos alunos (só as 5 colunas: as colunas de cluster mudam a cada slider)."""
+    return IndiceVizinhos.construir(notas, algoritmo)
+
+@st.cache_resource(max_entries=MAX_INDICES)
+def _indice_escolas(ano: int, versao: float, algoritmo: str) -> IndiceVizinhos:
+    ranking = ranking_escolas(ano)
+    return IndiceVizinhos.construir(ranking.perfis(ranking.filtrar()), algoritmo)
+
+def indice_escolas(ano: int, algoritmo: str) -> IndiceVizinhos | None:
+    """Índice dos perfis médios das escolas (agregados do escolas_enem), ou None se não foram gerados."""
+    caminho = caminho_escolas(ano)
+    if not os.path.exists(caminho):
+        return None
+    return _indice_escolas(ano, os.path.getmtime(caminho), algoritmo)
+
+def secao_semelhantes(df: pd.DataFrame):
+    st.subheader("🔎 Alunos e escolas semelhantes")
+    algoritmo = st.radio(
+        "Estrutura do índice",
+        ["kd_tree", "ball_tree"],
+        format_func={"kd_tree": "KD-tree", "ball_tree": "BallTree"}.get,
+        horizontal=True
+    )
+
+    # --- Alunos --- #
+    indice = indice_alunos(df[COLUNAS_NOTAS], algoritmo)
+    st.write("### Alunos com perfil de notas semelhante")
+    aluno = st.selectbox(
+        "Aluno de referência",
+        indice.perfis.index.tolist(),
+        format_func=lambda i: f"Aluno {i} - média {indice.perfis.loc[i, COLUNAS_NOTAS].mean():.1f}"
+    )
+    tipo_busca = st.radio("Tipo de busca", ["k vizinhos mais próximos", "Raio"], horizontal=True)
+    consulta = indice.perfis.loc[[aluno]]
+    inicio = time.perf_counter()
+    if tipo_busca == "Raio":
+        raio = st.slider("Raio (em desvios padrão)", 0.1, 3.0, 1.0, 0.1)
+        semelhantes = indice.raio(consulta, raio)
+        semelhantes = semelhantes[semelhantes["vizinho"] != aluno]
+    else:
+        k = st.slider("Número de vizinhos (k)", 1, max(len(indice.perfis) - 1, 1), min(5, max(len(indice.perfis) - 1, 1)))
+        semelhantes = indice.knn(consulta, k, excluir_proprio=True)
+    duracao = (time.perf_counter() - inicio) * 1000
+    st.dataframe(semelhantes.drop(columns="consulta"), hide_index=True)
+    st.caption(f"{len(semelhantes)} aluno(s) encontrados em {duracao:.1f} ms.")
+
+    # --- Escolas --- #
+    st.write("### Escolas com perfil médio semelhante")
+    ano = ANOS_ENEM[-1]
+    escolas = indice_escolas(ano, algoritmo)
+    if escolas is None:
+        st.info(f"Agregados por escola de {ano} indisponíveis: gere-os com `python escolas_enem.py`.")
+        return
+    if len(escolas.perfis) < 2:
+        st.info(f"Escolas insuficientes nos agregados de {ano} para a busca por semelhança.")
+        return
+    st.caption(f"Escolas do ENEM {ano} com ao menos {MIN_ALUNOS} alunos, comparadas à média da turma carregada.")
+    perfil_medio = df[COLUNAS_NOTAS].dropna().mean().to_frame().T
+    k_escolas = st.slider("Número de escolas", 1, len(escolas.perfis), min(5, len(escolas.perfis)))
+    parecidas = escolas.knn(perfil_medio, k_escolas)
+    st.dataframe(parecidas.drop(columns="consulta").rename(columns={"vizinho": "codigo_escola"}), hide_index=True)
+
+# ========================
+# Estabilidade por bootstrap: reamostras em paralelo, resultado guardado nos artefatos
+# ========================
+
+NOMES_ALGORITMOS = {"kmeans": "KMeans", "dbscan": "DBSCAN", "som": "SOM"}
+
+def secao_estabilidade(X_scaled: np.ndarray, parametros: dict):
+    st.subheader("🔁 Estabilidade dos clusters (bootstrap)")
+    if not st.toggle("Calcular estabilidade dos clusters", key="exibir_estabilidade"):
+        st.caption("Ajusta cada algoritmo, com os parâmetros escolhidos acima, em várias reamostras bootstrap dos alunos.")
+        return
+    algoritmo = st.radio("Algoritmo", ALGORITMOS, format_func=NOMES_ALGORITMOS.get, horizontal=True)
+    n_reamostras = st.slider("Número de reamostras", 10, 200, N_REAMOSTRAS, 10)
+
+    barra = st.progress(0.0, text="Ajustando reamostras...")
+    estabilidade = calcular_estabilidade(
+        algoritmo, X_scaled, parametros[algoritmo], n_reamostras,
+        progresso=lambda feitas, total: barra.progress(feitas / total, text=f"Reamostras ajustadas: {feitas}/{total}")
+    )
+    barra.empty()
+
+    col_ari, col_clusters = st.columns(2)
+    col_ari.metric("ARI médio (referência x reamostras)", f"{estabilidade.ari.mean():.2f}",
+                   help=f"Desvio padrão {estabilidade.ari.std():.2f} em {estabilidade.n_reamostras} reamostras")
+    col_clusters.metric("Clusters de referência", len(estabilidade.jaccard))
+
+    fig_jaccard = figura(
+        px.bar,
+        x=estabilidade.jaccard.index.astype(str),
+        y=estabilidade.jaccard.values,
+        title="Estabilidade por cluster (Jaccard médio)",
+        labels={"x": "Cluster", "y": "Jaccard médio"},
+        range_y=[0, 1]
+    )
+    st.plotly_chart(fig_jaccard, use_container_width=True)
+
+    # Alunos ordenados pelo cluster de referência: blocos claros na diagonal = clusters estáveis
+    ordem = np.argsort(estabilidade.referencia, kind="stable")
+    fig_coatribuicao = figura(
+        px.imshow,
+        estabilidade.coatribuicao[np.ix_(ordem, ordem)],
+        color_continuous_scale="Blues",
+        zmin=0,
+        zmax=1,
+        title="Matriz de co-atribuição (fração das reamostras com o par no mesmo cluster)",
+        labels={"x": "Aluno", "y": "Aluno", "color": "Co-atribuição"}
+    )
+    st.plotly_chart(fig_coatribuicao, use_container_width=True)
+    st.info(
+        "🔁 **Interpretação da estabilidade:**\n"
+        "- Jaccard acima de 0,75 indica um cluster estável; abaixo de 0,5, um cluster que se desfaz quando a turma muda um pouco.\n"
+        "- O ARI compara a partição inteira: perto de 1, as reamostras reproduzem os mesmos grupos.\n"
+        "- Na matriz de co-atribuição, alunos que sempre ficam juntos formam blocos escuros na diagonal."
+    )
+
+# ========================
+# Varredura de hiperparâmetros: grade avaliada em paralelo, com "ir para a melhor configuração"
+# ========================
+
+# Valores iniciais dos sliders de hiperparâmetros (guardados no session_state para que a
+# varredura possa aplicar a melhor configuração)
+PARAMETROS_PADRAO = {"n_clusters": 3, "eps": 1.0, "min_samples": 5, "grid_x": 3, "grid_y": 1}
+
+def aplicar_configuracao(parametros: dict):
+    for nome, valor in parametros.items():
+        st.session_state[nome] = valor
+
+def secao_varredura(X_scaled: np.ndarray):
+    st.subheader("🧭 Varredura de hiperparâmetros")
+    if not st.toggle("Varrer a grade de hiperparâmetros", key="exibir_varredura"):
+        st.caption("Avalia todas as combinações dos sliders de um algoritmo e aponta a melhor configuração.")
+        return
+    col_algoritmo, col_metrica = st.columns(2)
+    algoritmo = col_algoritmo.radio("Algoritmo", ALGORITMOS, format_func=NOMES_ALGORITMOS.get, horizontal=True, key="algoritmo_varredura")
+    metrica = col_metrica.radio(
+        "Métrica",
+        list(METRICAS),
+        format_func={"silhouette": "Silhouette (maior é melhor)", "davies_bouldin": "Davies-Bouldin (menor é melhor)"}.get,
+        horizontal=True
+    )
+
+    barra = st.progress(0.0, text="Avaliando a grade...")
+    # Sem st.cache_data: cada ponto da grade já fica guardado nos artefatos e a barra de
+    # progresso precisa ser atualizada durante a varredura
+    tabela = varrer(
+        algoritmo, X_scaled, metrica,
+        progresso=lambda feitos, total: barra.progress(feitos / total, text=f"Configurações avaliadas: {feitos}/{total}")
+    )
+    barra.empty()
+
+    parametros = list(GRADES[algoritmo])
+    if pd.isna(tabela.loc[0, metrica]):
+        st.warning("Nenhuma configuração da grade formou ao menos dois clusters.")
+        return
+    melhor_configuracao = {nome: tabela[nome].iloc[0].item() for nome in parametros}
+    st.write(f"### Melhor configuração: {melhor_configuracao} ({metrica} = {tabela.loc[0, metrica]:.3f})")
+    st.button("Aplicar melhor configuração", on_click=aplicar_configuracao, args=(melhor_configuracao,))
+    st.dataframe(tabela.head(20), hide_index=True)
+
+    if len(parametros) == 1:
+        fig_grade = figura(px.line, tabela.sort_values(parametros[0]), x=parametros[0], y=metrica, markers=True,
+                           title=f"{metrica} por {parametros[0]}")
+    else:
+        mapa = tabela.pivot_table(index=parametros[1], columns=parametros[0], values=metrica)
+        fig_grade = figura(
+            px.imshow,
+            mapa,
+            color_continuous_scale="Viridis" if METRICAS[metrica] else "Viridis_r",
+            aspect="auto",
+            origin="lower",
+            title=f"{metrica} no espaço de parâmetros",
+            labels={"x": parametros[0], "y": parametros[1], "color": metrica}
+        )
+    st.plotly_chart(fig_grade, use_container_width=True)
 
 def clusters_colegio_teste():
     # ========================
@@ -17,12 +292,14 @@ def clusters_colegio_teste():
 
     @st.cache_data
     def carregar_dados():
-        df = pd.read_csv("data/notas_colegio_teste.csv", sep=";", encoding="latin1")
-        return df
+        return carregar_escola(CAMINHO_COLEGIO_TESTE)
 
     df = carregar_dados()
     st.write("### Dataset Carregado", df.head())
 
+    for nome, valor in PARAMETROS_PADRAO.items():
+        st.session_state.setdefault(nome, valor)
+
     # ========================
 
     # Seleção de colunas numéricas
@@ -40,8 +317,7 @@ def clusters_colegio_teste():
 
     if len(colunas_escolhidas) >= 2:
         # Preparar dados
-        df_filtrado = df[colunas_escolhidas].dropna().copy()
-        X_scaled = StandardScaler().fit_transform(df_filtrado)
+        df_filtrado, X_scaled = preparar_matriz(df, colunas_escolhidas)
 
         # ============================== 
         # Estatística descritiva simples 
@@ -60,21 +336,11 @@ def clusters_colegio_teste():
         # ============================== 
         st.subheader("🌲 RandomForest - Importância das disciplinas") 
         # Seleciona apenas colunas numéricas antes de calcular a média
-        colunas_notas = df[[
-            "nota_ciencias_natureza",
-            "nota_ciencias_humanas",
-            "nota_linguagens_codigos",
-            "nota_matematica",
-            "nota_redacao"
-        ]].dropna()
-        y = colunas_notas.mean(axis=1) # média geral como "alvo" 
-        rf = RandomForestRegressor(n_estimators=100, random_state=42)
-        rf_scaled = StandardScaler().fit_transform(colunas_notas)
-        rf.fit(rf_scaled, y) 
-        importancia = pd.Series(rf.feature_importances_, index=colunas_notas.columns)
-        importancia = importancia.sort_values(ascending=True) 
+        colunas_notas = preparar_notas(df)
+        importancia = importancia_random_forest(colunas_notas)
         
-        fig_importancia = px.bar(
+        fig_importancia = figura(
+            px.bar,
             importancia, 
             orientation="h", 
             title="Importância das disciplinas para o desempenho geral" 
@@ -98,12 +364,12 @@ def clusters_colegio_teste():
         # KMeans - Agrupamento de alunos 
         # ============================== 
         st.subheader("🤖 KMeans - Agrupamento")
-        n_clusters = st.slider("Número de clusters (K)", 2, 10, 3) 
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10) 
-        clusters = kmeans.fit_predict(X_scaled) 
+        n_clusters = st.slider("Número de clusters (K)", 2, 10, key="n_clusters")
+        clusters = rotulos_kmeans(X_scaled, n_clusters) 
         df["Cluster_KMeans"] = -1 
         df.loc[df_filtrado.index, "Cluster_KMeans"] = clusters.astype(str) 
-        fig_clusters = px.scatter( 
+        fig_clusters = figura( 
+            px.scatter,
             df_filtrado, 
             x=colunas_escolhidas[0], 
             y=colunas_escolhidas[1], 
@@ -124,8 +390,8 @@ def clusters_colegio_teste():
         # DBSCAN
         # ========================
         st.subheader("🧩 DBSCAN - Agrupamento por densidade")
-        eps = st.slider("eps - Raio máximo de vizinhança", 0.1, 5.0, 1.0, 0.1)
-        min_samples = st.slider("min_samples - Exemplos mínimos a serem considerados", 1, 20, 5)
+        eps = st.slider("eps - Raio máximo de vizinhança", 0.1, 5.0, step=0.1, key="eps")
+        min_samples = st.slider("min_samples - Exemplos mínimos a serem considerados", 1, 20, key="min_samples")
 
         st.info(
             "**Explicação sobre a parametrizaçãa do algoritmo:**\n"
@@ -135,13 +401,13 @@ def clusters_colegio_teste():
             "4. Se não houver, o ponto pode ser classificado como border point (se estiver próximo de um core point) ou como noise, ou ruído (se não pertencer a cluster nenhum)."
         )
         
-        dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-        clusters_dbscan = dbscan.fit_predict(X_scaled)
+        clusters_dbscan = rotulos_dbscan(X_scaled, eps, min_samples)
 
         df_filtrado["Cluster_DBSCAN"] = clusters_dbscan.astype(str)
 
         st.write("### Resultado DBSCAN")
-        fig_dbscan = px.scatter(
+        fig_dbscan = figura(
+            px.scatter,
             df_filtrado,
             x=colunas_escolhidas[0],
             y=colunas_escolhidas[1],
@@ -162,20 +428,13 @@ def clusters_colegio_teste():
         # SOM
         # ========================
         st.subheader("🧠 Self-Organizing Map (SOM)")
-        grid_x = st.slider("Tamanho do SOM (x)", 2, 10, 3)
-        grid_y = st.slider("Tamanho do SOM (y)", 1, 10, 1)
-
-        som = MiniSom(grid_x, grid_y, X_scaled.shape[1], sigma=1.0, learning_rate=0.5)
-        som.random_weights_init(X_scaled)
-        som.train_random(X_scaled, 500)
+        grid_x = st.slider("Tamanho do SOM (x)", 2, 10, key="grid_x")
+        grid_y = st.slider("Tamanho do SOM (y)", 1, 10, key="grid_y")
 
-        clusters_som = []
-        for x in X_scaled:
-            w = som.winner(x)
-            clusters_som.append(str(w))
-        df_filtrado["Cluster_SOM"] = clusters_som
+        df_filtrado["Cluster_SOM"] = rotulos_som(X_scaled, grid_x, grid_y)
 
-        fig_som = px.scatter(
+        fig_som = figura(
+            px.scatter,
             df_filtrado,
             x=colunas_escolhidas[0],
             y=colunas_escolhidas[1],
@@ -197,7 +456,8 @@ def clusters_colegio_teste():
         # COMBINADO DBSCAN + SOM
         # ========================
         st.write("### Comparação DBSCAN + SOM")
-        fig_combinado = px.scatter(
+        fig_combinado = figura(
+            px.scatter,
             df_filtrado,
             x=colunas_escolhidas[0],
             y=colunas_escolhidas[1],
@@ -215,7 +475,8 @@ def clusters_colegio_teste():
         st.dataframe(matriz_comparacao)
 
         # Heatmap da matriz
-        fig_heatmap = px.imshow(
+        fig_heatmap = figura(
+            px.imshow,
             matriz_comparacao,
             text_auto=True,
             color_continuous_scale="Blues",
@@ -223,17 +484,30 @@ def clusters_colegio_teste():
         )
         st.plotly_chart(fig_heatmap, use_container_width=True)
 
+        # ========================
+        # Estabilidade dos clusters (bootstrap)
+        # ========================
+        secao_estabilidade(X_scaled, {
+            "kmeans": {"n_clusters": n_clusters},
+            "dbscan": {"eps": eps, "min_samples": min_samples},
+            "som": {"grid_x": grid_x, "grid_y": grid_y}
+        })
+
+        # ========================
+        # Varredura de hiperparâmetros
+        # ========================
+        secao_varredura(X_scaled)
+
        # ============================== 
         # PCA - Redução de Dimensionalidade 
         # ============================== 
         st.subheader("📉 PCA - Visualização em 2D")
 
         # Executar o PCA sobre as notas
-        pca = PCA(n_components=2)
-        pca_resultado = pca.fit_transform(colunas_notas)
+        pca_resultado, variancia_explicada, loadings = ajustar_pca(colunas_notas)
 
         # Variância explicada
-        var_exp = pca.explained_variance_ratio_ * 100
+        var_exp = variancia_explicada * 100
         st.write(f"### Variância explicada: PC1 = {var_exp[0]:.2f}% | PC2 = {var_exp[1]:.2f}%")
 
         # Adicionar resultados ao DataFrame
@@ -245,7 +519,8 @@ def clusters_colegio_teste():
 
         # Gráfico PCA 2D
         st.write("### Redução de dimensionalidade (PCA)")
-        fig_pca = px.scatter(
+        fig_pca = figura(
+            px.scatter,
             df_pca,
             x="PC1",
             y="PC2",
@@ -259,12 +534,10 @@ def clusters_colegio_teste():
         # ========================
         st.write("### Contribuição das variáveis nos componentes principais")
 
-        # Cálculo dos loadings
-        loadings = pca.components_.T * np.sqrt(pca.explained_variance_)
-
         # PC1
-        fig_loadings1 = px.bar(
-            x=colunas_notas.columns,
+        fig_loadings1 = figura(
+            px.bar,
+            x=list(colunas_notas.columns),
             y=np.abs(loadings[:, 0]),
             title="Contribuição das variáveis no PC1",
             labels={"x": "Variável", "y": "Contribuição (|loading|)"}
@@ -272,8 +545,9 @@ def clusters_colegio_teste():
         st.plotly_chart(fig_loadings1, use_container_width=True)
 
         # PC2
-        fig_loadings2 = px.bar(
-            x=colunas_notas.columns,
+        fig_loadings2 = figura(
+            px.bar,
+            x=list(colunas_notas.columns),
             y=np.abs(loadings[:, 1]),
             title="Contribuição das variáveis no PC2",
             labels={"x": "Variável", "y": "Contribuição (|loading|)"}
@@ -291,6 +565,11 @@ def clusters_colegio_teste():
             "- Essa análise permite compreender **quais áreas são mais determinantes para o desempenho geral** e pode orientar estratégias pedagógicas mais focadas."
         )
 
+        # ========================
+        # Vizinhos mais próximos
+        # ========================
+        secao_semelhantes(df)
+
         st.markdown("---")
 
         st.subheader("💡 Esboço de diagnóstico")
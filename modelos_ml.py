@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from importlib.metadata import version
+from typing import Any, Callable, Dict, Tuple
+import joblib
+import numpy as np
+import pandas as pd
+from artefatos_ml import hash_dados, normalizar_valor
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Armazém persistente de modelos ajustados
+# ========================
+# Modelos (RandomForest, KMeans, MiniSom, PCA) são serializados com joblib em
+# PASTA_MODELOS/<chave[:2]>/<chave>.joblib, onde a chave é o sha256 de tudo que determina o
+# ajuste: impressão digital dos dados, conjunto de colunas, hiperparâmetros e versões das
+# bibliotecas. Ao lado de cada modelo fica um .json com o sha256 do arquivo, conferido antes
+# do joblib.load: arquivo truncado ou adulterado é descartado e o modelo é reajustado. O
+# sha256 é calculado ao menos uma vez por processo para cada arquivo; a verificação fica
+# registrada em memória com o tamanho e o mtime do arquivo conferido, e só as leituras
+# seguintes do mesmo arquivo, inalterado, no mesmo processo, deixam de recalculá-lo.
+# A pasta é limitada a LIMITE_BYTES_MODELOS; acima disso saem os modelos usados há mais tempo
+# (o uso é marcado no mtime do .json, para não alterar o do modelo).
+# Como a pasta é compartilhada, um processo reiniciado (ou uma réplica nova) já começa com os
+# modelos ajustados pelos demais.
+
+PASTA_MODELOS = "modelos"
+LIMITE_BYTES_MODELOS = 512 * 1024 ** 2
+
+BIBLIOTECAS = ["scikit-learn", "MiniSom", "numpy", "joblib"]
+VERSOES_BIBLIOTECAS = {biblioteca: version(biblioteca) for biblioteca in BIBLIOTECAS}
+
+
+def chave_modelo(tipo: str, dados: np.ndarray | pd.DataFrame, hiperparametros: Dict[str, Any]) -> str:
+    """Chave de conteúdo do modelo: muda se mudar qualquer coisa que altere o ajuste."""
+    colunas = list(map(str, dados.columns)) if isinstance(dados, pd.DataFrame) else dados.shape[1:]
+    texto = json.dumps({
+        "tipo": tipo,
+        "dados": hash_dados(dados),
+        "colunas": list(colunas),
+        "hiperparametros": {nome: normalizar_valor(valor) for nome, valor in sorted(hiperparametros.items())},
+        "versoes": VERSOES_BIBLIOTECAS
+    }, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _caminhos(chave: str):
+    base = os.path.join(PASTA_MODELOS, chave[:2], chave)
+    return f"{base}.joblib", f"{base}.json"
+
+
+def _sha256_arquivo(caminho: str) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 ** 2), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+# Arquivos de modelo cujo sha256 já foi conferido neste processo -> (tamanho, mtime_ns)
+_verificados: Dict[str, Tuple[int, int]] = {}
+
+
+def _assinatura(caminho: str) -> Tuple[int, int]:
+    estado = os.stat(caminho)
+    return estado.st_size, estado.st_mtime_ns
+
+
+def _descartar(chave: str):
+    _verificados.pop(_caminhos(chave)[0], None)
+    for caminho in _caminhos(chave):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def _gravar_meta(caminho_meta: str, meta: Dict[str, Any]):
+    temporario = f"{caminho_meta}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(meta, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho_meta)
+
+
+def carregar_modelo(chave: str) -> Any | None:
+    """Modelo guardado sob a chave, ou None se não existir ou não passar na verificação de integridade."""
+    caminho_modelo, caminho_meta = _caminhos(chave)
+    if not (os.path.exists(caminho_modelo) and os.path.exists(caminho_meta)):
+        return None
+    try:
+        with open(caminho_meta, encoding="utf-8") as arquivo:
+            meta = json.load(arquivo)
+        assinatura = _assinatura(caminho_modelo)
+        if _verificados.get(caminho_modelo) != assinatura:
+            if _sha256_arquivo(caminho_modelo) != meta["sha256"]:
+                raise ValueError("sha256 não confere")
+            _verificados[caminho_modelo] = assinatura
+        modelo = joblib.load(caminho_modelo)
+    except Exception as erro:
+        logger.warning("Modelo %s descartado (%s).", chave, erro)
+        _descartar(chave)
+        return None
+    os.utime(caminho_meta)  # marca o uso, para a remoção dos menos usados
+    return modelo
+
+
+def guardar_modelo(chave: str, modelo: Any, metadados: Dict[str, Any]):
+    """Serializa o modelo e o .json de integridade (escrita atômica) e aplica o limite de disco."""
+    caminho_modelo, caminho_meta = _caminhos(chave)
+    os.makedirs(os.path.dirname(caminho_modelo), exist_ok=True)
+    temporario = f"{caminho_modelo}.{os.getpid()}.tmp"
+    joblib.dump(modelo, temporario)
+    meta = {
+        **metadados,
+        "sha256": _sha256_arquivo(temporario),
+        "bytes": os.path.getsize(temporario),
+        "versoes": VERSOES_BIBLIOTECAS,
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    # O modelo entra primeiro: sem o .json ele ainda não é lido
+    os.replace(temporario, caminho_modelo)
+    # O sha256 acabou de ser calculado sobre este conteúdo (os.replace preserva tamanho e mtime)
+    _verificados[caminho_modelo] = _assinatura(caminho_modelo)
+    _gravar_meta(caminho_meta, meta)
+    aplicar_limite()
+
+
+def aplicar_limite(limite: int = LIMITE_BYTES_MODELOS):
+    """Remove os modelos usados há mais tempo até a pasta caber no limite."""
+    modelos = []
+    for raiz, _, arquivos in os.walk(PASTA_MODELOS):
+        for nome in arquivos:
+            if nome.endswith(".joblib"):
+                caminho = os.path.join(raiz, nome)
+                chave = nome[:-len(".joblib")]
+                tamanho = os.stat(caminho).st_size
+                # Último uso: mtime do .json (o do modelo fica fixo, para a verificação de integridade)
+                _, caminho_meta = _caminhos(chave)
+                uso = os.stat(caminho_meta).st_mtime if os.path.exists(caminho_meta) else os.stat(caminho).st_mtime
+                modelos.append((uso, tamanho, chave))
+    total = sum(tamanho for _, tamanho, _ in modelos)
+    for _, tamanho, chave in sorted(modelos):
+        if total <= limite:
+            break
+        _descartar(chave)
+        total -= tamanho
+        logger.info("Modelo %s removido pelo limite de disco.", chave)
+
+
+def modelo_persistente(tipo: str, dados: np.ndarray | pd.DataFrame,
+                       hiperparametros: Dict[str, Any], ajustar: Callable[[], Any]) -> Any:
+    """Modelo do armazém, ajustado (com 'ajustar') e guardado apenas se ainda não existir."""
+    chave = chave_modelo(tipo, dados, hiperparametros)
+    modelo = carregar_modelo(chave)
+    if modelo is None:
+        modelo = ajustar()
+        guardar_modelo(chave, modelo, {
+            "tipo": tipo,
+            "hiperparametros": {nome: normalizar_valor(valor) for nome, valor in hiperparametros.items()}
+        })
+    return modelo
@@ -0,0 +1,133 @@
+import argparse
+import logging
+import os
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+from agregacoes import COLUNAS_NOTAS
+from anos_enem import ARQUIVOS_POR_ANO, COLUNAS_RESULTADOS
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# Segmentação nacional de perfis de notas (modo batch)
+# ========================
+# Ajusta PCA incremental e MiniBatchKMeans sobre as cinco notas de todos os participantes
+# de RESULTADOS_2024.csv, lendo o arquivo em blocos: a memória fica limitada ao tamanho
+# do bloco, qualquer que seja o tamanho do arquivo. São três passadas:
+#   1. média e desvio padrão das notas (padronização, como no ml_notas);
+#   2. ajuste incremental do PCA e do MiniBatchKMeans sobre as notas padronizadas;
+#   3. projeção (PC1, PC2) e cluster de cada participante, gravados em blocos.
+# A saída mantém UF e município da prova, para que o perfil possa ser filtrado como o dashboard.
+
+TAMANHO_BLOCO = 200_000
+N_COMPONENTES = 2
+N_CLUSTERS = 5
+
+COLUNAS_SAIDA = ["uf_prova", "municipio_prova", "PC1", "PC2", "cluster_perfil"]
+
+
+def ler_blocos(caminho: str, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[pd.DataFrame]:
+    """Blocos do arquivo de resultados com as colunas padronizadas, apenas participantes com as cinco notas."""
+    leitor = pd.read_csv(
+        caminho,
+        sep=";",
+        encoding="latin1",
+        usecols=list(COLUNAS_RESULTADOS),
+        chunksize=tamanho_bloco
+    )
+    for bloco in leitor:
+        yield bloco.rename(columns=COLUNAS_RESULTADOS).dropna(subset=COLUNAS_NOTAS)
+
+
+def ajustar_segmentacao(caminho: str, n_clusters: int = N_CLUSTERS,
+                        tamanho_bloco: int = TAMANHO_BLOCO, semente: int = 42):
+    """
+    Passadas 1 e 2 das três do módulo (a 3ª é a gravar_segmentacao): ajusta a padronização
+    e, em seguida, o PCA incremental e o MiniBatchKMeans.
+    """
+    scaler = StandardScaler()
+    for bloco in ler_blocos(caminho, tamanho_bloco):
+        if len(bloco):
+            scaler.partial_fit(bloco[COLUNAS_NOTAS].to_numpy())
+
+    ipca = IncrementalPCA(n_components=N_COMPONENTES)
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=semente, n_init=3)
+    minimo = max(n_clusters, N_COMPONENTES)
+    pendentes = []
+    ajustado = False
+    for bloco in ler_blocos(caminho, tamanho_bloco):
+        # partial_fit exige ao menos n_clusters (e n_componentes) linhas por bloco; blocos
+        # menores (muitas notas faltantes) esperam e entram junto com o próximo; uma sobra
+        # no fim do arquivo só é projetada, sem entrar no ajuste
+        pendentes.append(bloco[COLUNAS_NOTAS].to_numpy())
+        if sum(map(len, pendentes)) < minimo:
+            continue
+        X_scaled = scaler.transform(np.concatenate(pendentes))
+        pendentes = []
+        ipca.partial_fit(X_scaled)
+        kmeans.partial_fit(X_scaled)
+        ajustado = True
+    if not ajustado:
+        raise ValueError(
+            f"{caminho} tem menos de {minimo} participantes com as cinco notas: "
+            f"não há como ajustar {n_clusters} clusters."
+        )
+    return scaler, ipca, kmeans
+
+
+def gravar_segmentacao(caminho: str, saida: str, scaler: StandardScaler, ipca: IncrementalPCA,
+                       kmeans: MiniBatchKMeans, tamanho_bloco: int = TAMANHO_BLOCO) -> int:
+    """Projeta e rotula cada participante, gravando a saída bloco a bloco (escrita atômica)."""
+    temporario = f"{saida}.{os.getpid()}.tmp"
+    total = 0
+    cabecalho = True
+    for bloco in ler_blocos(caminho, tamanho_bloco):
+        X_scaled = scaler.transform(bloco[COLUNAS_NOTAS].to_numpy())
+        projecao = ipca.transform(X_scaled)
+        resultado = pd.DataFrame({
+            "uf_prova": bloco["uf_prova"].to_numpy(),
+            "municipio_prova": bloco["municipio_prova"].to_numpy(),
+            "PC1": projecao[:, 0].round(4),
+            "PC2": projecao[:, 1].round(4),
+            "cluster_perfil": kmeans.predict(X_scaled)
+        }, columns=COLUNAS_SAIDA)
+        resultado.to_csv(temporario, sep=";", encoding="latin1", index=False,
+                         mode="w" if cabecalho else "a", header=cabecalho)
+        cabecalho = False
+        total += len(resultado)
+    if cabecalho:  # arquivo sem nenhum participante com as cinco notas
+        pd.DataFrame(columns=COLUNAS_SAIDA).to_csv(temporario, sep=";", encoding="latin1", index=False)
+    os.replace(temporario, saida)
+    return total
+
+
+def resumo_segmentacao(scaler: StandardScaler, ipca: IncrementalPCA, kmeans: MiniBatchKMeans) -> pd.DataFrame:
+    """Centróides dos clusters na escala original das notas."""
+    centroides = scaler.inverse_transform(kmeans.cluster_centers_)
+    return pd.DataFrame(centroides.round(1), columns=COLUNAS_NOTAS).rename_axis("cluster_perfil")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmentação nacional dos perfis de notas do ENEM 2024 (em blocos).")
+    parser.add_argument("--entrada", default=os.path.join("data", ARQUIVOS_POR_ANO[2024]["resultados"]))
+    parser.add_argument("--saida", default=os.path.join("data", "enem_2024_perfis.csv"))
+    parser.add_argument("--clusters", type=int, default=N_CLUSTERS)
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    scaler, ipca, kmeans = ajustar_segmentacao(args.entrada, args.clusters, args.tamanho_bloco)
+    variancia = np.round(ipca.explained_variance_ratio_ * 100, 2)
+    logger.info("Variância explicada: PC1 = %.2f%% | PC2 = %.2f%%", *variancia)
+    logger.info("Centróides dos clusters:\n%s", resumo_segmentacao(scaler, ipca, kmeans).to_string())
+
+    total = gravar_segmentacao(args.entrada, args.saida, scaler, ipca, kmeans, args.tamanho_bloco)
+    logger.info("%d participantes segmentados em %s.", total, args.saida)
+
+
+if __name__ == "__main__":
+    main()
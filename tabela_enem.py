@@ -0,0 +1,240 @@
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+class TabelaEnem:
+    """
+    Visão somente leitura do dataset do dashboard sobre uma tabela Arrow.
+    As colunas são expostas como arrays NumPy sem cópia: quando a tabela vem de um
+    arquivo mapeado em memória (ver abrir_arrow), o mesmo objeto é compartilhado por
+    todas as sessões do processo e as páginas do arquivo são compartilhadas pelo
+    sistema operacional entre processos.
+
+    Colunas de rótulos são arrays de dicionário (códigos int32 + categorias) e as
+    notas são float64 com NaN como valor (sem bitmap de nulos), o que permite a
+    leitura sem cópia.
+    """
+
+    def __init__(self, tabela: pa.Table, versao: str, indice_municipios: Dict[str, Tuple[int, int]] | None = None):
+        self.tabela = tabela.combine_chunks()
+        self.versao = versao
+        # Estatísticas de município: como as linhas estão ordenadas por município,
+        # cada município ocupa um intervalo contíguo [início, fim) da tabela
+        self.indice_municipios = indice_municipios or {}
+        self._categorias: Dict[str, pd.Index] = {}
+
+    def __len__(self) -> int:
+        return self.tabela.num_rows
+
+    @property
+    def colunas(self) -> List[str]:
+        return self.tabela.column_names
+
+    def _array(self, coluna: str) -> pa.Array:
+        return self.tabela.column(coluna).chunk(0)
+
+    def valores(self, coluna: str) -> np.ndarray:
+        """Coluna numérica como array NumPy (sem cópia quando não há nulos Arrow)."""
+        array = self._array(coluna)
+        if array.null_count:
+            return array.to_numpy(zero_copy_only=False)
+        return array.to_numpy(zero_copy_only=True)
+
+    def codigos(self, coluna: str) -> np.ndarray:
+        """Códigos inteiros de uma coluna de rótulos; -1 indica valor ausente."""
+        indices = self._array(coluna).indices
+        if indices.null_count:
+            return indices.fill_null(-1).to_numpy()
+        return indices.to_numpy(zero_copy_only=True)
+
+    def categorias(self, coluna: str) -> pd.Index:
+        """Categorias (dicionário) de uma coluna de rótulos, nomeadas pela própria coluna."""
+        if coluna not in self._categorias:
+            dicionario = self._array(coluna).dictionary.to_pylist()
+            self._categorias[coluna] = pd.Index(dicionario, name=coluna)
+        return self._categorias[coluna]
+
+    def isin(self, coluna: str, valores: List[str]) -> np.ndarray:
+        """Máscara booleana das linhas cujo rótulo está em 'valores' (via tabela de consulta)."""
+        categorias = self.categorias(coluna)
+        selecionadas = np.zeros(len(categorias) + 1, dtype=bool)  # última posição: ausentes (-1)
+        indices = categorias.get_indexer(list(valores))
+        selecionadas[indices[indices >= 0]] = True
+        return selecionadas[self.codigos(coluna)]
+
+    def unicos(self, coluna: str, mask: np.ndarray | None = None) -> List[str]:
+        """Rótulos presentes (em 'mask', se informada), em ordem alfabética."""
+        codigos = self.codigos(coluna)
+        if mask is not None:
+            codigos = codigos[mask]
+        presentes = np.bincount(codigos[codigos >= 0], minlength=len(self.categorias(coluna))) > 0
+        return sorted(self.categorias(coluna)[presentes])
+
+    def fatia(self, inicio: int, fim: int) -> "TabelaEnem":
+        """Intervalo de linhas [inicio, fim) como nova tabela, sem cópia."""
+        fatia = TabelaEnem(self.tabela.slice(inicio, fim - inicio), f"{self.versao}[{inicio}:{fim}]")
+        fatia._categorias = self._categorias
+        return fatia
+
+    def fatias_municipios(self, municipios: List[str]) -> List["TabelaEnem"]:
+        """Fatias (sem cópia) com as linhas dos municípios pedidos presentes nesta tabela."""
+        intervalos = sorted(self.indice_municipios[m] for m in set(municipios) if m in self.indice_municipios)
+        return [self.fatia(inicio, fim) for inicio, fim in intervalos]
+
+    def to_pandas(self, colunas: List[str] | None = None, mask: np.ndarray | None = None) -> pd.DataFrame:
+        """Materializa (com cópia) as colunas/linhas pedidas como DataFrame."""
+        tabela = self.tabela.select(colunas) if colunas else self.tabela
+        if mask is not None:
+            tabela = tabela.filter(pa.array(mask))
+        return tabela.to_pandas()
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame, versao: str = "memoria") -> "TabelaEnem":
+        """Converte um DataFrame (rótulos como "category") para o layout Arrow da tabela."""
+        return cls(_dataframe_para_arrow(df), versao)
+
+
+def _dataframe_para_arrow(df: pd.DataFrame, metadados: Dict[str, str] | None = None) -> pa.Table:
+    arrays = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # O dicionário é o do DataFrame inteiro: partições geradas do mesmo DataFrame
+            # compartilham os códigos e podem ser agregadas separadamente e mescladas
+            codigos = serie.cat.codes.to_numpy().astype(np.int32)
+            arrays[coluna] = pa.DictionaryArray.from_arrays(
+                pa.array(codigos, mask=codigos < 0),
+                pa.array(serie.cat.categories.astype(str).tolist())
+            )
+        elif pd.api.types.is_float_dtype(serie.dtype):
+            # NaN é mantido como valor (e não como nulo Arrow) para permitir leitura sem cópia
+            arrays[coluna] = pa.array(serie.to_numpy(dtype="float64"), from_pandas=False)
+        else:
+            arrays[coluna] = pa.array(serie)
+    return pa.table(arrays, metadata=metadados)
+
+
+def escrever_arrow(df: pd.DataFrame, caminho: str, metadados: Dict[str, str] | None = None):
+    """
+    Grava o DataFrame como arquivo Arrow IPC (um único lote, sem compressão, para que
+    possa ser mapeado em memória). A escrita é atômica: vários processos podem
+    tentar gerar o mesmo arquivo ao mesmo tempo.
+    """
+    escrever_tabela_arrow(_dataframe_para_arrow(df, metadados), caminho)
+
+
+def escrever_tabela_arrow(tabela: pa.Table, caminho: str):
+    """Grava uma tabela Arrow já no layout da TabelaEnem (mesmas regras de escrever_arrow)."""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with pa.OSFile(temporario, "wb") as destino:
+        with pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela, max_chunksize=max(tabela.num_rows, 1))
+    os.replace(temporario, caminho)
+
+
+def abrir_arrow(caminho: str) -> TabelaEnem:
+    """Abre um arquivo Arrow IPC mapeado em memória (somente leitura, sem cópia)."""
+    fonte = pa.memory_map(caminho, "r")
+    tabela = pa.ipc.open_file(fonte).read_all()
+    metadados = tabela.schema.metadata or {}
+    indice = json.loads(metadados.get(b"indice_municipios", b"{}"))
+    return TabelaEnem(
+        tabela,
+        versao=f"{caminho}:{os.path.getmtime(caminho)}",
+        indice_municipios={m: tuple(intervalo) for m, intervalo in indice.items()}
+    )
+
+
+# Partições por UF: cada geração é montada numa pasta temporária e, completa, renomeada para
+# uma subpasta versionada (<pasta>/v<ns>_<pid>); o arquivo ATUAL aponta a versão em uso. A
+# troca de versão é só a substituição atômica desse arquivo: quem já listou as partições
+# continua lendo uma versão completa e coerente (os dicionários são os da geração inteira), e
+# dois processos gerando ao mesmo tempo não apagam a pasta um do outro. Ficam as
+# MANTER_VERSOES versões mais novas (e a apontada); as demais são removidas.
+ARQUIVO_VERSAO_ATUAL = "ATUAL"
+MANTER_VERSOES = 2
+# Pastas temporárias mais antigas que isso são de gerações interrompidas
+IDADE_MAXIMA_TEMPORARIAS = 3600
+
+
+def _versoes(pasta: str) -> List[str]:
+    return sorted(nome for nome in os.listdir(pasta) if nome.startswith("v") and os.path.isdir(os.path.join(pasta, nome)))
+
+
+def pasta_versao_atual(pasta: str) -> str:
+    """Subpasta da versão em uso das partições (a própria 'pasta' no layout antigo, sem ATUAL)."""
+    try:
+        with open(os.path.join(pasta, ARQUIVO_VERSAO_ATUAL), encoding="utf-8") as arquivo:
+            atual = os.path.join(pasta, arquivo.read().strip())
+    except FileNotFoundError:
+        return pasta
+    if os.path.isdir(atual):
+        return atual
+    # Ponteiro para uma versão já removida (gerações simultâneas): a versão completa mais nova
+    versoes = _versoes(pasta)
+    return os.path.join(pasta, versoes[-1]) if versoes else pasta
+
+
+def _remover_versoes_antigas(pasta: str, atual: str):
+    # Com gerações simultâneas, a versão apontada pode não ser a mais nova: ela nunca é removida
+    em_uso = {atual, os.path.basename(pasta_versao_atual(pasta))}
+    for nome in _versoes(pasta)[:-MANTER_VERSOES]:
+        if nome not in em_uso:
+            # Arquivos ainda mapeados por outro processo continuam legíveis por ele (POSIX); no
+            # Windows a remoção falha e é tentada de novo na próxima geração
+            shutil.rmtree(os.path.join(pasta, nome), ignore_errors=True)
+    agora = time.time()
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        try:
+            if nome.startswith("tmp_") and agora - os.path.getmtime(caminho) > IDADE_MAXIMA_TEMPORARIAS:
+                shutil.rmtree(caminho, ignore_errors=True)
+            elif nome.endswith(".arrow"):  # partições do layout antigo, gravadas direto na pasta
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def escrever_particoes_uf(df: pd.DataFrame, pasta: str):
+    """
+    Grava o DataFrame particionado por UF: um arquivo Arrow por UF numa versão nova de
+    'pasta' (uf_prova=<UF>.arrow), ordenado por município e com o intervalo de linhas de
+    cada município nos metadados. Todos os arquivos compartilham os dicionários.
+    A versão é montada inteira antes de o ponteiro ATUAL passar a indicá-la.
+    """
+    temporaria = os.path.join(pasta, f"tmp_{time.time_ns()}_{os.getpid()}")
+    os.makedirs(temporaria)
+    df = df.sort_values(["uf_prova", "municipio_prova"], kind="stable")
+    for uf, df_uf in df.groupby("uf_prova", observed=True, sort=True):
+        df_uf = df_uf.reset_index(drop=True)
+        limites = df_uf.groupby("municipio_prova", observed=True, sort=False).indices
+        indice = {str(m): [int(linhas[0]), int(linhas[-1]) + 1] for m, linhas in limites.items()}
+        escrever_arrow(
+            df_uf,
+            os.path.join(temporaria, f"uf_prova={uf}.arrow"),
+            metadados={"indice_municipios": json.dumps(indice, ensure_ascii=False)}
+        )
+    versao = f"v{time.time_ns()}_{os.getpid()}"
+    os.rename(temporaria, os.path.join(pasta, versao))
+    ponteiro = os.path.join(pasta, ARQUIVO_VERSAO_ATUAL)
+    temporario = f"{ponteiro}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(versao)
+    os.replace(temporario, ponteiro)
+    _remover_versoes_antigas(pasta, versao)
+
+
+def listar_particoes_uf(pasta: str) -> Dict[str, str]:
+    """UF -> caminho do arquivo da partição, na versão em uso."""
+    versao = pasta_versao_atual(pasta)
+    particoes = {}
+    for nome in os.listdir(versao):
+        if nome.startswith("uf_prova=") and nome.endswith(".arrow"):
+            particoes[nome[len("uf_prova="):-len(".arrow")]] = os.path.join(versao, nome)
+    return particoes
@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório (sem pacote)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregacoes import COLUNAS_CONTAGEM, COLUNAS_NOTAS  # noqa: E402
+
+# ========================
+# Dataset sintético no layout do dashboard
+# ========================
+
+UFS_MUNICIPIOS = {
+    "AC": ["Rio Branco", "Xapuri"],
+    "PI": ["Teresina", "Parnaíba", "Picos"],
+    "SP": ["São Paulo", "Campinas", "Santos", "Sorocaba"]
+}
+
+
+def gerar_enem(n: int = 5_000, semente: int = 0) -> pd.DataFrame:
+    """Alunos sintéticos: notas em [0, 1000] com NaN (faltantes) e rótulos como "category"."""
+    rng = np.random.default_rng(semente)
+    pares = [(uf, municipio) for uf, municipios in UFS_MUNICIPIOS.items() for municipio in municipios]
+    # Municípios de tamanhos bem diferentes, como na base real
+    probabilidades = rng.dirichlet(np.ones(len(pares)))
+    escolhidos = rng.choice(len(pares), n, p=probabilidades)
+    df = pd.DataFrame({
+        "uf_prova": [pares[i][0] for i in escolhidos],
+        "municipio_prova": [pares[i][1] for i in escolhidos]
+    })
+    for coluna in COLUNAS_CONTAGEM:
+        df[coluna] = rng.choice([f"{coluna}_{k}" for k in range(4)], n)
+    # Um rótulo ausente de vez em quando (código -1 no Arrow)
+    df.loc[rng.random(n) < 0.02, "renda_familiar_labels"] = None
+    for coluna in COLUNAS_NOTAS:
+        notas = np.clip(rng.normal(500, 110, n), 0, 1000)
+        notas[rng.random(n) < 0.1] = np.nan
+        df[coluna] = notas
+    for coluna in COLUNAS_CONTAGEM + ["uf_prova", "municipio_prova"]:
+        df[coluna] = df[coluna].astype("category")
+    return df
+
+
+@pytest.fixture
+def df_enem() -> pd.DataFrame:
+    return gerar_enem()
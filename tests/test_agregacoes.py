@@ -0,0 +1,154 @@
+from functools import reduce
+import numpy as np
+import pandas as pd
+import pytest
+from agregacoes import (
+    COLUNAS_CONTAGEM,
+    COLUNAS_NOTAS,
+    PERCENTIS,
+    SketchNotas,
+    agregar_cruzamento,
+    agregar_parcial,
+    agregar_parciais
+)
+from conftest import gerar_enem
+from tabela_enem import TabelaEnem
+
+NOTAS = COLUNAS_NOTAS + ["nota_somatoria"]
+
+
+def com_somatoria(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(nota_somatoria=df[COLUNAS_NOTAS].mean(axis=1))
+
+
+def quantil_exato(valores: np.ndarray, q: float) -> float:
+    """Quantil nearest-rank (a definição usada pelos sketches)."""
+    return float(np.quantile(valores, q, method="inverted_cdf"))
+
+
+def test_parciais_mesclados_igualam_a_agregacao_unica(df_enem):
+    dados = TabelaEnem.de_dataframe(df_enem)
+    limites = [0, 1_234, 3_000, len(dados)]
+    parciais = [agregar_parcial(dados.fatia(inicio, fim)) for inicio, fim in zip(limites, limites[1:])]
+    mesclado = reduce(lambda a, b: a.mesclar(b), parciais).finalizar()
+    unico = agregar_parcial(dados).finalizar()
+
+    assert mesclado.total == unico.total == len(df_enem)
+    assert mesclado.medias == pytest.approx(unico.medias)
+    assert mesclado.maximas == unico.maximas
+    for coluna in COLUNAS_CONTAGEM:
+        pd.testing.assert_series_equal(mesclado.contagens[coluna], unico.contagens[coluna])
+    for nome in NOTAS:
+        np.testing.assert_array_equal(mesclado.sketches[nome].contagens, unico.sketches[nome].contagens)
+
+
+def test_resumo_confere_com_pandas(df_enem):
+    dados = TabelaEnem.de_dataframe(df_enem)
+    mask = dados.isin("uf_prova", ["PI", "SP"]) & dados.isin("sexo_labels", ["sexo_labels_0", "sexo_labels_2"])
+    resumo = agregar_parcial(dados, mask).finalizar()
+    esperado = com_somatoria(df_enem[mask])
+
+    assert resumo.total == len(esperado)
+    for nome in NOTAS:
+        assert resumo.medias[nome] == pytest.approx(esperado[nome].mean())
+        assert resumo.maximas[nome] == pytest.approx(esperado[nome].max())
+        # Nenhum aluno fica de fora do histograma (os bins das pontas inclusive)
+        contagens, bordas = resumo.histogramas[nome]
+        assert contagens.sum() == esperado[nome].notna().sum()
+        assert bordas[0] <= esperado[nome].min() + SketchNotas.erro_maximo
+        assert bordas[-1] >= esperado[nome].max() - SketchNotas.erro_maximo
+    for coluna in COLUNAS_CONTAGEM:
+        contagens = esperado[coluna].value_counts()
+        contagens = contagens[contagens > 0]
+        assert resumo.contagens[coluna].to_dict() == contagens.to_dict()
+    for coluna in ["uf_prova", "municipio_prova"]:
+        medias = esperado.groupby(coluna, observed=True)["nota_somatoria"].mean().dropna()
+        assert resumo.rankings[coluna].to_dict() == pytest.approx(medias.to_dict())
+
+
+def test_histograma_com_extremos_fora_da_grade():
+    df = com_somatoria(gerar_enem(2_000, semente=9))
+    for coluna in COLUNAS_NOTAS:
+        df[coluna] = df[coluna].clip(300.3, 899.6)
+    resumo = agregar_parcial(TabelaEnem.de_dataframe(df[df.columns.drop("nota_somatoria")])).finalizar()
+    for nome in NOTAS:
+        contagens, _ = resumo.histogramas[nome]
+        assert contagens.sum() == df[nome].notna().sum()
+
+
+def test_selecao_vazia(df_enem):
+    dados = TabelaEnem.de_dataframe(df_enem)
+    resumo = agregar_parcial(dados, np.zeros(len(dados), dtype=bool)).finalizar()
+    assert resumo.total == 0
+    assert all(np.isnan(resumo.medias[nome]) for nome in NOTAS)
+    assert all(serie.empty for serie in resumo.contagens.values())
+
+
+def test_sketch_respeita_o_erro_maximo():
+    rng = np.random.default_rng(1)
+    valores = np.concatenate([rng.uniform(0, 1000, 20_000), rng.normal(620, 40, 5_000).clip(0, 1000)])
+    qs = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+    quantis = SketchNotas.de_valores(valores).quantis(qs)
+    for q, quantil in zip(qs, quantis):
+        assert abs(quantil - quantil_exato(valores, q)) <= SketchNotas.erro_maximo
+
+
+def test_sketches_mesclados_igualam_o_sketch_da_uniao():
+    rng = np.random.default_rng(2)
+    a, b = rng.uniform(0, 1000, 3_000), rng.uniform(300, 700, 2_000)
+    a[::50] = np.nan  # NaN fica de fora
+    mesclado = SketchNotas.de_valores(a).mesclar(SketchNotas.de_valores(b))
+    uniao = SketchNotas.de_valores(np.concatenate([a, b]))
+    np.testing.assert_array_equal(mesclado.contagens, uniao.contagens)
+    assert mesclado.total == np.count_nonzero(~np.isnan(a)) + len(b)
+
+
+def test_percentis_e_faixas_por_uf(df_enem):
+    dados = TabelaEnem.de_dataframe(df_enem)
+    resumo = agregar_parcial(dados).finalizar()
+    esperado = com_somatoria(df_enem)
+    for nome in NOTAS:
+        valores = esperado[nome].dropna().to_numpy()
+        for q, quantil in resumo.percentis(nome).items():
+            assert abs(quantil - quantil_exato(valores, q)) <= SketchNotas.erro_maximo
+        faixas = resumo.faixas["uf_prova"][nome]
+        for uf, grupo in esperado.groupby("uf_prova", observed=True):
+            valores_uf = grupo[nome].dropna().to_numpy()
+            for q, coluna in zip(PERCENTIS, ["p10", "p50", "p90"]):
+                assert abs(faixas.loc[uf, coluna] - quantil_exato(valores_uf, q)) <= SketchNotas.erro_maximo
+
+
+def test_grupos_numa_varredura_igualam_a_agregacao_de_cada_um(df_enem):
+    dados = TabelaEnem.de_dataframe(df_enem)
+    masks = [
+        dados.isin("sexo_labels", ["sexo_labels_0", "sexo_labels_1"]),
+        dados.isin("sexo_labels", ["sexo_labels_1", "sexo_labels_2"]),  # sobrepõe o primeiro
+        dados.isin("uf_prova", ["AC"]),
+        np.zeros(len(dados), dtype=bool)
+    ]
+    for mask, grupo in zip(masks, agregar_parciais(dados, masks)):
+        obtido, esperado = grupo.finalizar(), agregar_parcial(dados, mask).finalizar()
+        assert obtido.total == esperado.total
+        assert obtido.medias == pytest.approx(esperado.medias, nan_ok=True)
+        for coluna in COLUNAS_CONTAGEM:
+            pd.testing.assert_series_equal(obtido.contagens[coluna], esperado.contagens[coluna])
+        for nome in NOTAS:
+            np.testing.assert_array_equal(obtido.sketches[nome].contagens, esperado.sketches[nome].contagens)
+
+
+def test_cruzamento_confere_com_o_groupby_do_pandas(df_enem):
+    dados = TabelaEnem.de_dataframe(df_enem)
+    mask = dados.isin("uf_prova", ["PI", "SP"])
+    limite = len(dados) // 2
+    metades = [mask & (np.arange(len(dados)) < limite), mask & (np.arange(len(dados)) >= limite)]
+    parciais = [agregar_cruzamento(dados, metade, "renda_familiar_labels", "sexo_labels") for metade in metades]
+    cruzamento = parciais[0].mesclar(parciais[1]).finalizar()
+
+    # Linhas sem rótulo (renda ausente) ficam fora do cruzamento
+    esperado = com_somatoria(df_enem[mask]).dropna(subset=["renda_familiar_labels"])
+    grupos = esperado.groupby(["renda_familiar_labels", "sexo_labels"], observed=True)
+    alunos = cruzamento.alunos.stack()
+    assert alunos[alunos > 0].to_dict() == grupos.size().to_dict()
+    for nome in NOTAS:
+        medias = cruzamento.medias[nome].stack().dropna()
+        assert medias.to_dict() == pytest.approx(grupos[nome].mean().dropna().to_dict())
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from amostragem import (
+    COLUNA_ESTRATO,
+    COLUNA_PESO,
+    _variancia_estratificada,
+    agregar_amostra,
+    amostra_estratificada
+)
+from conftest import gerar_enem
+from tabela_enem import TabelaEnem
+
+
+def particao_sp(n: int = 20_000) -> TabelaEnem:
+    df = gerar_enem(n, semente=3)
+    df = df[df["uf_prova"] == "SP"].sort_values("municipio_prova", kind="stable").reset_index(drop=True)
+    return TabelaEnem.de_dataframe(df)
+
+
+def test_pesos_reconstroem_os_estratos():
+    dados = particao_sp()
+    amostra = TabelaEnem(amostra_estratificada(dados, 0.05, np.random.default_rng(0), primeiro_estrato=7), "amostra")
+    pesos = amostra.valores(COLUNA_PESO)
+    estratos = amostra.valores(COLUNA_ESTRATO)
+
+    tamanhos = dados.to_pandas(["municipio_prova"])["municipio_prova"].value_counts()
+    sorteados = amostra.to_pandas(["municipio_prova"])["municipio_prova"].value_counts()
+    # Cada município é um estrato, com ao menos um aluno sorteado
+    assert set(sorteados[sorteados > 0].index) == set(tamanhos[tamanhos > 0].index)
+    assert sorted(np.unique(estratos)) == list(range(7, 7 + len(tamanhos[tamanhos > 0])))
+    # Os pesos de um estrato somam o tamanho do estrato
+    municipios = amostra.to_pandas(["municipio_prova"])["municipio_prova"].to_numpy()
+    for municipio, tamanho in tamanhos[tamanhos > 0].items():
+        assert pesos[municipios == municipio].sum() == pytest.approx(tamanho)
+    assert pesos.sum() == pytest.approx(len(dados))
+
+
+def test_censo_da_o_valor_exato_sem_incerteza():
+    dados = particao_sp(5_000)
+    amostra = TabelaEnem(amostra_estratificada(dados, 1.0, np.random.default_rng(0)), "amostra")
+    mask = amostra.isin("sexo_labels", ["sexo_labels_1"])
+    aproximado = agregar_amostra(amostra, mask)
+    esperado = dados.to_pandas()
+    esperado = esperado[esperado["sexo_labels"] == "sexo_labels_1"]
+    assert aproximado.resumo.total == len(esperado)
+    assert aproximado.resumo.medias["nota_matematica"] == pytest.approx(esperado["nota_matematica"].mean())
+    assert aproximado.intervalo_total == pytest.approx(0, abs=1e-6)
+    assert aproximado.intervalos["nota_matematica"] == pytest.approx(0, abs=1e-6)
+
+
+def test_intervalos_de_95_porcento_cobrem_o_valor_exato():
+    dados = particao_sp()
+    df = dados.to_pandas()
+    filtro = df["renda_familiar_labels"].isin(["renda_familiar_labels_0", "renda_familiar_labels_3"])
+    total, media = filtro.sum(), df.loc[filtro, "nota_redacao"].mean()
+
+    rng = np.random.default_rng(4)
+    repeticoes = 200
+    cobre_total = cobre_media = 0
+    for _ in range(repeticoes):
+        amostra = TabelaEnem(amostra_estratificada(dados, 0.05, rng), "amostra")
+        aproximado = agregar_amostra(amostra, amostra.isin("renda_familiar_labels", ["renda_familiar_labels_0", "renda_familiar_labels_3"]))
+        cobre_total += abs(aproximado.resumo.total - total) <= aproximado.intervalo_total + 1
+        cobre_media += abs(aproximado.resumo.medias["nota_redacao"] - media) <= aproximado.intervalos["nota_redacao"]
+    # 95% nominal; a margem acomoda o erro de Monte Carlo com 200 repetições
+    assert cobre_total / repeticoes >= 0.9
+    assert cobre_media / repeticoes >= 0.9
+
+
+def test_estratos_com_um_sorteado_nao_zeram_a_variancia():
+    z = np.array([3.0, -1.0, 5.0, 0.0])
+    estratos = np.arange(4)
+    # Um aluno sorteado em estratos de 10: variância positiva, não zero
+    assert _variancia_estratificada(z, estratos, np.full(4, 10.0)) > 0
+    # Estratos inteiros na amostra (peso 1) não têm incerteza
+    assert _variancia_estratificada(z, estratos, np.ones(4)) == 0
@@ -0,0 +1,68 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+from codebook_enem import aplicar_codebook, codebook, ordenar_rotulos
+
+ANO = 2024
+
+
+def participantes(n: int = 400, semente: int = 0) -> pd.DataFrame:
+    """Códigos INEP válidos de todos os campos do codebook (inclusive os que caem em 'outros')."""
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        campo.origem: rng.choice(list(campo.mapa), n)
+        for campo in codebook(ANO)
+    })
+
+
+def test_confere_com_o_mapa_linha_a_linha():
+    df = participantes()
+    resultado = aplicar_codebook(df, ANO)
+    for campo in codebook(ANO):
+        esperado = df[campo.origem].map(campo.mapa)
+        assert resultado[campo.ordinal].tolist() == [ordinal for ordinal, _ in esperado]
+        assert resultado[campo.rotulos].astype(str).tolist() == [rotulo for _, rotulo in esperado]
+
+
+def test_blocos_concatenam_sem_perder_o_tipo():
+    df = participantes()
+    blocos = pd.concat([aplicar_codebook(df.iloc[:150], ANO), aplicar_codebook(df.iloc[150:], ANO)])
+    for campo in codebook(ANO):
+        assert isinstance(blocos[campo.rotulos].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(blocos, aplicar_codebook(df, ANO))
+
+
+def test_codigos_fora_do_mapa_caem_em_outros():
+    df = participantes(5).assign(faixa_etaria=[1, 2, 99, 3, 4], q_escolaridade_pai=["A", "Z", "B", "C", "D"])
+    resultado = aplicar_codebook(df, ANO)
+    assert resultado.loc[2, "faixa_etaria_labels"] == "60+"
+    assert resultado.loc[1, ["escolaridade_pai", "escolaridade_pai_labels"]].tolist() == [-1, "Não sei"]
+
+
+@pytest.mark.parametrize("origem, ordinal, rotulos", [
+    ("estado_civil", "estado_civil", "estado_civil_labels"),
+    ("cor_raca", "cor_raca", "cor_raca_labels")
+])
+def test_codigo_desconhecido_vira_nan_com_aviso(caplog, origem, ordinal, rotulos):
+    df = participantes(4)
+    df[origem] = [1, 9, 2, 9]
+    with caplog.at_level(logging.WARNING, logger="codebook_enem"):
+        resultado = aplicar_codebook(df, ANO)
+    assert f"Códigos sem rótulo no codebook de {origem}" in caplog.text
+    assert resultado[ordinal].isna().tolist() == [False, True, False, True]
+    assert resultado[rotulos].isna().tolist() == [False, True, False, True]
+    assert resultado.loc[[0, 2], ordinal].tolist() == [1, 2]
+
+
+def test_codigo_desconhecido_de_renda_interrompe():
+    df = participantes(3).assign(q_renda_familiar=["A", "X", "B"])
+    with pytest.raises(ValueError, match="q_renda_familiar"):
+        aplicar_codebook(df, ANO)
+
+
+def test_ordem_dos_rotulos_poe_negativos_no_fim():
+    rotulos = ["Não sei", "Superior completo", "Nunca estudou", "Fora do codebook"]
+    assert ordenar_rotulos("escolaridade_pai_labels", rotulos) == [
+        "Nunca estudou", "Superior completo", "Não sei", "Fora do codebook"
+    ]
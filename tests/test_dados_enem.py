@@ -0,0 +1,63 @@
+import os
+import time
+import pytest
+import dados_enem
+from tabela_enem import listar_particoes_uf
+
+
+def gravar_csv(df, caminho):
+    df.to_csv(caminho, sep=";", encoding="latin1", index=False)
+
+
+def test_geracao_interrompida_e_refeita(df_enem, tmp_path):
+    caminho_csv = str(tmp_path / "enem_2024_dash_sample.csv")
+    gravar_csv(df_enem, caminho_csv)
+    pasta = str(tmp_path / "enem_2024_dash_sample")
+    # Geração interrompida: só a pasta temporária, mais nova que o CSV e sem o ponteiro ATUAL
+    os.makedirs(os.path.join(pasta, "tmp_1_1"))
+    os.utime(caminho_csv, (0, 0))
+
+    dados_enem._preparar_particoes(caminho_csv, pasta)
+    particoes = listar_particoes_uf(pasta)
+    assert sorted(particoes) == sorted(df_enem["uf_prova"].unique())
+
+
+def test_particoes_atuais_nao_sao_refeitas(df_enem, tmp_path):
+    caminho_csv = str(tmp_path / "enem_2024_dash_sample.csv")
+    gravar_csv(df_enem, caminho_csv)
+    os.utime(caminho_csv, (0, 0))
+    pasta = str(tmp_path / "enem_2024_dash_sample")
+    dados_enem._preparar_particoes(caminho_csv, pasta)
+    antes = listar_particoes_uf(pasta)
+    dados_enem._preparar_particoes(caminho_csv, pasta)
+    assert listar_particoes_uf(pasta) == antes
+
+
+def test_edicao_sem_particoes_falha_com_mensagem(monkeypatch):
+    monkeypatch.setattr(dados_enem, "ufs_particionadas", lambda ano: [])
+    with pytest.raises(FileNotFoundError, match="Nenhuma partição por UF para 2024"):
+        dados_enem.colunas_dataset(2024)
+
+
+def test_refinamento_que_falhou_sai_do_registro(monkeypatch):
+    chamadas = []
+
+    def resumo(selecao, ano, versao):
+        chamadas.append(ano)
+        if len(chamadas) == 1:
+            raise RuntimeError("falha")
+        return "resumo"
+
+    monkeypatch.setattr(dados_enem, "_resumo_filtrado", resumo)
+    monkeypatch.setattr(dados_enem, "versao_dataset", lambda ano: 1.0)
+    refinamentos = dados_enem._Refinamentos()
+    with pytest.raises(RuntimeError):
+        refinamentos.disparar({}, 2024).result()
+    # Os callbacks rodam logo depois de result() acordar quem espera
+    limite = time.monotonic() + 5
+    while refinamentos.futuros and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert not refinamentos.pendente({}, 2024) and not refinamentos.futuros
+    assert refinamentos.disparar({}, 2024).result() == "resumo"
+    assert refinamentos.disparar({}, 2024).result() == "resumo"
+    assert len(chamadas) == 2
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+from agregacoes import COLUNAS_NOTAS
+from escolas_enem import (
+    METRICAS_ESCOLA,
+    MIN_ALUNOS,
+    RESOLUCAO_ESCOLAS,
+    _Acumulador,
+    abrir_ranking,
+    gravar_escolas
+)
+from conftest import UFS_MUNICIPIOS
+
+
+def gerar_alunos(n: int = 6_000, n_escolas: int = 120, semente: int = 5) -> pd.DataFrame:
+    """Alunos com escola (código INEP), UF e município da escola e as 5 notas."""
+    rng = np.random.default_rng(semente)
+    pares = [(uf, municipio) for uf, municipios in UFS_MUNICIPIOS.items() for municipio in municipios]
+    codigos = rng.choice(np.arange(10_000_000, 99_999_999), n_escolas, replace=False)
+    locais = rng.integers(len(pares), size=n_escolas)
+    # Escolas de tamanhos bem diferentes (algumas abaixo de MIN_ALUNOS) e níveis diferentes
+    escola = rng.choice(n_escolas, n, p=rng.dirichlet(np.full(n_escolas, 0.5)))
+    nivel = rng.normal(500, 60, n_escolas)
+    alunos = pd.DataFrame({
+        "codigo_escola": codigos[escola],
+        "uf_escola": [pares[locais[e]][0] for e in escola],
+        "municipio_escola": [pares[locais[e]][1] for e in escola]
+    })
+    for coluna in COLUNAS_NOTAS:
+        notas = np.clip(nivel[escola] + rng.normal(0, 90, n), 0, 1000)
+        notas[rng.random(n) < 0.08] = np.nan
+        alunos[coluna] = notas
+    return alunos.assign(nota_somatoria=alunos[COLUNAS_NOTAS].mean(axis=1))
+
+
+@pytest.fixture
+def alunos() -> pd.DataFrame:
+    return gerar_alunos()
+
+
+@pytest.fixture
+def ranking(alunos, tmp_path):
+    acumulador = _Acumulador()
+    for inicio in range(0, len(alunos), 1_000):  # em blocos, como a leitura do CSV
+        acumulador.adicionar(alunos.iloc[inicio:inicio + 1_000].drop(columns="nota_somatoria"))
+    caminho = str(tmp_path / "escolas.arrow")
+    gravar_escolas(acumulador.finalizar(), caminho)
+    return abrir_ranking(caminho)
+
+
+def esperado_escolas(alunos: pd.DataFrame) -> pd.DataFrame:
+    grupos = alunos.groupby("codigo_escola")
+    esperado = grupos[METRICAS_ESCOLA].mean().add_prefix("media_")
+    esperado["alunos"] = grupos[METRICAS_ESCOLA].count().max(axis=1)
+    return esperado.join(grupos[["uf_escola", "municipio_escola"]].first())
+
+
+def top_pandas(esperado: pd.DataFrame, metrica: str, ufs=None, n: int = 10) -> list:
+    filtrado = esperado[esperado["alunos"] >= MIN_ALUNOS]
+    if ufs:
+        filtrado = filtrado[filtrado["uf_escola"].isin(ufs)]
+    return filtrado[f"media_{metrica}"].dropna().sort_values(ascending=False).index[:n].tolist()
+
+
+def test_agregados_conferem_com_pandas(alunos, ranking):
+    esperado = esperado_escolas(alunos)
+    obtido = ranking.escolas.to_pandas().set_index("codigo_escola").loc[esperado.index]
+    np.testing.assert_array_equal(obtido["alunos"].to_numpy(), esperado["alunos"].to_numpy())
+    for metrica in METRICAS_ESCOLA:
+        np.testing.assert_allclose(obtido[f"media_{metrica}"], esperado[f"media_{metrica}"])
+        for codigo, grupo in alunos.groupby("codigo_escola"):
+            valores = grupo[metrica].dropna().to_numpy()
+            if len(valores):
+                exato = np.quantile(valores, 0.5, method="inverted_cdf")
+                assert abs(obtido.loc[codigo, f"p50_{metrica}"] - exato) <= RESOLUCAO_ESCOLAS / 2
+
+
+@pytest.mark.parametrize("ufs", [None, ["SP"], ["AC", "PI"]])
+@pytest.mark.parametrize("metrica", ["nota_somatoria", "nota_matematica"])
+def test_top_confere_com_a_ordenacao_do_pandas(alunos, ranking, ufs, metrica):
+    esperado = esperado_escolas(alunos)
+    top = ranking.top(metrica, ranking.filtrar(ufs))
+    assert top["codigo_escola"].tolist() == top_pandas(esperado, metrica, ufs)
+    assert top[f"media_{metrica}"].is_monotonic_decreasing
+
+
+def test_posicao_confere_com_a_ordenacao_do_pandas(alunos, ranking):
+    esperado = esperado_escolas(alunos)
+    ordem = top_pandas(esperado, "nota_somatoria", ["SP"], n=len(esperado))
+    mask = ranking.filtrar(["SP"])
+    for lugar, codigo in enumerate(ordem, start=1):
+        assert ranking.posicao(int(codigo), "nota_somatoria", mask)[:2] == (lugar, len(ordem))
+    fora = esperado.index[esperado["uf_escola"] != "SP"][0]
+    assert ranking.posicao(int(fora), "nota_somatoria", mask) is None
+
+
+def test_perfis_das_escolas(alunos, ranking):
+    esperado = esperado_escolas(alunos)
+    perfis = ranking.perfis(ranking.filtrar())
+    assert set(perfis.index) == set(esperado.index[esperado["alunos"] >= MIN_ALUNOS])
+    np.testing.assert_allclose(
+        perfis[COLUNAS_NOTAS].to_numpy(),
+        esperado.loc[perfis.index, [f"media_{nota}" for nota in COLUNAS_NOTAS]].to_numpy()
+    )
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import artefatos_ml
+import estabilidade_ml
+from estabilidade_ml import _jaccard_maximo, calcular_estabilidade
+
+
+@pytest.fixture(autouse=True)
+def pasta_artefatos(tmp_path, monkeypatch):
+    monkeypatch.setattr(artefatos_ml, "PASTA_ARTEFATOS", str(tmp_path / "artefatos"))
+
+
+def grupos_separados(n_por_grupo: int = 40, semente: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(semente)
+    centros = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+    return np.concatenate([centro + rng.normal(0, 0.5, (n_por_grupo, 2)) for centro in centros])
+
+
+def test_grupos_bem_separados_sao_estaveis():
+    X = grupos_separados()
+    chamadas = []
+    resultado = calcular_estabilidade("kmeans", X, {"n_clusters": 3}, n_reamostras=6,
+                                      progresso=lambda feitas, total: chamadas.append((feitas, total)))
+    assert resultado.n_reamostras == 6 and chamadas[-1] == (6, 6)
+    np.testing.assert_allclose(resultado.ari, 1.0)
+    np.testing.assert_allclose(resultado.jaccard, 1.0)
+    # Co-atribuição: 1 dentro do mesmo grupo, 0 entre grupos (NaN só nos pares nunca sorteados juntos)
+    mesmo_grupo = resultado.referencia[:, None] == resultado.referencia[None, :]
+    coatribuicao = resultado.coatribuicao
+    assert np.all(np.isnan(coatribuicao) | (coatribuicao == mesmo_grupo))
+
+
+def test_resultado_reaproveitado_do_artefato(monkeypatch):
+    X = grupos_separados()
+    primeiro = calcular_estabilidade("kmeans", X, {"n_clusters": 3}, n_reamostras=3)
+
+    def sem_ajuste(*args, **kwargs):
+        raise AssertionError("a análise não deveria ser refeita")
+    monkeypatch.setattr(estabilidade_ml, "rotular", sem_ajuste)
+    segundo = calcular_estabilidade("kmeans", X, {"n_clusters": 3}, n_reamostras=3)
+    np.testing.assert_array_equal(primeiro.ari, segundo.ari)
+    np.testing.assert_array_equal(primeiro.referencia, segundo.referencia)
+
+
+def test_jaccard_ignora_o_ruido():
+    referencia = np.array([0, 0, 0, 1, 1, -1])
+    rotulos = np.array([5, 5, -1, 7, 7, 7])
+    assert _jaccard_maximo(referencia, rotulos) == {0: pytest.approx(2 / 3), 1: pytest.approx(2 / 3)}
@@ -0,0 +1,98 @@
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import exportacao
+from dados_enem import COLUNAS_FILTRO
+from tabela_enem import TabelaEnem
+
+COLUNAS = ["uf_prova", "sexo_labels", "nota_matematica"]
+
+
+@pytest.fixture
+def selecao(df_enem):
+    selecao = {coluna: sorted(df_enem[coluna].dropna().unique()) for coluna in COLUNAS_FILTRO}
+    selecao["municipio_prova"] = []
+    selecao["uf_prova"] = ["PI", "SP"]
+    selecao["sexo_labels"] = ["sexo_labels_0", "sexo_labels_2"]
+    return selecao
+
+
+@pytest.fixture(autouse=True)
+def particoes_em_memoria(df_enem, tmp_path, monkeypatch):
+    """Partições por UF do dataset sintético no lugar das lidas da pasta de dados."""
+    tabelas = {uf: TabelaEnem.de_dataframe(grupo.reset_index(drop=True))
+               for uf, grupo in df_enem.groupby("uf_prova", observed=True)}
+    monkeypatch.setattr(exportacao, "particoes",
+                        lambda ano, selecao: ((uf, tabelas[uf]) for uf in sorted(set(selecao["uf_prova"]) & set(tabelas))))
+    monkeypatch.setattr(exportacao, "particao_referencia", lambda ano: tabelas["AC"])
+    monkeypatch.setattr(exportacao, "versao_dataset", lambda ano: 1.0)
+    monkeypatch.setattr(exportacao, "PASTA_EXPORTACOES", str(tmp_path / "exportacoes"))
+
+
+def esperado(df_enem: pd.DataFrame, selecao) -> pd.DataFrame:
+    mask = pd.Series(True, index=df_enem.index)
+    for coluna in COLUNAS_FILTRO:
+        if selecao[coluna]:
+            mask &= df_enem[coluna].isin(selecao[coluna])
+    return df_enem.loc[mask, COLUNAS]
+
+
+def test_lotes_respeitam_o_tamanho_e_o_filtro(df_enem, selecao):
+    lotes = list(exportacao.lotes_filtrados(2024, selecao, COLUNAS, tamanho_lote=300))
+    assert len(lotes) > 2 and all(lote.num_rows <= 300 for lote in lotes)
+    assert all(lote.schema.names == COLUNAS for lote in lotes)
+    assert sum(lote.num_rows for lote in lotes) == len(esperado(df_enem, selecao))
+
+
+def ordenar(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype({"uf_prova": str, "sexo_labels": str}).sort_values(COLUNAS).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("tamanho_lote", [97, 100_000])
+def test_exportacao_confere_com_o_filtro_do_pandas(df_enem, selecao, tmp_path, tamanho_lote):
+    base = esperado(df_enem, selecao)
+    csv, parquet = str(tmp_path / "saida.csv"), str(tmp_path / "saida.parquet")
+    assert exportacao.exportar(2024, selecao, COLUNAS, "csv", csv, tamanho_lote) == len(base)
+    assert exportacao.exportar(2024, selecao, COLUNAS, "parquet", parquet, tamanho_lote) == len(base)
+
+    lido = pd.read_csv(csv, sep=";", encoding="latin1")
+    assert list(lido.columns) == COLUNAS
+    pd.testing.assert_frame_equal(ordenar(lido), ordenar(base), check_dtype=False)
+    pd.testing.assert_frame_equal(ordenar(pq.read_table(parquet).to_pandas()), ordenar(base), check_dtype=False)
+
+
+def test_selecao_vazia_gera_arquivo_so_com_o_esquema(selecao, tmp_path):
+    selecao["sexo_labels"] = []
+    destino = str(tmp_path / "vazio.parquet")
+    assert exportacao.exportar(2024, selecao, COLUNAS, "parquet", destino) == 0
+    assert pq.read_table(destino).schema.names == COLUNAS
+
+
+def test_falha_na_escrita_nao_deixa_arquivo(selecao, tmp_path, monkeypatch):
+    def quebra(*args, **kwargs):
+        yield from []
+        raise RuntimeError("falha")
+    monkeypatch.setattr(exportacao, "lotes_filtrados", quebra)
+    destino = str(tmp_path / "saida.csv")
+    with pytest.raises(RuntimeError):
+        exportacao.exportar(2024, selecao, COLUNAS, "csv", destino)
+    assert os.listdir(tmp_path) == []
+
+
+def test_limite_remove_as_usadas_ha_mais_tempo_e_temporarios_velhos(selecao):
+    antiga = exportacao.arquivo_exportacao(2024, selecao, COLUNAS, "csv")
+    recente = exportacao.arquivo_exportacao(2024, selecao, COLUNAS, "parquet")
+    os.utime(antiga, (1_000, 1_000))
+    os.utime(recente, (2_000, 2_000))
+    # Reaproveitar o arquivo marca o uso: a mais antiga passa a ser a última usada
+    assert exportacao.arquivo_exportacao(2024, selecao, COLUNAS, "csv") == antiga
+    abandonado = os.path.join(exportacao.PASTA_EXPORTACOES, "x.csv.1.tmp")
+    em_escrita = os.path.join(exportacao.PASTA_EXPORTACOES, "y.csv.2.tmp")
+    for temporario in (abandonado, em_escrita):
+        open(temporario, "w").close()
+    os.utime(abandonado, (0, 0))
+
+    exportacao.aplicar_limite(limite=os.path.getsize(antiga))
+    assert os.path.exists(antiga) and not os.path.exists(recente)
+    assert not os.path.exists(abandonado) and os.path.exists(em_escrita)
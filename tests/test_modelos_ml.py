@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+import modelos_ml
+from modelos_ml import _caminhos, aplicar_limite, carregar_modelo, guardar_modelo, modelo_persistente
+
+
+@pytest.fixture(autouse=True)
+def pasta_modelos(tmp_path, monkeypatch):
+    monkeypatch.setattr(modelos_ml, "PASTA_MODELOS", str(tmp_path / "modelos"))
+    monkeypatch.setattr(modelos_ml, "_verificados", {})
+
+
+def kmeans(semente: int = 0) -> KMeans:
+    return KMeans(n_clusters=2, n_init=1, random_state=semente).fit(np.random.default_rng(semente).random((50, 2)))
+
+
+def test_modelo_guardado_e_relido():
+    modelo = kmeans()
+    guardar_modelo("ab12", modelo, {"tipo": "kmeans"})
+    relido = carregar_modelo("ab12")
+    np.testing.assert_array_equal(relido.cluster_centers_, modelo.cluster_centers_)
+
+
+def test_sha256_conferido_uma_vez_por_processo(monkeypatch):
+    guardar_modelo("ab34", kmeans(), {"tipo": "kmeans"})
+    monkeypatch.setattr(modelos_ml, "_verificados", {})  # outro processo: nada conferido ainda
+    calculos = []
+    sha256 = modelos_ml._sha256_arquivo
+    monkeypatch.setattr(modelos_ml, "_sha256_arquivo", lambda caminho: calculos.append(caminho) or sha256(caminho))
+    assert carregar_modelo("ab34") is not None
+    assert carregar_modelo("ab34") is not None
+    assert len(calculos) == 1
+
+
+def test_adulteracao_com_mesmo_mtime_e_detectada(monkeypatch):
+    guardar_modelo("ab56", kmeans(), {"tipo": "kmeans"})
+    caminho_modelo, _ = _caminhos("ab56")
+    estado = os.stat(caminho_modelo)
+    with open(caminho_modelo, "r+b") as arquivo:
+        arquivo.seek(20)
+        arquivo.write(b"\x00\x01\x02")
+    os.utime(caminho_modelo, ns=(estado.st_atime_ns, estado.st_mtime_ns))  # tamanho e mtime intactos
+    monkeypatch.setattr(modelos_ml, "_verificados", {})
+    assert carregar_modelo("ab56") is None
+
+
+def test_arquivo_adulterado_e_descartado():
+    guardar_modelo("cd34", kmeans(), {"tipo": "kmeans"})
+    caminho_modelo, caminho_meta = _caminhos("cd34")
+    with open(caminho_modelo, "r+b") as arquivo:
+        arquivo.seek(20)
+        arquivo.write(b"\x00\x01\x02")
+    os.utime(caminho_modelo, ns=(0, 0))  # o mtime denuncia a mudança
+    assert carregar_modelo("cd34") is None
+    assert not os.path.exists(caminho_modelo) and not os.path.exists(caminho_meta)
+
+
+def test_mtime_diferente_com_conteudo_integro_e_aceito():
+    guardar_modelo("ef56", kmeans(), {"tipo": "kmeans"})
+    caminho_modelo, _ = _caminhos("ef56")
+    os.utime(caminho_modelo, ns=(0, 0))  # cópia ou restauração: só o mtime muda
+    assert carregar_modelo("ef56") is not None
+    assert os.path.exists(caminho_modelo)
+
+
+def test_limite_remove_os_usados_ha_mais_tempo():
+    for i, chave in enumerate(["aa01", "bb02", "cc03"]):
+        guardar_modelo(chave, kmeans(i), {"tipo": "kmeans"})
+        os.utime(_caminhos(chave)[1], (1_000 + i, 1_000 + i))
+    # "aa01" é o mais antigo, mas foi usado por último
+    assert carregar_modelo("aa01") is not None
+    tamanho = os.path.getsize(_caminhos("aa01")[0])
+    aplicar_limite(limite=2 * tamanho + tamanho // 2)
+    assert os.path.exists(_caminhos("aa01")[0])
+    assert not os.path.exists(_caminhos("bb02")[0])
+    assert os.path.exists(_caminhos("cc03")[0])
+
+
+def test_modelo_persistente_ajusta_uma_unica_vez():
+    dados = np.random.default_rng(0).random((40, 3))
+    ajustes = []
+
+    def ajustar():
+        ajustes.append(1)
+        return KMeans(n_clusters=3, n_init=1, random_state=0).fit(dados)
+
+    primeiro = modelo_persistente("kmeans", dados, {"n_clusters": 3}, ajustar)
+    segundo = modelo_persistente("kmeans", dados, {"n_clusters": 3}, ajustar)
+    assert len(ajustes) == 1
+    np.testing.assert_array_equal(primeiro.labels_, segundo.labels_)
+    modelo_persistente("kmeans", dados, {"n_clusters": 4}, ajustar)
+    assert len(ajustes) == 2
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from agregacoes import COLUNAS_NOTAS
+from anos_enem import COLUNAS_RESULTADOS
+from segmentacao_nacional import ajustar_segmentacao, gravar_segmentacao
+
+CODIGOS_NOTAS = {coluna: codigo for codigo, coluna in COLUNAS_RESULTADOS.items() if coluna in COLUNAS_NOTAS}
+
+
+def gravar_resultados(caminho: str, n: int, semente: int = 0, faltantes: float = 0.0):
+    """Arquivo no layout de RESULTADOS_2024.csv: três perfis de notas bem separados."""
+    rng = np.random.default_rng(semente)
+    perfis = rng.integers(3, size=n)
+    df = pd.DataFrame({"NO_MUNICIPIO_PROVA": "Teresina", "SG_UF_PROVA": "PI"}, index=range(n))
+    for codigo in CODIGOS_NOTAS.values():
+        notas = np.array([350.0, 550.0, 750.0])[perfis] + rng.normal(0, 20, n)
+        notas[rng.random(n) < faltantes] = np.nan
+        df[codigo] = notas
+    df.to_csv(caminho, sep=";", encoding="latin1", index=False)
+    return df
+
+
+def test_ajuste_em_blocos_e_saida_completa(tmp_path):
+    entrada, saida = str(tmp_path / "resultados.csv"), str(tmp_path / "perfis.csv")
+    df = gravar_resultados(entrada, 3_000)
+    scaler, ipca, kmeans = ajustar_segmentacao(entrada, n_clusters=3, tamanho_bloco=500)
+    notas = df[list(CODIGOS_NOTAS.values())].to_numpy()
+    np.testing.assert_allclose(scaler.mean_, notas.mean(axis=0))
+
+    assert gravar_segmentacao(entrada, saida, scaler, ipca, kmeans, tamanho_bloco=500) == len(df)
+    perfis = pd.read_csv(saida, sep=";", encoding="latin1")
+    assert len(perfis) == len(df) and set(perfis["cluster_perfil"]) == {0, 1, 2}
+
+
+def test_blocos_pequenos_entram_no_ajuste_juntos(tmp_path):
+    # 60% de faltantes em cada área: só ~1% tem as cinco notas, nenhum bloco de 20 linhas chega a 5
+    entrada = str(tmp_path / "resultados.csv")
+    gravar_resultados(entrada, 20_000, faltantes=0.6)
+    _, _, kmeans = ajustar_segmentacao(entrada, n_clusters=5, tamanho_bloco=20)
+    assert kmeans.cluster_centers_.shape == (5, len(COLUNAS_NOTAS))
+
+
+def test_participantes_insuficientes_falham_com_mensagem(tmp_path):
+    entrada = str(tmp_path / "resultados.csv")
+    gravar_resultados(entrada, 4)
+    with pytest.raises(ValueError, match="menos de 5 participantes"):
+        ajustar_segmentacao(entrada, n_clusters=5)
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from agregacoes import agregar_parcial
+from tabela_enem import (
+    ARQUIVO_VERSAO_ATUAL,
+    abrir_arrow,
+    escrever_particoes_uf,
+    listar_particoes_uf,
+    pasta_versao_atual
+)
+
+
+def linhas(df: pd.DataFrame) -> pd.DataFrame:
+    """Linhas como tuplas de texto, sem depender da ordem (para comparar conjuntos de linhas)."""
+    return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_particoes_e_indice_de_municipios(df_enem, tmp_path):
+    escrever_particoes_uf(df_enem, str(tmp_path))
+    particoes = listar_particoes_uf(str(tmp_path))
+    assert sorted(particoes) == sorted(df_enem["uf_prova"].unique())
+
+    for uf, caminho in particoes.items():
+        dados = abrir_arrow(caminho)
+        df_uf = df_enem[df_enem["uf_prova"] == uf]
+        assert len(dados) == len(df_uf)
+        # Os intervalos dos municípios são disjuntos e cobrem a partição inteira
+        intervalos = sorted(dados.indice_municipios.values())
+        assert intervalos[0][0] == 0 and intervalos[-1][1] == len(dados)
+        assert all(fim == inicio for (_, fim), (inicio, _) in zip(intervalos, intervalos[1:]))
+
+        for municipio in df_uf["municipio_prova"].unique():
+            fatias = dados.fatias_municipios([municipio])
+            assert len(fatias) == 1
+            obtido = fatias[0].to_pandas()
+            esperado = df_uf[df_uf["municipio_prova"] == municipio]
+            pd.testing.assert_frame_equal(linhas(obtido), linhas(esperado[obtido.columns]))
+
+
+def test_fatias_de_municipios_agregam_como_o_filtro(df_enem, tmp_path):
+    escrever_particoes_uf(df_enem, str(tmp_path))
+    dados = abrir_arrow(listar_particoes_uf(str(tmp_path))["SP"])
+    municipios = ["Santos", "Campinas", "Inexistente"]
+    fatias = dados.fatias_municipios(municipios)
+    por_fatias = agregar_parcial(fatias[0])
+    for fatia in fatias[1:]:
+        por_fatias = por_fatias.mesclar(agregar_parcial(fatia))
+    por_mascara = agregar_parcial(dados, dados.isin("municipio_prova", municipios))
+    assert por_fatias.finalizar().medias == pytest.approx(por_mascara.finalizar().medias)
+    assert por_fatias.total == np.count_nonzero(df_enem["municipio_prova"].isin(municipios))
+
+
+def test_nova_geracao_troca_o_ponteiro_sem_apagar_a_versao_lida(df_enem, tmp_path):
+    pasta = str(tmp_path)
+    escrever_particoes_uf(df_enem, pasta)
+    antiga = listar_particoes_uf(pasta)
+    escrever_particoes_uf(df_enem.iloc[:1_000], pasta)
+    nova = listar_particoes_uf(pasta)
+
+    with open(os.path.join(pasta, ARQUIVO_VERSAO_ATUAL), encoding="utf-8") as arquivo:
+        assert pasta_versao_atual(pasta) == os.path.join(pasta, arquivo.read().strip())
+    assert set(antiga.values()).isdisjoint(nova.values())
+    # A versão anterior continua completa para quem já a listou
+    assert sum(len(abrir_arrow(caminho)) for caminho in antiga.values()) == len(df_enem)
+    assert sum(len(abrir_arrow(caminho)) for caminho in nova.values()) == 1_000
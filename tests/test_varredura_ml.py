@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import artefatos_ml
+import varredura_ml
+from varredura_ml import avaliar, varrer
+
+
+@pytest.fixture(autouse=True)
+def pasta_artefatos(tmp_path, monkeypatch):
+    monkeypatch.setattr(artefatos_ml, "PASTA_ARTEFATOS", str(tmp_path / "artefatos"))
+    monkeypatch.setitem(varredura_ml.GRADES, "kmeans", {"n_clusters": [2, 3, 4, 5]})
+
+
+@pytest.fixture
+def X() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centros = np.array([[0.0, 0.0], [8.0, 0.0], [0.0, 8.0]])
+    return np.concatenate([centro + rng.normal(0, 0.6, (60, 2)) for centro in centros])
+
+
+def test_melhor_configuracao_primeiro(X):
+    por_silhouette = varrer("kmeans", X)
+    assert por_silhouette["n_clusters"].tolist()[0] == 3
+    assert por_silhouette["silhouette"].is_monotonic_decreasing
+    por_davies_bouldin = varrer("kmeans", X, metrica="davies_bouldin")
+    assert por_davies_bouldin["davies_bouldin"].is_monotonic_increasing
+
+
+def test_paralelo_confere_com_a_avaliacao_sequencial(X):
+    tabela = varrer("kmeans", X).set_index("n_clusters")
+    for n_clusters in varredura_ml.GRADES["kmeans"]["n_clusters"]:
+        esperado = avaliar("kmeans", X, {"n_clusters": n_clusters})
+        assert tabela.loc[n_clusters, "silhouette"] == pytest.approx(esperado["silhouette"])
+        assert tabela.loc[n_clusters, "davies_bouldin"] == pytest.approx(esperado["davies_bouldin"])
+
+
+def test_pontos_avaliados_nao_sao_refeitos(X):
+    varrer("kmeans", X)
+    chamadas = []
+    varrer("kmeans", X, progresso=lambda feitos, total: chamadas.append((feitos, total)))
+    assert chamadas == [(4, 4)]  # tudo lido dos artefatos, nenhum lote enviado ao pool
+
+
+def test_ruido_fora_das_metricas_e_subamostra(X, monkeypatch):
+    monkeypatch.setattr(varredura_ml, "AMOSTRA_AVALIACAO", 50)
+    resultado = avaliar("dbscan", np.vstack([X, [[100.0, 100.0]]]), {"eps": 1.5, "min_samples": 5})
+    assert resultado["clusters"] == 3
+    assert resultado["ruido"] == pytest.approx(1 / (len(X) + 1), abs=0.02)
+    assert 0.5 < resultado["silhouette"] <= 1
+    # Um único cluster: as métricas não se aplicam
+    unico = avaliar("dbscan", X, {"eps": 50.0, "min_samples": 5})
+    assert unico["clusters"] == 1 and np.isnan(unico["silhouette"]) and np.isnan(unico["davies_bouldin"])
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from agregacoes import COLUNAS_NOTAS
+from vizinhos import IndiceVizinhos
+
+
+@pytest.fixture
+def perfis() -> pd.DataFrame:
+    rng = np.random.default_rng(6)
+    perfis = pd.DataFrame(rng.normal(500, 80, (300, len(COLUNAS_NOTAS))), columns=COLUNAS_NOTAS,
+                          index=pd.Index(np.arange(1_000, 1_300), name="codigo_escola"))
+    perfis.iloc[10] = perfis.iloc[11]  # perfis idênticos: distância zero entre dois pontos
+    return perfis
+
+
+def distancias_exatas(perfis: pd.DataFrame, consultas: pd.DataFrame) -> np.ndarray:
+    media, desvio = perfis.mean().to_numpy(), perfis.std(ddof=0).to_numpy()
+    a, b = (perfis.to_numpy() - media) / desvio, (consultas.to_numpy() - media) / desvio
+    return np.sqrt(((b[:, None, :] - a[None, :, :]) ** 2).sum(axis=2))
+
+
+@pytest.mark.parametrize("algoritmo", ["kd_tree", "ball_tree"])
+def test_knn_confere_com_a_busca_exaustiva(perfis, algoritmo):
+    indice = IndiceVizinhos.construir(perfis, algoritmo)
+    consultas = perfis.iloc[[0, 5, 42]]
+    resultado = indice.knn(consultas, k=4)
+    exatas = distancias_exatas(perfis, consultas)
+    for i in range(len(consultas)):
+        obtido = resultado[resultado["consulta"] == i]
+        np.testing.assert_allclose(obtido["distancia"], np.sort(exatas[i])[:4], atol=1e-3)
+
+
+def test_knn_exclui_o_proprio_ponto_mesmo_com_perfis_identicos(perfis):
+    indice = IndiceVizinhos.construir(perfis)
+    consultas = perfis.iloc[[10, 11, 50]]
+    resultado = indice.knn(consultas, k=3, excluir_proprio=True)
+    for i, codigo in enumerate(consultas.index):
+        vizinhos = resultado.loc[resultado["consulta"] == i, "vizinho"].tolist()
+        assert len(vizinhos) == 3 and codigo not in vizinhos
+    # O gêmeo de distância zero continua sendo o vizinho mais próximo
+    assert resultado.loc[resultado["consulta"] == 0, "vizinho"].iloc[0] == perfis.index[11]
+    assert resultado.loc[resultado["consulta"] == 1, "vizinho"].iloc[0] == perfis.index[10]
+
+
+def test_raio_confere_com_a_busca_exaustiva(perfis):
+    indice = IndiceVizinhos.construir(perfis)
+    consultas = perfis.iloc[[3, 7]]
+    resultado = indice.raio(consultas, raio=1.5)
+    exatas = distancias_exatas(perfis, consultas)
+    for i in range(len(consultas)):
+        esperados = set(perfis.index[exatas[i] <= 1.5])
+        assert set(resultado.loc[resultado["consulta"] == i, "vizinho"]) == esperados
@@ -0,0 +1,112 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List
+import numpy as np
+import pandas as pd
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+from artefatos_ml import caminho_por_hash, gravar_artefato, hash_dados, ler_artefato
+from estabilidade_ml import rotular
+
+# ========================
+# Varredura de hiperparâmetros dos agrupamentos
+# ========================
+# Cada ponto da grade é ajustado nos dados completos e avaliado por silhouette e
+# Davies-Bouldin numa subamostra de no máximo AMOSTRA_AVALIACAO alunos (as duas métricas são
+# quadráticas no número de pontos). Os pontos são distribuídos em lotes por um pool de
+# processos e cada resultado é guardado como artefato: uma nova varredura só ajusta os
+# pontos que ainda não foram avaliados.
+
+# Grades declaradas: as mesmas faixas dos sliders da página de clusterização
+GRADES: Dict[str, Dict[str, List[Any]]] = {
+    "kmeans": {"n_clusters": list(range(2, 11))},
+    "dbscan": {
+        "eps": np.round(np.arange(0.1, 5.0 + 1e-9, 0.1), 1).tolist(),
+        "min_samples": list(range(1, 21))
+    },
+    "som": {"grid_x": list(range(2, 11)), "grid_y": list(range(1, 11))}
+}
+
+METRICAS = {
+    # métrica -> maior é melhor?
+    "silhouette": True,
+    "davies_bouldin": False
+}
+
+AMOSTRA_AVALIACAO = 2000
+
+
+def pontos_grade(algoritmo: str) -> List[Dict[str, Any]]:
+    grade = GRADES[algoritmo]
+    return [dict(zip(grade, valores)) for valores in itertools.product(*grade.values())]
+
+
+def avaliar(algoritmo: str, X: np.ndarray, parametros: Dict[str, Any], semente: int = 42) -> Dict[str, Any]:
+    """Ajusta um ponto da grade e calcula as métricas na subamostra (ruído do DBSCAN fica de fora)."""
+    rotulos = rotular(algoritmo, X, parametros, semente)
+    validos = rotulos >= 0
+    n_clusters = len(np.unique(rotulos[validos]))
+    resultado = {
+        **parametros,
+        "clusters": n_clusters,
+        "ruido": float(1 - validos.mean()),
+        "silhouette": np.nan,
+        "davies_bouldin": np.nan
+    }
+    X_validos, rotulos_validos = X[validos], rotulos[validos]
+    if len(X_validos) > AMOSTRA_AVALIACAO:
+        amostra = np.random.default_rng(semente).choice(len(X_validos), AMOSTRA_AVALIACAO, replace=False)
+        X_validos, rotulos_validos = X_validos[amostra], rotulos_validos[amostra]
+    # As métricas exigem de 2 a n - 1 clusters
+    if 2 <= len(np.unique(rotulos_validos)) < len(X_validos):
+        resultado["silhouette"] = float(silhouette_score(X_validos, rotulos_validos))
+        resultado["davies_bouldin"] = float(davies_bouldin_score(X_validos, rotulos_validos))
+    return resultado
+
+
+def _avaliar_lote(algoritmo: str, X: np.ndarray, lote: List[Dict[str, Any]], semente: int) -> List[Dict[str, Any]]:
+    return [avaliar(algoritmo, X, parametros, semente) for parametros in lote]
+
+
+def varrer(algoritmo: str, X: np.ndarray, metrica: str = "silhouette", semente: int = 42,
+           progresso: Callable[[int, int], None] | None = None) -> pd.DataFrame:
+    """
+    Avalia toda a grade do algoritmo e devolve uma linha por ponto, da melhor para a pior
+    configuração segundo 'metrica'. 'progresso(avaliados, total)' acompanha a varredura.
+    """
+    pontos = pontos_grade(algoritmo)
+    analise = f"varredura_{algoritmo}"
+    hash_entrada = hash_dados(X)
+
+    def caminho(parametros: Dict[str, Any]) -> str:
+        return caminho_por_hash(analise, hash_entrada, {**parametros, "amostra": AMOSTRA_AVALIACAO, "semente": semente})
+
+    resultados = []
+    pendentes = []
+    for parametros in pontos:
+        salvo = ler_artefato(caminho(parametros))
+        if salvo is None:
+            pendentes.append(parametros)
+        else:
+            resultados.append(salvo)
+    if progresso:
+        progresso(len(resultados), len(pontos))
+
+    if pendentes:
+        n_processos = min(os.cpu_count() or 1, len(pendentes))
+        # Lotes de vários pontos: o custo de enviar X a um processo é pago uma vez por lote
+        tamanho_lote = math.ceil(len(pendentes) / (n_processos * 4))
+        lotes = [pendentes[i:i + tamanho_lote] for i in range(0, len(pendentes), tamanho_lote)]
+        with ProcessPoolExecutor(max_workers=n_processos) as pool:
+            tarefas = [pool.submit(_avaliar_lote, algoritmo, X, lote, semente) for lote in lotes]
+            for tarefa in as_completed(tarefas):
+                for resultado in tarefa.result():
+                    parametros = {nome: resultado[nome] for nome in GRADES[algoritmo]}
+                    gravar_artefato(caminho(parametros), analise, parametros, resultado)
+                    resultados.append(resultado)
+                if progresso:
+                    progresso(len(resultados), len(pontos))
+
+    tabela = pd.DataFrame(resultados)
+    return tabela.sort_values(metrica, ascending=not METRICAS[metrica], na_position="last").reset_index(drop=True)
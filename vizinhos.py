@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree, KDTree
+from sklearn.preprocessing import StandardScaler
+from agregacoes import COLUNAS_NOTAS
+
+# ========================
+# Índice de vizinhos mais próximos ("alunos/escolas semelhantes")
+# ========================
+# Os perfis são os vetores das 5 notas padronizados com StandardScaler, como nos agrupamentos
+# do ml_notas: a distância euclidiana entre dois perfis é medida em desvios padrão de cada área.
+# A árvore (KD-tree por padrão; BallTree opcional) responde consultas k-NN e por raio em lote.
+# Os perfis de escolas vêm dos agregados por escola do escolas_enem (RankingEscolas.perfis).
+
+
+@dataclass(frozen=True)
+class IndiceVizinhos:
+    """Perfis de notas indexados em árvore; 'perfis' guarda as notas originais de cada ponto."""
+    perfis: pd.DataFrame
+    scaler: StandardScaler
+    arvore: KDTree | BallTree
+
+    @classmethod
+    def construir(cls, perfis: pd.DataFrame, algoritmo: str = "kd_tree") -> "IndiceVizinhos":
+        perfis = perfis.dropna(subset=COLUNAS_NOTAS)
+        scaler = StandardScaler().fit(perfis[COLUNAS_NOTAS])
+        arvore_cls = KDTree if algoritmo == "kd_tree" else BallTree
+        return cls(perfis, scaler, arvore_cls(scaler.transform(perfis[COLUNAS_NOTAS])))
+
+    def _padronizar(self, consultas: pd.DataFrame | np.ndarray) -> np.ndarray:
+        if not isinstance(consultas, pd.DataFrame):
+            consultas = pd.DataFrame(np.atleast_2d(consultas), columns=COLUNAS_NOTAS)
+        return self.scaler.transform(consultas[COLUNAS_NOTAS])
+
+    def _resultado(self, indices: List[np.ndarray], distancias: List[np.ndarray]) -> pd.DataFrame:
+        """Uma linha por (consulta, vizinho), em ordem crescente de distância dentro de cada consulta."""
+        consulta = np.repeat(np.arange(len(indices)), [len(i) for i in indices])
+        indices = np.concatenate(indices).astype(int) if len(indices) else np.array([], dtype=int)
+        distancias = np.concatenate(distancias) if len(distancias) else np.array([])
+        vizinhos = self.perfis.iloc[indices]
+        return pd.DataFrame({
+            "consulta": consulta,
+            "vizinho": vizinhos.index,
+            "distancia": distancias.round(3)
+        }).join(vizinhos.reset_index(drop=True))
+
+    def knn(self, consultas: pd.DataFrame | np.ndarray, k: int = 5, excluir_proprio: bool = False) -> pd.DataFrame:
+        """
+        Os k perfis mais próximos de cada consulta (lote de consultas). Com 'excluir_proprio',
+        as consultas são linhas de 'perfis' (mesmos rótulos) e o próprio ponto sai do resultado.
+        """
+        extra = int(excluir_proprio)
+        k_total = min(k + extra, len(self.perfis))
+        distancias, indices = self.arvore.query(self._padronizar(consultas), k=k_total)
+        if not excluir_proprio:
+            return self._resultado(list(indices), list(distancias))
+        # Com perfis idênticos o próprio ponto pode não ser o primeiro do resultado: ele é
+        # retirado pela posição no índice, não pela ordem
+        proprios = self.perfis.index.get_indexer(consultas.index)
+        manter = indices != proprios[:, None]
+        return self._resultado(
+            [linha[m][:k] for linha, m in zip(indices, manter)],
+            [linha[m][:k] for linha, m in zip(distancias, manter)]
+        )
+
+    def raio(self, consultas: pd.DataFrame | np.ndarray, raio: float) -> pd.DataFrame:
+        """Todos os perfis a até 'raio' desvios padrão de cada consulta (lote de consultas)."""
+        indices, distancias = self.arvore.query_radius(self._padronizar(consultas), r=raio,
+                                                       return_distance=True, sort_results=True)
+        return self._resultado(list(indices), list(distancias))
+